@@ -1,5 +1,16 @@
 # print("This is a placeholder package.")
 # from .classes import *
 # from .datatypes import *
-from . import abi2api, vm, locksmith
-# from . import *
\ No newline at end of file
+# from . import *
+import importlib
+
+from .config import configure
+
+_LAZY_SUBMODULES = ["abi2api", "vm", "sharding", "locksmith"]
+"""Submodules available as attributes, imported on first access since some of them load brownie."""
+
+
+def __getattr__(name: str):
+    if name in _LAZY_SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
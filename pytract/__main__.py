@@ -1,4 +1,4 @@
-from .abi2api import generate_api_code_for_project
+from .constants import DEFAULT_LOG_CHUNK_SIZE
 import argparse
 
 
@@ -12,11 +12,73 @@ def main():
 
     # Subparser for the 'set' keyword
     set_parser = subparsers.add_parser('process', help='Process a given project')
-    set_parser.add_argument('project_path', type=str, help='Path of the project to process')
+    set_parser.add_argument('project_path', type=str, nargs='?', default=None, help='Path of the project to process')
+    set_parser.add_argument('--abi-dir', type=str, default=None, help='Generate from the ABI JSON files in this directory instead, without brownie')
+    set_parser.add_argument('--output', type=str, default=None, help="Where to write the API package in --abi-dir mode, defaults to '<abi_dir>/api'")
+
+    # Subparser for the 'index' keyword
+    index_parser = subparsers.add_parser('index', help='Sync contract events into a local SQLite index')
+    index_parser.add_argument('project_path', type=str, help='Path of the processed project')
+    index_parser.add_argument('--contract', action='append', required=True, metavar='NAME=ADDRESS', help='Contract to index, can be given multiple times')
+    index_parser.add_argument('--db', type=str, default='events.sqlite', help='Path of the SQLite index')
+    index_parser.add_argument('--from-block', type=int, default=0, help='First block to sync, if not synced before')
+    index_parser.add_argument('--to-block', type=int, default=None, help='Last block to sync, defaults to the latest block')
+    index_parser.add_argument('--chunk-size', type=int, default=DEFAULT_LOG_CHUNK_SIZE, help='Initial number of blocks per eth_getLogs request')
+    index_parser.add_argument('--network', type=str, default=None, help='Brownie network to connect to')
+
+    # Subparser for the 'watch' keyword
+    watch_parser = subparsers.add_parser('watch', help='Regenerate API code of a project whenever its build artifacts change')
+    watch_parser.add_argument('project_path', type=str, help='Path of the project to watch')
+    watch_parser.add_argument('--debounce', type=float, default=0.3, help='Seconds without further changes before regenerating')
+    watch_parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds between scans of the build directories')
+    watch_parser.add_argument('--poll', action='store_true', help='Always poll, even if watchdog is installed')
 
     arguments = parser.parse_args()
     if arguments.keyword == 'process':
-        project_path = arguments.project_path
-        generate_api_code_for_project(project_path)
+        if arguments.abi_dir is not None:
+            from .codegen import generate_api_code_for_abi_dir
+
+            generate_api_code_for_abi_dir(arguments.abi_dir, arguments.output)
+        elif arguments.project_path is not None:
+            from .abi2api import generate_api_code_for_project
+
+            project_path = arguments.project_path
+            generate_api_code_for_project(project_path)
+        else:
+            set_parser.error('either project_path or --abi-dir is required')
+    elif arguments.keyword == 'index':
+        from .indexer import index_project_events
+
+        contract_addresses = dict(it.split('=', 1) for it in arguments.contract)
+        synced = index_project_events(
+            arguments.project_path,
+            contract_addresses,
+            arguments.db,
+            from_block=arguments.from_block,
+            to_block=arguments.to_block,
+            chunk_size=arguments.chunk_size,
+            network=arguments.network,
+        )
+        for address, count in synced.items():
+            print(f"Indexed {count} events of {address}")
+    elif arguments.keyword == 'watch':
+        from .watch import BuildWatcher
+
+        with BuildWatcher(
+            arguments.project_path,
+            debounce=arguments.debounce,
+            poll_interval=arguments.poll_interval,
+            use_file_events=not arguments.poll,
+        ) as watcher:
+            mode = 'file events' if watcher.uses_file_events else 'polling'
+            print(f"Watching build artifacts of '{arguments.project_path}' ({mode}), press Ctrl+C to stop")
+            try:
+                watcher.run(on_regenerate=lambda names: print(f"Regenerated: {', '.join(names)}"))
+            except KeyboardInterrupt:
+                pass
     else:
         raise Exception(f"Invalid keyword argument: '{arguments.keyword}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,66 @@
-from brownie import project
-from brownie.network.contract import (
-    ContractContainer,
-    ProjectContract,
-    Contract,
-)  # , InterfaceConstructor
-from brownie.project.main import Project
-from brownie.network.account import Account
 import pydantic
-from typing import Dict, List, Optional, cast, Union
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    cast,
+    Union,
+    TYPE_CHECKING,
+)
 from .constants import *
 from .utils import *
+from .abi_info import *
+from .abi_info import _to_bytes
+from .codegen import *
+from . import instrumentation
 import inspect
 import functools
-import jinja2
-from pathlib import Path
 import abc
-import black
-import black.mode
+import bisect
+import collections
+import concurrent.futures
+import contextvars
+import hashlib
+import itertools
+import keyword
+import threading
+import time
+import types
+import weakref
+from contextlib import contextmanager
+
+if TYPE_CHECKING:
+    from .evm import AtomicEVM
+
+try:
+    from brownie.network.contract import (
+        ContractContainer,
+        ProjectContract,
+        Contract,
+    )  # , InterfaceConstructor
+    from brownie.project.main import Project
+    from brownie.network.account import Account
+except ImportError:
+    # API packages generated from ABI files run on the embedded EVM without brownie,
+    # where issuers are plain addresses and the brownie types are left unchecked
+    ContractContainer = ProjectContract = Contract = Project = Account = Any
 
 # can you pay to a contract? or is it always payable?
 
-_TEMPLATE_DIR = Path(os.path.dirname(__file__)) / "templates"
-_API_TEMPLATE_PATH = _TEMPLATE_DIR / "api.py.j2"
-
-
 class BaseConfig(pydantic.BaseModel):
     class Config:
         arbitrary_types_allowed = True
 
 
 class TransactionMandatoryParameters(BaseConfig):
-    issuer: Account
-    """The Account that the transaction it sent from. If not given, the transaction is sent from the account that deployed the contract."""
+    issuer: Union[Account, str]
+    """The Account that the transaction it sent from. If not given, the transaction is sent from the account that deployed the contract. With the embedded EVM backend, a plain address is accepted."""
 
 
 class TransactionOptionalParameters(pydantic.BaseModel):
@@ -76,6 +105,10 @@ class TransactionParameters(
     def optional_kwargs(self):
         return {k: v for k, v in self.kwargs.items() if k != "issuer"}
 
+    def to_transaction_dict(self) -> dict:
+        """Transaction dict as passed to brownie contract methods, sent from the issuer."""
+        return {CONTRACT_DEPLOYER_KEY: self.issuer, **self.optional_kwargs}
+
     def to_contract_deploy_parameters(self, args: list = []):
         parameters = ContractDeployParameters(
             issuer=self.issuer, args=args, kwargs=self.optional_kwargs
@@ -86,7 +119,228 @@ class TransactionParameters(
 class FallbackException(Exception): ...
 
 
+class GasEstimateCache:
+    """
+    Cache of `estimate_gas` results for generated contract methods.
+
+    Entries are keyed on contract address, function name and the shape of the arguments,
+    and expire after `ttl` seconds or `max_blocks` blocks, whichever comes first.
+    The current block number is polled at most every `block_poll_interval` seconds,
+    so cache hits do not cost a round trip.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 300.0,
+        max_blocks: int = 50,
+        default_gas_buffer: float = 1.2,
+        block_poll_interval: float = 2.0,
+        maxsize: int = 10000,
+        web3=None,
+    ):
+        self.ttl = ttl
+        self.max_blocks = max_blocks
+        self.default_gas_buffer = default_gas_buffer
+        self.block_poll_interval = block_poll_interval
+        self.maxsize = maxsize
+        self._web3 = web3
+        self._lock = threading.Lock()
+        self._entries: collections.OrderedDict = collections.OrderedDict()
+        self._block_number: Optional[int] = None
+        self._block_polled_at = 0.0
+
+    @property
+    def web3(self):
+        if self._web3 is None:
+            from brownie.network import web3
+
+            self._web3 = web3
+        return self._web3
+
+    @classmethod
+    def fingerprint(cls, value) -> Any:
+        """
+        Shape of an argument as far as gas usage is concerned: types, lengths of
+        dynamic values, and whether integers are zero (zero storage writes are cheaper).
+        """
+        if isinstance(value, bool):
+            return bool
+        if isinstance(value, int):
+            return (int, value == 0)
+        if isinstance(value, (str, bytes)):
+            return (type(value), len(value))
+        if isinstance(value, (list, tuple)):
+            return (list, tuple(cls.fingerprint(it) for it in value))
+        return type(value)
+
+    def get_key(self, contract, function_name: str, args: Iterable) -> tuple:
+        return (contract.address.lower(), function_name, self.fingerprint(list(args)))
+
+    def current_block_number(self) -> int:
+        now = time.monotonic()
+        if (
+            self._block_number is None
+            or now - self._block_polled_at >= self.block_poll_interval
+        ):
+            self._block_number = self.web3.eth.block_number
+            self._block_polled_at = now
+        return cast(int, self._block_number)
+
+    def get(self, key: tuple) -> Optional[int]:
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        estimate, created_at, block_number = entry
+        expired = time.monotonic() - created_at > self.ttl or (
+            self.current_block_number() - block_number > self.max_blocks
+        )
+        if expired:
+            self.invalidate(key)
+            return None
+        return estimate
+
+    def put(self, key: tuple, estimate: int):
+        entry = (estimate, time.monotonic(), self.current_block_number())
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Optional[tuple] = None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def gas_limit(self, contract, function_name: str, args: list, tx: dict) -> int:
+        """Gas limit for the transaction, estimated by the node only on cache misses."""
+        key = self.get_key(contract, function_name, args)
+        estimate = self.get(key)
+        if estimate is None:
+            estimate = getattr(contract, function_name).estimate_gas(*args, tx)
+            self.put(key, estimate)
+        gas_buffer = tx.get("gas_buffer") or self.default_gas_buffer
+        return int(estimate * gas_buffer)
+
+
+_gas_estimate_cache: Optional[GasEstimateCache] = None
+
+
+def use_gas_estimate_cache(cache: Optional[GasEstimateCache]):
+    """Enable the gas estimate cache for transactions without `gas_limit`, or disable it with None."""
+    global _gas_estimate_cache
+    _gas_estimate_cache = cache
+
+
+def get_gas_estimate_cache() -> Optional[GasEstimateCache]:
+    return _gas_estimate_cache
+
+
+def collect_structs(struct_namespace: Optional[type]) -> Dict[str, type]:
+    """Generated struct classes in a `Struct` namespace, by canonical ABI type."""
+    if struct_namespace is None:
+        return {}
+    return {
+        it._abi_type: it
+        for it in vars(struct_namespace).values()
+        if isinstance(it, type) and hasattr(it, "_abi_type")
+    }
+
+
+def _build_output_converter(param: "ParamType", structs: Dict[str, type]):
+    """Converter from decoded values to generated struct classes, or None if nothing to convert."""
+    if param.is_array:
+        element_converter = _build_output_converter(param.element, structs)
+        if element_converter is None:
+            return None
+        return lambda values: [element_converter(it) for it in values]
+    if not param.type.startswith("tuple"):
+        return None
+    struct_class = structs[param.canonical_type]
+    component_converters = [
+        _build_output_converter(it, structs) for it in param.components
+    ]
+    if all(it is None for it in component_converters):
+        return struct_class._make
+    return lambda values: struct_class._make(
+        value if converter is None else converter(value)
+        for converter, value in zip(component_converters, values)
+    )
+
+
+class OutputDecoder:
+    """
+    Decodes return data of a function directly into generated struct classes,
+    with the ABI decoder and converters resolved once up front.
+    """
+
+    def __init__(self, outputs: List["ParamType"], structs: Dict[str, type]):
+        from eth_abi.registry import registry
+
+        self.output_count = len(outputs)
+        output_types = ",".join(it.canonical_type for it in outputs)
+        self._decoder = registry.get_decoder(f"({output_types})")
+        self._converters = [_build_output_converter(it, structs) for it in outputs]
+
+    def convert(self, values: Iterable[Any]) -> Any:
+        """Convert already decoded output values. A single output is returned as is."""
+        converted = tuple(
+            value if converter is None else converter(value)
+            for converter, value in zip(self._converters, values)
+        )
+        if self.output_count == 1:
+            return converted[0]
+        return converted
+
+    def decode_values(self, data: bytes) -> tuple:
+        """Decode output values without converting them to struct classes."""
+        from eth_abi.decoding import ContextFramesBytesIO
+
+        return self._decoder(ContextFramesBytesIO(data))
+
+    def decode(self, data: bytes) -> Any:
+        return self.convert(self.decode_values(data))
+
+
+def _is_out_of_gas_receipt(receipt, gas_limit: int) -> bool:
+    status = getattr(receipt, "status", None)
+    gas_used = getattr(receipt, "gas_used", None)
+    return status == 0 and gas_used is not None and gas_used >= gas_limit
+
+
+def _is_out_of_gas_error(error, gas_limit: int, web3) -> bool:
+    """
+    Whether a transaction which raised `VirtualMachineError` failed for lack of gas only.
+    brownie sets `txid` once a transaction is broadcast: without it the node rejected the
+    transaction and nothing was mined, otherwise its receipt tells.
+    """
+    txid = getattr(error, "txid", "")
+    if not txid:
+        return True
+    if getattr(error, "revert_type", "") == "out of gas":
+        return True
+    receipt = web3.eth.get_transaction_receipt(txid)
+    return receipt["status"] == 0 and receipt["gasUsed"] >= gas_limit
+
+
+DEFAULT_MAP_BATCH_SIZE = 500
+"""Number of calls per batch in `FunctionBase.map`."""
+
+MULTICALL3_ADDRESS = "0xcA11bde05077BDcd13A4DaBd6c5a2c16ff7eA50"
+"""Address of the Multicall3 contract, deployed at the same address on most chains."""
+
+MULTICALL3_AGGREGATE3_SELECTOR = bytes.fromhex("82ad56cb")
+"""Selector of `aggregate3((address,bool,bytes)[])`."""
+
+
 class FunctionBase:
+    _contract_info: "ContractInfo"
+    _structs: Dict[str, type] = {}
+    _output_decoders: Dict[str, OutputDecoder] = {}
+
     def __init__(
         self,
         contract: Union[Contract, ProjectContract],
@@ -109,58 +363,595 @@ class FunctionBase:
                 "Both given txparams and default txparams are empty."
             )
 
+    @classmethod
+    def _get_function_info(cls, function_name: str) -> "FunctionInfo":
+        return next(
+            it
+            for it in cls._contract_info.function_info_list
+            if it.name == function_name
+        )
+
+    @classmethod
+    def _get_output_decoder(cls, function_name: str) -> OutputDecoder:
+        decoder = cls._output_decoders.get(function_name)
+        if decoder is None:
+            function_info = cls._get_function_info(function_name)
+            decoder = OutputDecoder(function_info.outputs, cls._structs)
+            cls._output_decoders[function_name] = decoder
+        return decoder
+
+    def _view(self, function_name: str, args: list):
+        """Call a view/pure function through the underlying contract."""
+        with instrumentation.span("abi2api.view", function=function_name):
+            return getattr(self._contract, function_name)(*args)
+
+    def _call(self, function_name: str, args: list):
+        """
+        Call a view/pure function returning structs, decoding the return data straight
+        into generated struct classes instead of going through brownie's `ReturnValue`.
+        """
+        decoder = self._get_output_decoder(function_name)
+        method = getattr(self._contract, function_name)
+        with instrumentation.span("abi2api.call", function=function_name) as span:
+            if isinstance(self._contract, EVMContract):
+                values = method(*args)
+                return decoder.convert(
+                    [values] if decoder.output_count == 1 else values
+                )
+
+            from brownie.network import web3
+
+            data = method.encode_input(*args)
+            return_data = web3.eth.call({"to": self._contract.address, "data": data})
+            span.add("bytes_read", len(return_data))
+            return decoder.decode(bytes(return_data))
+
+    def _call_batch_return_data(
+        self,
+        calldata_list: List[bytes],
+        web3,
+        multicall_address: Optional[str],
+        executor: Optional[concurrent.futures.Executor],
+    ) -> List[bytes]:
+        """Return data of a batch of calls, in one Multicall3 `aggregate3` call or as concurrent `eth_call`s."""
+        with instrumentation.span("abi2api.call_batch", calls=len(calldata_list)):
+            return self._get_batch_return_data(
+                calldata_list, web3, multicall_address, executor
+            )
+
+    def _get_batch_return_data(
+        self,
+        calldata_list: List[bytes],
+        web3,
+        multicall_address: Optional[str],
+        executor: Optional[concurrent.futures.Executor],
+    ) -> List[bytes]:
+        from eth_abi import decode, encode
+
+        address = self._contract.address
+        if multicall_address is not None:
+            data = MULTICALL3_AGGREGATE3_SELECTOR + encode(
+                ["(address,bool,bytes)[]"],
+                [[(address, False, it) for it in calldata_list]],
+            )
+            return_data = web3.eth.call({"to": multicall_address, "data": data})
+            (results,) = decode(["(bool,bytes)[]"], bytes(return_data))
+            for index, (success, _) in enumerate(results):
+                if not success:
+                    raise Exception(f"Call {index} of the batch reverted")
+            return [it[1] for it in results]
+
+        def call(calldata: bytes) -> bytes:
+            return bytes(web3.eth.call({"to": address, "data": calldata}))
+
+        if executor is None:
+            return [call(it) for it in calldata_list]
+        return list(executor.map(call, calldata_list))
+
+    def iter_map(
+        self,
+        function_name: str,
+        args_iterable: Iterable[Any],
+        batch_size: int = DEFAULT_MAP_BATCH_SIZE,
+        output: str = "numpy",
+        split_words: bool = False,
+        multicall_address: Optional[str] = None,
+        max_workers: int = 8,
+        web3=None,
+    ) -> Iterator[Any]:
+        """
+        Call a view/pure function over many arguments, yielding the results of each batch.
+
+        Items of `args_iterable` are the argument of a single-input function, or tuples of
+        arguments otherwise. `output` is one of "numpy", "arrow" or "list"; see `pytract.columnar`
+        for the column types. Only one batch of calldata and results is held at a time.
+
+        With `multicall_address` (like `MULTICALL3_ADDRESS`), each batch is a single `aggregate3`
+        call, which reverts as a whole if any call reverts. Otherwise the calls of a batch are
+        sent as concurrent `eth_call`s over `max_workers` threads.
+        """
+        from . import columnar
+        from eth_abi.registry import registry
+
+        if output not in columnar.OUTPUT_FORMATS:
+            raise Exception(
+                f"Unknown output format '{output}', expected one of {columnar.OUTPUT_FORMATS}"
+            )
+        function_info = self._get_function_info(function_name)
+        if check_function_type_not_pure(function_info.stateMutability):
+            raise Exception(f"Function '{function_name}' is not a view/pure function")
+
+        single_input = len(function_info.inputs) == 1
+        decoder = self._get_output_decoder(function_name)
+        output_types = [it.canonical_type for it in function_info.outputs]
+        output_names = [
+            it.name or f"output{index}"
+            for index, it in enumerate(function_info.outputs)
+        ]
+        word_output = columnar.is_word_output(output_types)
+        is_evm = isinstance(self._contract, EVMContract)
+
+        selector = bytes.fromhex(function_info.selector[2:])
+        input_types = ",".join(it.canonical_type for it in function_info.inputs)
+        encoder = registry.get_encoder(f"({input_types})")
+        if web3 is None and not is_evm:
+            from brownie.network import web3
+
+        executor = None
+        if not is_evm and multicall_address is None and max_workers > 1:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            args_iterator = iter(args_iterable)
+            while True:
+                batch = [
+                    (it,) if single_input else tuple(it)
+                    for it in itertools.islice(args_iterator, batch_size)
+                ]
+                if batch == []:
+                    break
+                if is_evm:
+                    method = getattr(self._contract, function_name)
+                    values_list = [
+                        (method(*it),) if decoder.output_count == 1 else method(*it)
+                        for it in batch
+                    ]
+                    return_data = None
+                else:
+                    return_data = self._call_batch_return_data(
+                        [selector + encoder(it) for it in batch],
+                        web3,
+                        multicall_address,
+                        executor,
+                    )
+                    values_list = None
+
+                if output == columnar.LIST_OUTPUT:
+                    if return_data is not None:
+                        yield [decoder.decode(it) for it in return_data]
+                    else:
+                        yield [decoder.convert(it) for it in values_list]
+                    continue
+                if return_data is not None and not word_output:
+                    values_list = [decoder.decode_values(it) for it in return_data]
+                    return_data = None
+                yield columnar.to_columns(
+                    output_types,
+                    output_names,
+                    output,
+                    return_data=return_data,
+                    values_list=values_list,
+                    split_words=split_words,
+                )
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False)
+
+    def map(
+        self,
+        function_name: str,
+        args_iterable: Iterable[Any],
+        batch_size: int = DEFAULT_MAP_BATCH_SIZE,
+        output: str = "numpy",
+        split_words: bool = False,
+        multicall_address: Optional[str] = None,
+        max_workers: int = 8,
+        web3=None,
+    ):
+        """
+        Call a view/pure function over many arguments in batches, returning all results as columns.
+
+        ```python
+        balances = token.function.map("balanceOf", addresses, batch_size=1000)
+        ```
+
+        See `iter_map` for the parameters. To process results batch by batch with flat memory, use `iter_map` instead.
+        """
+        from . import columnar
+
+        parts = list(
+            self.iter_map(
+                function_name,
+                args_iterable,
+                batch_size=batch_size,
+                output=output,
+                split_words=split_words,
+                multicall_address=multicall_address,
+                max_workers=max_workers,
+                web3=web3,
+            )
+        )
+        if parts == []:
+            function_info = self._get_function_info(function_name)
+            if output == columnar.LIST_OUTPUT:
+                return []
+            return columnar.to_columns(
+                [it.canonical_type for it in function_info.outputs],
+                [
+                    it.name or f"output{index}"
+                    for index, it in enumerate(function_info.outputs)
+                ],
+                output,
+                values_list=[],
+                split_words=split_words,
+            )
+        return columnar.concat_columns(parts, output)
+
+    def _transact(
+        self,
+        function_name: str,
+        args: list,
+        txparams: Optional[TransactionParameters],
+    ):
+        """
+        Send a transaction to a non-pure function.
+
+        With a gas estimate cache in use and no explicit `gas_limit`, the cached estimate is
+        used as gas limit. If that transaction runs out of gas, or the node rejects it before
+        mining it, the entry is dropped and the transaction is sent again with a fresh estimate
+        by brownie. Other reverts were mined already, so the entry is dropped and the error raised.
+        """
+        with instrumentation.span("abi2api.transact", function=function_name):
+            return self._send_transaction(function_name, args, txparams)
+
+    def _send_transaction(
+        self,
+        function_name: str,
+        args: list,
+        txparams: Optional[TransactionParameters],
+    ):
+        method = getattr(self._contract, function_name)
+        tx = self.txparams_with_fallback(txparams).to_transaction_dict()
+        cache = get_gas_estimate_cache()
+        if (
+            cache is None
+            or "gas_limit" in tx
+            or isinstance(self._contract, EVMContract)
+        ):
+            return method(*args, tx)
+
+        from brownie.exceptions import VirtualMachineError
+
+        gas_limit = cache.gas_limit(self._contract, function_name, args, tx)
+        cached_tx = {k: v for k, v in tx.items() if k != "gas_buffer"}
+        cached_tx["gas_limit"] = gas_limit
+        key = cache.get_key(self._contract, function_name, args)
+        try:
+            receipt = method(*args, cached_tx)
+            if not _is_out_of_gas_receipt(receipt, gas_limit):
+                return receipt
+        except VirtualMachineError as e:
+            if not _is_out_of_gas_error(e, gas_limit, cache.web3):
+                cache.invalidate(key)
+                raise
+        cache.invalidate(key)
+        return method(*args, tx)
+
+
+def get_issuer_address(issuer: Union[Account, str]) -> str:
+    if isinstance(issuer, str):
+        return issuer
+    return issuer.address
+
+
+_evm_backend: contextvars.ContextVar[Optional["EVMBackend"]] = contextvars.ContextVar(
+    "pytract_evm_backend", default=None
+)
+"""EVM backend engaged in the current thread or asyncio task."""
+
+
+def get_evm_backend() -> Optional["EVMBackend"]:
+    return _evm_backend.get()
+
+
+class EVMContractFunction:
+    """
+    Callable contract method running on the embedded EVM.
+    Mimics the calling convention of brownie: a trailing dict of transaction parameters makes it a transaction, otherwise it is a read-only call.
+    """
+
+    def __init__(self, contract: "EVMContract", name: str):
+        self._contract = contract
+        self._name = name
+
+    def __call__(self, *args):
+        from simular.contract import convert_for_soltypes
+
+        backend = self._contract._backend
+        if len(args) > 0 and isinstance(args[-1], dict):
+            *args, tx = args
+            caller = get_issuer_address(
+                tx.get("issuer", tx.get(CONTRACT_DEPLOYER_KEY))
+            )
+            return backend.evm.transact(
+                self._name,
+                convert_for_soltypes(tuple(args)),
+                caller,
+                self._contract.address,
+                tx.get("amount") or 0,
+                self._contract._contract_name,
+            )
+        return backend.evm.call(
+            self._name,
+            convert_for_soltypes(tuple(args)),
+            self._contract.address,
+            self._contract._contract_name,
+        )
+
+
+class EVMContract:
+    """Contract deployed on the embedded EVM, standing in for brownie's `Contract`."""
+
+    def __init__(
+        self,
+        backend: "EVMBackend",
+        contract_name: str,
+        address: str,
+        deployer: Optional[Union[Account, str]] = None,
+    ):
+        self._backend = backend
+        self._contract_name = contract_name
+        self.address = address
+        self.tx = None if deployer is None else types.SimpleNamespace(sender=deployer)
+
+    def __getattr__(self, name: str) -> EVMContractFunction:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return EVMContractFunction(self, name)
+
+
+class EVMBackend:
+    """
+    Run generated contract APIs on an in-process `pytract.evm.AtomicEVM` instead of a brownie network.
+
+    Usage:
+        with abi2api.EVMBackend(AtomicEVM(storage_path)).engage():
+            contract = Faucet.deploy(abi2api.TransactionParameters(issuer=address))
+    """
+
+    def __init__(self, evm: "AtomicEVM"):
+        self.evm = evm
+
+    def register_contract(self, contract_name: str, contract_info: AbiContractInfo):
+        from .evm import abi_registry
+
+        bytecode = None
+        if contract_info.bytecode is not None:
+            bytecode = bytes.fromhex(contract_info.bytecode.removeprefix("0x"))
+        abi_registry.register(contract_info.abi, bytecode, name=contract_name)
+
+    def deploy(
+        self,
+        contract_name: str,
+        contract_info: AbiContractInfo,
+        parameters: "ContractDeployParameters",
+    ) -> EVMContract:
+        from simular.contract import convert_for_soltypes
+
+        if contract_info.bytecode is None:
+            raise Exception(
+                f"Contract '{contract_name}' is known only by its ABI and cannot be deployed, generate its API from a build artifact with a bytecode"
+            )
+        self.register_contract(contract_name, contract_info)
+        address = self.evm.deploy(
+            convert_for_soltypes(tuple(parameters.args)),
+            get_issuer_address(parameters.issuer),
+            parameters.kwargs.get("amount") or 0,
+            contract_name,
+        )
+        return EVMContract(self, contract_name, address, deployer=parameters.issuer)
+
+    def at(
+        self, contract_name: str, contract_info: AbiContractInfo, address: str
+    ) -> EVMContract:
+        from .evm import abi_registry
+
+        self.register_contract(contract_name, contract_info)
+        abi_registry.register_address(address, contract_name)
+        return EVMContract(self, contract_name, address)
+
+    def _engage(self) -> contextvars.Token:
+        if _evm_backend.get() is None:
+            return _evm_backend.set(self)
+        else:
+            raise Exception("EVM backend already engaged")
+
+    def _disengage(self, token: contextvars.Token):
+        _evm_backend.reset(token)
+
+    @contextmanager
+    def engage(self):
+        """Engage this backend in the current thread or asyncio task, which may each engage their own."""
+        token = self._engage()
+        try:
+            yield self
+        finally:
+            self._disengage(token)
+
 
 class ContractProperties(BaseConfig):
-    contract: Union[Contract, ProjectContract]
-    issuer: Account
+    contract: Union[Contract, ProjectContract, EVMContract]
+    issuer: Optional[Union[Account, str]] = None
 
     @classmethod
-    def from_contract(cls, contract: Union[ProjectContract, Contract], issuer: Account):
+    def from_contract(
+        cls,
+        contract: Union[ProjectContract, Contract, EVMContract],
+        issuer: Optional[Union[Account, str]],
+    ):
         return cls(contract=contract, issuer=issuer)
 
 
-# TODO: recursively resolve and create tuple type hints for languages like vyper
-class ParamType(pydantic.BaseModel):
-    type: str
-    name: str = ""  # mostly ignored
-    components: list["ParamType"] = []
+class ContractInfo(AbiContractInfo, BaseConfig):
+    contract_container: ContractContainer
+    """The brownie contract container, deploying the contract on the connected network."""
 
-    # internalType: str
-    @property
-    def type_hint(self):
-        return self.resolve_type_hint(self)
 
-    @staticmethod
-    def resolve_type_hint(obj: "ParamType"):
-        if obj.components == []:
-            return obj.type
-        else:
-            it_type_hints = []
-            for it in obj.components:
-                it_type_hints.append(ParamType.resolve_type_hint(it))
-            return f"{obj.type}({', '.join(it_type_hints)})"
+class EventBase:
+    """
+    Base of generated event classes. Decoded event arguments are stored in slots named after
+    the event inputs, next to the `log_*` metadata of the originating log.
+    """
 
+    __slots__ = EVENT_LOG_METADATA_FIELDS
+    _event_info: EventInfo
+    _decoder: Optional[EventDecoder] = None
+    topic: Optional[str] = None
 
-class ContractABI(pydantic.BaseModel):
-    inputs: List[ParamType] = []
-    outputs: List[ParamType] = []
-    type: Optional[str] = None
-    stateMutability: Optional[str] = None
-    name: Optional[str] = None
+    @classmethod
+    def get_decoder(cls) -> EventDecoder:
+        decoder = cls.__dict__.get("_decoder")
+        if decoder is None:
+            decoder = cls._decoder = EventDecoder(cls._event_info)
+        return decoder
 
+    @classmethod
+    def from_values(cls, values: Iterable[Any], log: dict):
+        ret = cls.__new__(cls)
+        for name, value in zip(cls.__slots__, values):
+            setattr(ret, name, value)
+        ret.log_address = log.get("address")
+        ret.log_block_number = log.get("blockNumber")
+        ret.log_transaction_hash = log.get("transactionHash")
+        ret.log_index = log.get("logIndex")
+        return ret
 
-class FunctionInfo(pydantic.BaseModel):
-    inputs: List[ParamType] = []
-    outputs: List[ParamType] = []
-    name: str
-    stateMutability: Optional[str] = None
+    @classmethod
+    def decode_logs(cls, logs: Iterable[dict]) -> list:
+        """Decode a batch of raw logs of this event."""
+        decode_values = cls.get_decoder().decode_values
+        return [cls.from_values(decode_values(log), log) for log in logs]
 
+    def to_dict(self) -> Dict[str, Any]:
+        """Decoded event arguments by field name."""
+        return {it: getattr(self, it) for it in self.__slots__}
+
+    def __repr__(self):
+        arguments = ", ".join(f"{it}={getattr(self, it)!r}" for it in self.__slots__)
+        return f"{type(self).__name__}({arguments})"
+
+
+DEFAULT_MAX_LOGS_PER_CHUNK = 10000
 
-class ContractInfo(BaseConfig):
-    contract_container: ContractContainer
-    abi_list: List[ContractABI]
-    deploy_abi: ContractABI
-    function_info_list: List[FunctionInfo] = []
+
+def iter_log_chunks(
+    web3,
+    log_filter: dict,
+    from_block: int,
+    to_block: int,
+    chunk_size: int = DEFAULT_LOG_CHUNK_SIZE,
+    max_logs_per_chunk: int = DEFAULT_MAX_LOGS_PER_CHUNK,
+) -> Iterator[Tuple[int, int, list]]:
+    """
+    Page `eth_getLogs` over the block range, yielding `(chunk_from_block, chunk_to_block, logs)`.
+
+    The chunk is halved whenever the node rejects a range (too many results, timeouts)
+    or returns more than `max_logs_per_chunk` logs, and doubled after sparse chunks,
+    up to the last size the node rejected.
+    """
+    max_chunk_size = chunk_size * 16
+    start = from_block
+    while start <= to_block:
+        end = min(start + chunk_size - 1, to_block)
+        try:
+            logs = web3.eth.get_logs({**log_filter, "fromBlock": start, "toBlock": end})
+        except Exception:
+            if chunk_size == 1:
+                raise
+            chunk_size = max(1, chunk_size // 2)
+            # do not grow back to a range the node already rejected
+            max_chunk_size = chunk_size
+            continue
+        yield start, end, logs
+        start = end + 1
+        if len(logs) > max_logs_per_chunk:
+            chunk_size = max(1, chunk_size // 2)
+        elif len(logs) < max_logs_per_chunk // 4:
+            chunk_size = min(max_chunk_size, chunk_size * 2)
+
+
+class ContractCache:
+    """
+    Bounded LRU cache of contract wrappers resolved by address.
+
+    At most `maxsize` wrappers are kept alive by the cache. Evicted wrappers stay
+    retrievable for as long as something else still references them.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._lru: collections.OrderedDict = collections.OrderedDict()
+        self._weak: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
+
+    def get(self, key: tuple) -> Optional["ContractInstance"]:
+        with self._lock:
+            value = self._lru.get(key)
+            if value is not None:
+                self._lru.move_to_end(key)
+                return value
+            value = self._weak.get(key)
+            if value is not None:
+                self._put(key, value)
+            return value
+
+    def put(self, key: tuple, value: "ContractInstance"):
+        with self._lock:
+            self._put(key, value)
+
+    def _put(self, key: tuple, value: "ContractInstance"):
+        self._lru[key] = value
+        self._lru.move_to_end(key)
+        self._weak[key] = value
+        while len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+
+    def invalidate(
+        self,
+        contract_class: Optional[Type["ContractInstance"]] = None,
+        address: Optional[str] = None,
+    ):
+        """Drop cached wrappers, optionally only those of a contract class and/or address."""
+        with self._lock:
+            for key in list(self._weak.keys()):
+                key_class, key_address = key[0], key[1]
+                if contract_class is not None and key_class is not contract_class:
+                    continue
+                if address is not None and key_address != address.lower():
+                    continue
+                self._lru.pop(key, None)
+                self._weak.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+            self._weak.clear()
+
+    def __len__(self):
+        return len(self._weak)
+
+
+contract_cache = ContractCache()
+"""Process-wide cache used by `ContractInstance.from_address`."""
 
 
 # TODO: resolve external contract abi and generate api code for them
@@ -174,35 +965,162 @@ class ContractInstance(abc.ABC):
     _project: Project
     _contract_info: ContractInfo
     _contract_name: str
+    _events: Dict[str, Type[EventBase]] = {}
+    """Generated event classes by topic hash."""
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # generated `Function` classes cannot see their enclosing class, so hand them what they need
+        function_class = cls.__dict__.get("Function")
+        if function_class is not None and "_contract_info" in cls.__dict__:
+            function_class._contract_info = cls._contract_info
+            function_class._structs = collect_structs(cls.__dict__.get("Struct"))
+            function_class._output_decoders = {}
 
     def __init__(
         self,
-        contract: Union[ProjectContract, Contract],
-        issuer: Optional[Account] = None,
+        contract: Union[ProjectContract, Contract, EVMContract],
+        issuer: Optional[Union[Account, str]] = None,
     ):  # to create you need to either deploy or load contract by address
         self._contract = contract
-        if issuer is None:
+        if issuer is None and contract.tx is not None:
+            # contracts loaded by address have no deployment transaction
             issuer = cast(Account, contract.tx.sender)
         self.properties = ContractProperties.from_contract(
             contract=self._contract, issuer=issuer
         )
 
     @classmethod
-    def from_address(cls, address: str):
-        contract = Contract.from_abi(
-            cls._contract_name, address, cls._contract_info.contract_container.abi
-        )
-        ret = cls(contract=contract)
+    def get_abi_hash(cls) -> str:
+        abi_hash = cls.__dict__.get("_abi_hash")
+        if abi_hash is None:
+            abi = json.dumps(cls._contract_info.abi, sort_keys=True)
+            abi_hash = hashlib.sha256(abi.encode()).hexdigest()
+            setattr(cls, "_abi_hash", abi_hash)
+        return abi_hash
+
+    @classmethod
+    def from_address(
+        cls,
+        address: str,
+        issuer: Optional[Union[Account, str]] = None,
+        use_cache: bool = True,
+    ):
+        """
+        Load the contract deployed at `address`.
+
+        Resolved wrappers are cached in `contract_cache` per contract class, address, ABI and
+        backend, so resolving the same address again is a dictionary lookup.
+        """
+        backend = get_evm_backend()
+        cache_key = (cls, address.lower(), cls.get_abi_hash(), backend)
+        cached = contract_cache.get(cache_key) if use_cache else None
+        if cached is not None:
+            if issuer is None or issuer == cached.properties.issuer:
+                return cached
+            return cls(contract=cached._contract, issuer=issuer)
+
+        if backend is not None:
+            contract = backend.at(cls._contract_name, cls._contract_info, address)
+        else:
+            from brownie.network.contract import Contract
+
+            contract = Contract.from_abi(
+                cls._contract_name, address, cls._contract_info.abi
+            )
+        ret = cls(contract=contract, issuer=issuer)
+        if use_cache:
+            contract_cache.put(cache_key, ret)
         return ret
 
+    @classmethod
+    def invalidate_cache(cls, address: Optional[str] = None):
+        """Drop cached wrappers of this contract class, optionally only for `address`."""
+        contract_cache.invalidate(cls, address)
+
+    def iter_event_chunks(
+        self,
+        from_block: int,
+        to_block: Optional[int] = None,
+        chunk_size: int = DEFAULT_LOG_CHUNK_SIZE,
+        events: Optional[List[Type[EventBase]]] = None,
+        web3=None,
+    ) -> Iterator[Tuple[int, int, List[EventBase]]]:
+        """
+        Like `iter_events`, but yields `(chunk_from_block, chunk_to_block, events)` per fetched chunk,
+        including chunks without any event.
+        """
+        if web3 is None:
+            from brownie.network import web3
+        if events is None:
+            events = list(self._events.values())
+        # anonymous events have no topic to filter on
+        event_classes = [it for it in events if it.topic is not None]
+        if event_classes == []:
+            return
+        if to_block is None:
+            to_block = web3.eth.block_number
+        event_class_by_topic = {it.topic: it for it in event_classes}
+        log_filter = {
+            "address": self._contract.address,
+            "topics": [list(event_class_by_topic.keys())],
+        }
+        for chunk_from_block, chunk_to_block, logs in iter_log_chunks(
+            web3, log_filter, from_block, cast(int, to_block), chunk_size
+        ):
+            decoded = []
+            for log in logs:
+                topic = "0x" + _to_bytes(log["topics"][0]).hex()
+                event_class = event_class_by_topic[topic]
+                decoded.append(
+                    event_class.from_values(
+                        event_class.get_decoder().decode_values(log), log
+                    )
+                )
+            yield chunk_from_block, chunk_to_block, decoded
 
-class ProjectInfo(BaseConfig):
+    def iter_events(
+        self,
+        from_block: int,
+        to_block: Optional[int] = None,
+        chunk_size: int = DEFAULT_LOG_CHUNK_SIZE,
+        events: Optional[List[Type[EventBase]]] = None,
+        web3=None,
+    ) -> Iterator[EventBase]:
+        """
+        Stream decoded events emitted by this contract, in chain order.
+
+        Logs are fetched in adaptive block chunks and decoded one chunk at a time,
+        so memory stays bounded by the chunk size. Only `events` are fetched if given.
+        """
+        for _, _, decoded in self.iter_event_chunks(
+            from_block, to_block, chunk_size, events, web3
+        ):
+            yield from decoded
+
+    @classmethod
+    def _deploy_contract(
+        cls, parameters: "ContractDeployParameters"
+    ) -> Union[ProjectContract, EVMContract]:
+        """Deploy through the engaged embedded EVM backend if any, otherwise through brownie."""
+        with instrumentation.span("abi2api.deploy", contract=cls._contract_name):
+            backend = get_evm_backend()
+            if backend is not None:
+                return backend.deploy(cls._contract_name, cls._contract_info, parameters)
+            if not isinstance(cls._contract_info, ContractInfo):
+                raise Exception(
+                    f"Contract '{cls._contract_name}' has no brownie contract container, deploy it on an engaged EVMBackend instead"
+                )
+            return cls._contract_info.contract_container.deploy(*parameters.to_args())
+
+
+class ProjectInfo(AbiProjectInfo, BaseConfig):
     project: Project
     contracts_info: Dict[str, ContractInfo]
 
 
 class ContractDeployParameters(BaseConfig):
-    issuer: Account  # can you validate that in pydantic? otherwise just use normal class instead, or beartype it.
+    issuer: Union[Account, str]  # can you validate that in pydantic? otherwise just use normal class instead, or beartype it.
     args: List = []
     kwargs: Dict = {}
 
@@ -224,42 +1142,257 @@ class ContractDeployParameters(BaseConfig):
         return args
 
 
-# Account.deploy()
-# brownie.accounts
+class NonceManager:
+    """
+    Hands out consecutive nonces per issuer address, without asking the node each time.
+    The first nonce of an address is its pending transaction count.
+    Nonces are reserved before broadcasting, so broadcasts from one address run concurrently,
+    and reserved nonces are either consumed or released once the broadcast is over.
+    """
 
-# it is using setattr under the hood, to create methods for deployed contracts.
+    def __init__(self, web3=None):
+        self._web3 = web3
+        self._lock = threading.Lock()
+        self._address_locks: Dict[str, threading.Condition] = {}
+        self._next_nonce: Dict[str, int] = {}
+        self._released: Dict[str, List[int]] = {}
+        """Released nonces below the next one, handed out again before it."""
+        self._reserved: Dict[str, Set[int]] = {}
+        """Nonces whose broadcast is in progress."""
+
+    @property
+    def web3(self):
+        if self._web3 is None:
+            from brownie.network import web3
+
+            self._web3 = web3
+        return self._web3
+
+    def address_lock(self, address: str) -> threading.Condition:
+        with self._lock:
+            return self._address_locks.setdefault(
+                address.lower(), threading.Condition(threading.Lock())
+            )
+
+    def peek(self, address: str) -> int:
+        """The next nonce of the address. Call with `address_lock(address)` held."""
+        key = address.lower()
+        if key not in self._next_nonce:
+            self._next_nonce[key] = self.web3.eth.get_transaction_count(
+                address, "pending"
+            )
+        return self._next_nonce[key]
+
+    def advance(self, address: str):
+        """Mark the nonce returned by `peek` as used. Call with `address_lock(address)` held."""
+        self._next_nonce[address.lower()] += 1
+
+    def reserve(self, address: str) -> int:
+        """Take the lowest free nonce of the address, to be consumed or released after broadcasting."""
+        key = address.lower()
+        with self.address_lock(address):
+            released = self._released.get(key)
+            if released:
+                nonce = released.pop(0)
+            else:
+                nonce = self.peek(address)
+                self.advance(address)
+            self._reserved.setdefault(key, set()).add(nonce)
+            return nonce
+
+    def consume(self, address: str, nonce: int):
+        """Mark a reserved nonce as used by a broadcasted transaction."""
+        condition = self.address_lock(address)
+        with condition:
+            self._reserved[address.lower()].discard(nonce)
+            condition.notify_all()
+
+    def release(self, address: str, nonce: int):
+        """Give back a reserved nonce no transaction was broadcasted with."""
+        key = address.lower()
+        condition = self.address_lock(address)
+        with condition:
+            self._reserved[key].discard(nonce)
+            if key in self._next_nonce:
+                released = self._released.setdefault(key, [])
+                bisect.insort(released, nonce)
+                # released nonces right below the next one need no gap filling
+                while released != [] and released[-1] == self._next_nonce[key] - 1:
+                    self._next_nonce[key] = released.pop()
+            condition.notify_all()
+
+    def reset(self, address: Optional[str] = None):
+        """
+        Forget local nonces, so they are read from the node again.
+        Waits for submissions in progress from the address, or from every address if none is given.
+        """
+        if address is None:
+            with self._lock:
+                addresses = list(self._address_locks.keys())
+        else:
+            addresses = [address]
+        for it in addresses:
+            key = it.lower()
+            condition = self.address_lock(it)
+            with condition:
+                condition.wait_for(lambda: not self._reserved.get(key))
+                self._next_nonce.pop(key, None)
+                self._released.pop(key, None)
+
+
+class PendingTransaction:
+    """A submitted transaction, with every broadcast made for its nonce."""
+
+    def __init__(
+        self,
+        method,
+        args: tuple,
+        txparams: TransactionParameters,
+        receipt,
+    ):
+        self.method = method
+        self.args = args
+        self.txparams = txparams
+        self.receipts = [receipt]
+        """Broadcasted receipts, the last one being the latest replacement."""
 
+    @property
+    def nonce(self) -> int:
+        return cast(int, self.txparams.nonce)
+
+    @property
+    def replacements(self) -> int:
+        return len(self.receipts) - 1
 
-def parse_abi(abi: dict) -> ContractABI:
-    abi_serialized = ContractABI.parse_obj(abi)
-    return abi_serialized
 
+class TransactionPipeline:
+    """
+    Submit transactions of generated contract methods without waiting for confirmations.
 
-def parse_function_info(abi: ContractABI) -> Optional[FunctionInfo]:
-    # usually function is of our interest.
-    if abi.type == FUNCTION_TYPE:
-        return FunctionInfo(
-            inputs=abi.inputs,
-            outputs=abi.outputs,
-            name=cast(str, abi.name),
-            stateMutability=abi.stateMutability,
+    Nonces are allocated locally per issuer, so many transactions of the same account can
+    be in flight at once. Receipts are tracked concurrently, and transactions still pending
+    after `stuck_timeout` seconds are replaced with the same nonce and a bumped gas price.
+
+    Usage:
+        pipeline = abi2api.TransactionPipeline()
+        futures = [pipeline.submit(token.function.transfer, to, 1, _txparams=txparams) for to in receivers]
+        receipts = [it.result() for it in futures]
+    """
+
+    def __init__(
+        self,
+        web3=None,
+        max_workers: int = 16,
+        required_confs: int = 1,
+        stuck_timeout: float = 120.0,
+        gas_price_bump: float = 1.125,
+        max_replacements: int = 3,
+        poll_interval: float = 1.0,
+    ):
+        self.nonces = NonceManager(web3)
+        self.required_confs = required_confs
+        self.stuck_timeout = stuck_timeout
+        self.gas_price_bump = gas_price_bump
+        self.max_replacements = max_replacements
+        self.poll_interval = poll_interval
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="pytract-tx"
         )
 
+    def submit(
+        self, method, *args, _txparams: TransactionParameters
+    ) -> "concurrent.futures.Future":
+        """
+        Broadcast `method(*args)` with the next local nonce of the issuer and return immediately.
+        The returned future resolves to the confirmed receipt.
+
+        If the broadcast fails, its nonce is given back unless the node counts it as pending,
+        since a timeout or a dropped connection may come after the node got the transaction.
+        When the node cannot be asked either, the nonce stays used; `nonces.reset()` reads it again.
+        """
+        address = get_issuer_address(_txparams.issuer)
+        nonce = self.nonces.reserve(address)
+        txparams = _txparams.copy(update=dict(nonce=nonce, required_confs=0))
+        try:
+            receipt = method(*args, _txparams=txparams)
+        except BaseException:
+            if self._is_nonce_pending(address, nonce):
+                self.nonces.consume(address, nonce)
+            else:
+                self.nonces.release(address, nonce)
+            raise
+        self.nonces.consume(address, nonce)
+        pending = PendingTransaction(method, args, txparams, receipt)
+        return self._executor.submit(self._track, pending)
+
+    def _is_nonce_pending(self, address: str, nonce: int) -> bool:
+        """Whether the node has a transaction with the nonce. Assumed so when the node cannot tell."""
+        try:
+            pending_count = self.nonces.web3.eth.get_transaction_count(
+                address, "pending"
+            )
+        except Exception:
+            return True
+        return pending_count > nonce
+
+    def _mined_receipt(self, pending: PendingTransaction):
+        from web3.exceptions import TransactionNotFound
+
+        web3 = self.nonces.web3
+        for receipt in pending.receipts:
+            try:
+                web3.eth.get_transaction_receipt(receipt.txid)
+                return receipt
+            except TransactionNotFound:
+                continue
 
-def parse_function_info_list(abi_list: List[ContractABI]) -> List[FunctionInfo]:
-    ret = []
-    for abi in abi_list:
-        function_info = parse_function_info(abi)
-        if function_info is not None:
-            ret.append(function_info)
-    return ret
+    def _replace(self, pending: PendingTransaction):
+        """Rebroadcast with the same nonce and a gas price high enough to replace the stuck one."""
+        last_receipt = pending.receipts[-1]
+        bump = self.gas_price_bump
+        if getattr(last_receipt, "max_fee", None) is not None:
+            update = dict(
+                max_fee=int(last_receipt.max_fee * bump) + 1,
+                priority_fee=int(last_receipt.priority_fee * bump) + 1,
+                gas_price=None,
+            )
+        else:
+            update = dict(gas_price=int(last_receipt.gas_price * bump) + 1)
+        pending.txparams = pending.txparams.copy(update=update)
+        receipt = pending.method(*pending.args, _txparams=pending.txparams)
+        pending.receipts.append(receipt)
+
+    def _track(self, pending: PendingTransaction):
+        deadline = time.monotonic() + self.stuck_timeout
+        while True:
+            mined = self._mined_receipt(pending)
+            if mined is not None:
+                if self.required_confs > 0:
+                    mined.wait(self.required_confs)
+                return mined
+            if time.monotonic() >= deadline:
+                if pending.replacements >= self.max_replacements:
+                    raise TimeoutError(
+                        f"Transaction with nonce {pending.nonce} still pending after {pending.replacements} replacements"
+                    )
+                self._replace(pending)
+                deadline = time.monotonic() + self.stuck_timeout
+            time.sleep(self.poll_interval)
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
 
 
-def parse_abi_list(abi_list: List[dict]) -> List[ContractABI]:
-    ret = []
-    for it in abi_list:
-        ret.append(parse_abi(it))
-    return ret
+# Account.deploy()
+# brownie.accounts
+
+# it is using setattr under the hood, to create methods for deployed contracts.
 
 
 # def load_project_and_generate_api_code(project_path: str):
@@ -275,14 +1408,35 @@ def load_project_info_for_api():
     )
 
     project_info = load_project_and_get_project_info(project_path)
+    project_info.selector_index_path = os.path.join(
+        project_path, API_RELATIVE_DIR, SELECTOR_INDEX_FILENAME
+    )
     return project_info
 
 
+def get_contract_info(contract_container: ContractContainer) -> ContractInfo:
+    deploy_abi = parse_abi(contract_container.deploy.abi)
+    abi_list = parse_abi_list(contract_container.abi)
+    function_info_list = parse_function_info_list(abi_list)
+    event_info_list = parse_event_info_list(abi_list)
+    return ContractInfo(
+        contract_container=contract_container,
+        abi=contract_container.abi,
+        bytecode=contract_container.bytecode or None,
+        abi_list=abi_list,
+        deploy_abi=deploy_abi,
+        function_info_list=function_info_list,
+        event_info_list=event_info_list,
+    )
+
+
 def load_project_and_get_project_info(project_path: str):
     # generate api code for every possible contract
     # for every contract one can load, deploy and call meth  # this is the constructor abi, which can be used for getting all allowed parameters.od
     # you should mark the absolute path of the contract source file in the generated api code.
 
+    from brownie import project
+
     _project: Project = project.load(project_path)
 
     contracts: Dict[str, ContractContainer] = _project.dict()
@@ -298,15 +1452,7 @@ def load_project_and_get_project_info(project_path: str):
 
     for k, v in contracts.items():
         # it.deploy()  # how to deploy successfully?
-        deploy_abi = parse_abi(v.deploy.abi)
-        abi_list = parse_abi_list(v.abi)
-        function_info_list = parse_function_info_list(abi_list)
-        contracts_info[k] = ContractInfo(
-            contract_container=v,
-            abi_list=abi_list,
-            deploy_abi=deploy_abi,
-            function_info_list=function_info_list,
-        )
+        contracts_info[k] = get_contract_info(v)
         # abi.inputs  # this is the constructor abi, which can be used for getting all allowed parameters.
         # constructor does not return anything.
         # actually calling account.deploy
@@ -317,85 +1463,8 @@ def load_project_and_get_project_info(project_path: str):
     return project_info
 
 
-def get_names_from_list(obj):
-    return [param.name for param in obj]
-
-
-def get_types_from_list(obj):
-    return [param.type_hint for param in obj]
-
-
-def check_function_type_not_pure(function_type):
-    return function_type not in ["view", "pure"]
-
-
 def generate_api_code_for_project(project_path: str):
 
     # write to '<project_path>/api'
     project_info = load_project_and_get_project_info(project_path)
-
-    api_code_directory_path = os.path.join(project_path, API_RELATIVE_DIR)
-    ensure_dir(api_code_directory_path)
-
-    with open(os.path.join(api_code_directory_path, "_contracts.py"), "w+") as f:
-        template = jinja2.Template(
-            open(_API_TEMPLATE_PATH).read(),
-            trim_blocks=True,
-            lstrip_blocks=True,
-            undefined=jinja2.StrictUndefined,
-        )
-        template.globals.update(
-            dict(
-                get_names_from_list=get_names_from_list,
-                get_types_from_list=get_types_from_list,
-                check_function_type_not_pure=check_function_type_not_pure,
-                list=list,
-            )
-        )
-        content = template.render(project_info=project_info)
-        content = black.format_str(content, mode=black.mode.Mode())
-        f.write(content)
-
-    with open(os.path.join(api_code_directory_path, "contracts.py"), "w+") as f:
-        content = """from ._contracts import *"""
-        f.write(content)
-
-    with open(os.path.join(api_code_directory_path, "__init__.py"), "w+") as f:
-        content = """from . import contracts
-from ._project import project_info"""
-        f.write(content)
-
-    with open(os.path.join(api_code_directory_path, "_project.py"), "w+") as f:
-        content = """from pytract import abi2api
-project_info = abi2api.load_project_info_for_api()"""
-        f.write(content)
-
-    with open(os.path.join(project_path, "__init__.py"), "w+") as f:
-        content = """from . import api"""
-        f.write(content)
-
-
-# TODO: handle multi-dimentional type specification
-
-# class TypeAnnotation(pydantic.BaseModel):
-#     name: str
-#     length: int
-
-
-# def parse_single_type_annotation(type_annotation: str):
-#     length = 0
-#     if type_annotation.endswith("]"):
-#         type_name, length_text = type_annotation.split("[")
-#         length_text = length_text.strip("]")
-#         length = int(length_text)
-#     else:
-#         type_name = type_annotation
-#     ret = TypeAnnotation(name=type_name, length=length)
-#     return ret
-
-TYPE_PREFIX_TRANSLATION_TABLE_INVERTED = {
-    "tuple": ["tuple"],
-    "int": ["uint", "int"],
-    "bytes": ["bytes"],
-    "str": ['string']
-}
+    ApiCodeGenerator().write_project(project_path, project_info)
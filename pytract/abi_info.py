@@ -0,0 +1,609 @@
+"""
+Contract ABI models and parsing, independent of brownie.
+
+Everything needed to interpret ABIs and render API code lives here, so code generation from
+plain ABI files does not import brownie or web3.
+"""
+
+import json
+import keyword
+import os
+from typing import Any, Dict, List, Optional, Tuple, Union, cast
+
+import pydantic
+
+from .constants import (
+    CONSTRUCTOR_TYPE,
+    EVENT_TYPE,
+    FUNCTION_TYPE,
+    SELECTOR_INDEX_FILENAME,
+)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def load_json_file(path: str) -> Any:
+    """Load a JSON file, with `orjson` if installed."""
+    if orjson is not None:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+# TODO: recursively resolve and create tuple type hints for languages like vyper
+class ParamType(pydantic.BaseModel):
+    type: str
+    name: str = ""  # mostly ignored
+    components: list["ParamType"] = []
+    indexed: bool = False  # only for event inputs
+    internalType: Optional[str] = None
+
+    @property
+    def is_array(self) -> bool:
+        return self.type.endswith("]")
+
+    @property
+    def element(self) -> "ParamType":
+        """Element type of an array type, like `tuple` for `tuple[]`."""
+        return self.copy(update=dict(type=self.type[: self.type.rindex("[")]))
+
+    @property
+    def struct_name(self) -> Optional[str]:
+        """Struct name declared in the source, like `Position` for internal type `struct Pool.Position[]`."""
+        if self.internalType is None or not self.internalType.startswith("struct "):
+            return None
+        return self.internalType.split(".")[-1].split(" ")[-1].split("[")[0]
+
+    def has_struct(self) -> bool:
+        return self.type.startswith("tuple")
+
+    @property
+    def type_hint(self):
+        return self.resolve_type_hint(self)
+
+    @property
+    def canonical_type(self) -> str:
+        """Type as written in signatures, with tuples expanded into their components, like `(uint256,string)[2]`."""
+        if self.type.startswith("tuple"):
+            component_types = ",".join(it.canonical_type for it in self.components)
+            return f"({component_types}){self.type[len('tuple'):]}"
+        return self.type
+
+    @property
+    def is_dynamic(self) -> bool:
+        """Whether an indexed value of this type is stored as a hash in the log topic."""
+        return (
+            self.type in ["string", "bytes"]
+            or self.type.startswith("tuple")
+            or self.type.endswith("]")
+        )
+
+    @staticmethod
+    def resolve_type_hint(obj: "ParamType"):
+        if obj.components == []:
+            return obj.type
+        else:
+            it_type_hints = []
+            for it in obj.components:
+                it_type_hints.append(ParamType.resolve_type_hint(it))
+            return f"{obj.type}({', '.join(it_type_hints)})"
+
+
+class ContractABI(pydantic.BaseModel):
+    inputs: List[ParamType] = []
+    outputs: List[ParamType] = []
+    type: Optional[str] = None
+    stateMutability: Optional[str] = None
+    name: Optional[str] = None
+    anonymous: Optional[bool] = None
+
+
+class FunctionInfo(pydantic.BaseModel):
+    inputs: List[ParamType] = []
+    outputs: List[ParamType] = []
+    name: str
+    stateMutability: Optional[str] = None
+
+    @property
+    def signature(self) -> str:
+        return f"{self.name}({','.join(it.canonical_type for it in self.inputs)})"
+
+    @property
+    def selector(self) -> str:
+        """The 4-byte function selector prefixing the calldata, as hex."""
+        from eth_utils import keccak
+
+        return "0x" + keccak(text=self.signature)[:4].hex()
+
+
+EVENT_LOG_METADATA_FIELDS = (
+    "log_address",
+    "log_block_number",
+    "log_transaction_hash",
+    "log_index",
+)
+EVENT_RESERVED_NAMES = EVENT_LOG_METADATA_FIELDS + (
+    "topic",
+    "get_decoder",
+    "from_values",
+    "decode_logs",
+    "to_dict",
+)
+
+
+class EventInfo(pydantic.BaseModel):
+    inputs: List[ParamType] = []
+    name: str
+    anonymous: bool = False
+
+    @property
+    def signature(self) -> str:
+        return f"{self.name}({','.join(it.canonical_type for it in self.inputs)})"
+
+    @property
+    def topic(self) -> str:
+        """The topic hash identifying this event, found as the first topic of non-anonymous event logs."""
+        from eth_utils import keccak
+
+        return "0x" + keccak(text=self.signature).hex()
+
+    @property
+    def field_names(self) -> List[str]:
+        """Input names usable as Python attributes, in ABI order."""
+        ret = []
+        for index, it in enumerate(self.inputs):
+            name = it.name if it.name != "" else f"arg{index}"
+            if keyword.iskeyword(name) or name in EVENT_RESERVED_NAMES:
+                name = f"{name}_"
+            ret.append(name)
+        return ret
+
+
+class AbiContractInfo(pydantic.BaseModel):
+    """ABI of a contract, parsed. Extended by `abi2api.ContractInfo` with the brownie contract container."""
+
+    abi: List[dict] = []
+    """The ABI as found in the build artifact."""
+    bytecode: Optional[str] = None
+    """Creation bytecode as hex, if known. Contracts known only by their ABI cannot be deployed."""
+    abi_list: List[ContractABI]
+    deploy_abi: ContractABI
+    function_info_list: List[FunctionInfo] = []
+    event_info_list: List[EventInfo] = []
+
+    def get_event_info(self, name: str) -> EventInfo:
+        for it in self.event_info_list:
+            if it.name == name:
+                return it
+        raise KeyError(f"Event '{name}' not found")
+
+    @classmethod
+    def from_abi(cls, abi: List[dict], bytecode: Optional[str] = None):
+        abi_list = parse_abi_list(abi)
+        deploy_abi_list = [it for it in abi_list if it.type == CONSTRUCTOR_TYPE]
+        return cls(
+            abi=abi,
+            bytecode=bytecode or None,
+            abi_list=abi_list,
+            deploy_abi=(
+                deploy_abi_list[0]
+                if deploy_abi_list != []
+                else ContractABI(type=CONSTRUCTOR_TYPE)
+            ),
+            function_info_list=parse_function_info_list(abi_list),
+            event_info_list=parse_event_info_list(abi_list),
+        )
+
+
+def _to_bytes(value: Union[str, bytes]) -> bytes:
+    if isinstance(value, str):
+        return bytes.fromhex(value.removeprefix("0x"))
+    return bytes(value)
+
+
+def get_tuple_decoder(types: List[str]):
+    """ABI decoder of a tuple of types. eth_abi has no empty tuples, so those decode to `()` here."""
+    from eth_abi.registry import registry
+
+    if types == []:
+        return lambda stream: ()
+    return registry.get_decoder(f"({','.join(types)})")
+
+
+class EventDecoder:
+    """
+    Log decoder of a single event. ABI decoders are resolved once here,
+    so decoding a log only runs the precompiled decoders.
+    """
+
+    def __init__(self, event_info: EventInfo):
+        from eth_abi.registry import registry
+
+        self.event_info = event_info
+        self.field_count = len(event_info.inputs)
+        first_topic_index = 0 if event_info.anonymous else 1
+        self._indexed_decoders: List[Tuple[int, int, Any]] = []
+        self._data_positions: List[int] = []
+        data_types = []
+        for position, it in enumerate(event_info.inputs):
+            if it.indexed:
+                topic_index = first_topic_index + len(self._indexed_decoders)
+                # dynamic values are only available as their hash
+                decoder = None if it.is_dynamic else registry.get_decoder(it.type)
+                self._indexed_decoders.append((position, topic_index, decoder))
+            else:
+                self._data_positions.append(position)
+                data_types.append(it.canonical_type)
+        self._data_decoder = get_tuple_decoder(data_types)
+
+    def decode_values(self, log: dict) -> List[Any]:
+        """Decode event arguments of a raw log, in ABI order."""
+        from eth_abi.decoding import ContextFramesBytesIO
+
+        values: List[Any] = [None] * self.field_count
+        topics = log["topics"]
+        for position, topic_index, decoder in self._indexed_decoders:
+            topic = _to_bytes(topics[topic_index])
+            values[position] = (
+                topic if decoder is None else decoder(ContextFramesBytesIO(topic))
+            )
+        if self._data_positions:
+            data_values = self._data_decoder(
+                ContextFramesBytesIO(_to_bytes(log["data"]))
+            )
+            for position, value in zip(self._data_positions, data_values):
+                values[position] = value
+        return values
+
+
+class SelectorIndex(pydantic.BaseModel):
+    """
+    Function selectors and event topics of every contract in a project,
+    mapped to the contracts and ABI entries they belong to.
+    """
+
+    functions: Dict[str, List[Tuple[str, FunctionInfo]]] = {}
+    events: Dict[str, List[Tuple[str, EventInfo]]] = {}
+    addresses: Dict[str, str] = {}
+    """Lowercase addresses of deployed contracts, mapped to their contract names."""
+    _calldata_decoders: Dict[str, Any] = pydantic.PrivateAttr(default_factory=dict)
+    _event_decoders: Dict[str, EventDecoder] = pydantic.PrivateAttr(
+        default_factory=dict
+    )
+
+    @classmethod
+    def from_contracts_info(cls, contracts_info: Dict[str, AbiContractInfo]):
+        functions: Dict[str, List[Tuple[str, FunctionInfo]]] = {}
+        events: Dict[str, List[Tuple[str, EventInfo]]] = {}
+        for contract_name, contract_info in contracts_info.items():
+            for function_info in contract_info.function_info_list:
+                functions.setdefault(function_info.selector, []).append(
+                    (contract_name, function_info)
+                )
+            for event_info in contract_info.event_info_list:
+                if not event_info.anonymous:
+                    events.setdefault(event_info.topic, []).append(
+                        (contract_name, event_info)
+                    )
+        return cls(functions=functions, events=events)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, "r") as f:
+            return cls.parse_raw(f.read())
+
+    def save(self, path: str):
+        from .utils import atomic_write
+
+        atomic_write(path, self.json())
+
+    def lookup_function(
+        self, calldata: Union[str, bytes]
+    ) -> List[Tuple[str, FunctionInfo]]:
+        """`(contract name, function info)` of every function matching the calldata selector."""
+        return self.functions.get("0x" + _to_bytes(calldata)[:4].hex(), [])
+
+    def lookup_event(self, topic: Union[str, bytes]) -> List[Tuple[str, EventInfo]]:
+        """`(contract name, event info)` of every event with the given topic hash."""
+        return self.events.get("0x" + _to_bytes(topic).hex(), [])
+
+    def register_address(self, address: str, contract_name: str):
+        """Record the contract deployed at `address`, whose functions are preferred for calldata sent to it."""
+        self.addresses[address.lower()] = contract_name
+
+    def decode_calldata(
+        self, calldata: Union[str, bytes], to: Optional[str] = None
+    ) -> Optional[Tuple[List[Tuple[str, FunctionInfo]], tuple]]:
+        """
+        Decode the arguments of the calldata, along with its candidate functions.
+        Selectors may collide across signatures, so the signatures are tried in turn,
+        starting with the contract registered for the `to` address, and only the
+        candidates of the signature that decoded are returned.
+        Returns None for unknown selectors, or calldata no signature decodes.
+        """
+        from eth_abi.decoding import ContextFramesBytesIO
+        from eth_abi.exceptions import DecodingError
+
+        calldata = _to_bytes(calldata)
+        candidates = self.functions.get("0x" + calldata[:4].hex())
+        if candidates is None:
+            return None
+        contract_name = None if to is None else self.addresses.get(to.lower())
+        by_signature: Dict[str, List[Tuple[str, FunctionInfo]]] = {}
+        # sorting is stable, so the other candidates keep their order
+        for candidate in sorted(candidates, key=lambda it: it[0] != contract_name):
+            by_signature.setdefault(candidate[1].signature, []).append(candidate)
+        for signature, signature_candidates in by_signature.items():
+            decoder = self._calldata_decoders.get(signature)
+            if decoder is None:
+                decoder = self._calldata_decoders[signature] = get_tuple_decoder(
+                    [it.canonical_type for it in signature_candidates[0][1].inputs]
+                )
+            try:
+                return signature_candidates, decoder(
+                    ContextFramesBytesIO(calldata[4:])
+                )
+            except DecodingError:
+                continue
+        return None
+
+    def decode_log(
+        self, log: dict
+    ) -> Optional[Tuple[List[Tuple[str, EventInfo]], List[Any]]]:
+        """Decode the event arguments of a raw log, along with its candidate events."""
+        if len(log["topics"]) == 0:
+            return None
+        topic = "0x" + _to_bytes(log["topics"][0]).hex()
+        candidates = self.events.get(topic)
+        if candidates is None:
+            return None
+        decoder = self._event_decoders.get(topic)
+        if decoder is None:
+            decoder = self._event_decoders[topic] = EventDecoder(candidates[0][1])
+        return candidates, decoder.decode_values(log)
+
+
+def parse_abi(abi: dict) -> ContractABI:
+    abi_serialized = ContractABI.parse_obj(abi)
+    return abi_serialized
+
+
+def parse_function_info(abi: ContractABI) -> Optional[FunctionInfo]:
+    # usually function is of our interest.
+    if abi.type == FUNCTION_TYPE:
+        return FunctionInfo(
+            inputs=abi.inputs,
+            outputs=abi.outputs,
+            name=cast(str, abi.name),
+            stateMutability=abi.stateMutability,
+        )
+
+
+def parse_event_info(abi: ContractABI) -> Optional[EventInfo]:
+    if abi.type == EVENT_TYPE:
+        return EventInfo(
+            inputs=abi.inputs,
+            name=cast(str, abi.name),
+            anonymous=bool(abi.anonymous),
+        )
+
+
+def parse_event_info_list(abi_list: List[ContractABI]) -> List[EventInfo]:
+    ret = []
+    for abi in abi_list:
+        event_info = parse_event_info(abi)
+        if event_info is not None:
+            ret.append(event_info)
+    return ret
+
+
+def parse_function_info_list(abi_list: List[ContractABI]) -> List[FunctionInfo]:
+    ret = []
+    for abi in abi_list:
+        function_info = parse_function_info(abi)
+        if function_info is not None:
+            ret.append(function_info)
+    return ret
+
+
+def parse_abi_list(abi_list: List[dict]) -> List[ContractABI]:
+    ret = []
+    for it in abi_list:
+        ret.append(parse_abi(it))
+    return ret
+
+
+def get_names_from_list(obj):
+    return [param.name for param in obj]
+
+
+def get_types_from_list(obj):
+    return [param.type_hint for param in obj]
+
+
+def check_function_type_not_pure(function_type):
+    return function_type not in ["view", "pure"]
+
+
+def check_function_has_struct_output(function_info: FunctionInfo):
+    return any(it.has_struct() for it in function_info.outputs)
+
+
+class StructInfo(pydantic.BaseModel):
+    name: str
+    canonical_type: str
+    """Canonical ABI type of the struct, without array suffixes."""
+    type_hint: str
+    field_names: List[str]
+    field_type_hints: List[str]
+
+
+def get_struct_field_names(components: List[ParamType]) -> List[str]:
+    """Component names usable as NamedTuple fields, which cannot start with underscores."""
+    ret = []
+    for index, it in enumerate(components):
+        name = it.name.lstrip("_")
+        if name == "" or keyword.iskeyword(name) or name in ret:
+            name = f"field{index}"
+        ret.append(name)
+    return ret
+
+
+def get_python_type_hint(param: ParamType, struct_names: Dict[str, str]) -> str:
+    if param.is_array:
+        return f"Sequence[{get_python_type_hint(param.element, struct_names)}]"
+    if param.type.startswith("tuple"):
+        return f'"{struct_names[param.canonical_type]}"'
+    for python_type, prefixes in TYPE_PREFIX_TRANSLATION_TABLE_INVERTED.items():
+        if any(param.type.startswith(it) for it in prefixes):
+            return python_type
+    return "Any"
+
+
+def get_struct_info_list(contract_info: AbiContractInfo) -> List[StructInfo]:
+    """Structs returned by the functions of a contract, nested structs first."""
+    struct_names: Dict[str, str] = {}
+    ordered_params: List[ParamType] = []
+
+    def visit(param: ParamType):
+        while param.is_array:
+            param = param.element
+        if not param.type.startswith("tuple"):
+            return
+        for it in param.components:
+            visit(it)
+        if param.canonical_type in struct_names:
+            return
+        name = param.struct_name or (
+            param.name.strip("_")[:1].upper() + param.name.strip("_")[1:]
+            if param.name.strip("_") != ""
+            else "Tuple"
+        )
+        if name in struct_names.values():
+            name = f"{name}{len(struct_names)}"
+        struct_names[param.canonical_type] = name
+        ordered_params.append(param)
+
+    for function_info in contract_info.function_info_list:
+        for it in function_info.outputs:
+            visit(it)
+
+    return [
+        StructInfo(
+            name=struct_names[it.canonical_type],
+            canonical_type=it.canonical_type,
+            type_hint=it.type_hint,
+            field_names=get_struct_field_names(it.components),
+            field_type_hints=[
+                get_python_type_hint(component, struct_names)
+                for component in it.components
+            ],
+        )
+        for it in ordered_params
+    ]
+
+
+class AbiProjectInfo(pydantic.BaseModel):
+    """Contracts of a project known only by their ABIs. Extended by `abi2api.ProjectInfo` for brownie projects."""
+
+    project: Optional[Any] = None
+    contracts_info: Dict[str, AbiContractInfo]
+    selector_index_path: Optional[str] = None
+    """Where the selector index was persisted along with the generated API code, if anywhere."""
+    _selector_index: Optional[SelectorIndex] = pydantic.PrivateAttr(default=None)
+
+    @property
+    def selector_index(self) -> SelectorIndex:
+        """Selector and topic index of all contracts, loaded from disk or built on first access."""
+        if self._selector_index is None:
+            if self.selector_index_path is not None and os.path.exists(
+                self.selector_index_path
+            ):
+                self._selector_index = SelectorIndex.load(self.selector_index_path)
+            else:
+                self._selector_index = SelectorIndex.from_contracts_info(
+                    self.contracts_info
+                )
+        return self._selector_index
+
+
+ABIS_FILENAME = "_abis.json"
+"""Name of the file holding the ABIs of an API package generated from ABI files."""
+
+
+def load_abi_dir(abi_dir: str) -> Dict[str, Union[List[dict], dict]]:
+    """
+    ABIs of the JSON files in a directory, by contract name.
+    Files hold either a bare ABI list, or a build artifact with an "abi" key.
+    The contract name is taken from "contractName" if present, otherwise from the file name.
+    Build artifacts with a bytecode are kept as `{"abi": ..., "bytecode": ...}`, so the contract can be deployed.
+    """
+    ret: Dict[str, Union[List[dict], dict]] = {}
+    for file_name in sorted(os.listdir(abi_dir)):
+        if not file_name.endswith(".json"):
+            continue
+        content = load_json_file(os.path.join(abi_dir, file_name))
+        contract_name = os.path.splitext(file_name)[0]
+        if isinstance(content, dict):
+            contract_name = content.get("contractName", contract_name)
+            if content.get("bytecode"):
+                content = dict(abi=content["abi"], bytecode=content["bytecode"])
+            else:
+                content = content["abi"]
+        ret[contract_name] = content
+    return ret
+
+
+def get_abi_project_info(abis: Dict[str, Union[List[dict], dict]]) -> AbiProjectInfo:
+    """Project info of ABIs by contract name, each a bare ABI list or a dict with "abi" and "bytecode"."""
+    contracts_info = {}
+    for contract_name, abi in abis.items():
+        if isinstance(abi, dict):
+            contracts_info[contract_name] = AbiContractInfo.from_abi(
+                abi["abi"], abi.get("bytecode")
+            )
+        else:
+            contracts_info[contract_name] = AbiContractInfo.from_abi(abi)
+    return AbiProjectInfo(contracts_info=contracts_info)
+
+
+def load_abi_project_info(api_code_directory_path: str) -> AbiProjectInfo:
+    """Load the project info for the API package generated from ABI files."""
+    project_info = get_abi_project_info(
+        load_json_file(os.path.join(api_code_directory_path, ABIS_FILENAME))
+    )
+    project_info.selector_index_path = os.path.join(
+        api_code_directory_path, SELECTOR_INDEX_FILENAME
+    )
+    return project_info
+
+
+# TODO: handle multi-dimentional type specification
+
+# class TypeAnnotation(pydantic.BaseModel):
+#     name: str
+#     length: int
+
+
+# def parse_single_type_annotation(type_annotation: str):
+#     length = 0
+#     if type_annotation.endswith("]"):
+#         type_name, length_text = type_annotation.split("[")
+#         length_text = length_text.strip("]")
+#         length = int(length_text)
+#     else:
+#         type_name = type_annotation
+#     ret = TypeAnnotation(name=type_name, length=length)
+#     return ret
+
+TYPE_PREFIX_TRANSLATION_TABLE_INVERTED = {
+    "tuple": ["tuple"],
+    "int": ["uint", "int"],
+    "bytes": ["bytes"],
+    "str": ["string", "address"],
+    "bool": ["bool"],
+}
@@ -0,0 +1,194 @@
+"""Rendering of API code from parsed contract ABIs."""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from .abi_info import (
+    ABIS_FILENAME,
+    AbiContractInfo,
+    AbiProjectInfo,
+    check_function_has_struct_output,
+    check_function_type_not_pure,
+    get_abi_project_info,
+    get_names_from_list,
+    get_struct_info_list,
+    get_types_from_list,
+    load_abi_dir,
+)
+from . import instrumentation
+from .constants import API_RELATIVE_DIR, SELECTOR_INDEX_FILENAME
+from .utils import atomic_write, ensure_dir
+
+if TYPE_CHECKING:
+    import jinja2
+
+_TEMPLATE_DIR = Path(os.path.dirname(__file__)) / "templates"
+_API_TEMPLATE_PATH = _TEMPLATE_DIR / "api.py.j2"
+_CONTRACT_TEMPLATE_PATH = _TEMPLATE_DIR / "contract.py.j2"
+
+BROWNIE_PROJECT_MODULE = """from pytract import abi2api
+project_info = abi2api.load_project_info_for_api()"""
+"""`_project.py` of API packages of brownie projects, loading the project next to the package."""
+
+ABI_PROJECT_MODULE = """import os
+from pytract import abi_info
+project_info = abi_info.load_abi_project_info(os.path.dirname(__file__))"""
+"""`_project.py` of API packages generated from ABI files, loading the ABIs stored in the package."""
+
+
+def load_api_template(template_path: Path) -> "jinja2.Template":
+    import jinja2
+
+    template = jinja2.Template(
+        open(template_path).read(),
+        trim_blocks=True,
+        lstrip_blocks=True,
+        keep_trailing_newline=True,
+        undefined=jinja2.StrictUndefined,
+    )
+    template.globals.update(
+        dict(
+            get_names_from_list=get_names_from_list,
+            get_types_from_list=get_types_from_list,
+            check_function_type_not_pure=check_function_type_not_pure,
+            check_function_has_struct_output=check_function_has_struct_output,
+            get_struct_info_list=get_struct_info_list,
+            list=list,
+            zip=zip,
+        )
+    )
+    return template
+
+
+def get_contract_info_hash(contract_name: str, contract_info: AbiContractInfo) -> str:
+    """Hash of everything the generated code of a contract depends on."""
+    content = json.dumps(
+        [
+            contract_name,
+            [it.dict() for it in contract_info.abi_list],
+            contract_info.deploy_abi.dict(),
+        ],
+        sort_keys=True,
+    )
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+class ApiCodeGenerator:
+    """
+    Renders the API code of a project.
+
+    Every contract class is rendered and formatted on its own, and kept by the hash of its ABI,
+    so regenerating a project only renders the contracts that changed since the last run.
+    """
+
+    def __init__(self):
+        self._api_template = load_api_template(_API_TEMPLATE_PATH)
+        self._contract_template = load_api_template(_CONTRACT_TEMPLATE_PATH)
+        self._contract_code_cache: Dict[str, Tuple[str, str]] = {}
+        """Formatted code of each contract class, with the hash of the contract info it is rendered from."""
+
+    def render_contract(
+        self, contract_name: str, contract_info: AbiContractInfo
+    ) -> str:
+        contract_info_hash = get_contract_info_hash(contract_name, contract_info)
+        cached = self._contract_code_cache.get(contract_name)
+        if cached is not None and cached[0] == contract_info_hash:
+            return cached[1]
+        content = self._contract_template.render(
+            contract_name=contract_name, contract_info=contract_info
+        )
+        import black
+        import black.mode
+
+        with instrumentation.span(
+            "codegen.format", contract=contract_name, bytes=len(content)
+        ):
+            content = black.format_str(content, mode=black.mode.Mode()).strip()
+        self._contract_code_cache[contract_name] = (contract_info_hash, content)
+        return content
+
+    def get_changed_contracts(
+        self, contracts_info: Dict[str, AbiContractInfo]
+    ) -> List[str]:
+        """Names of contracts whose code would be rendered again."""
+        return [
+            name
+            for name, info in contracts_info.items()
+            if self._contract_code_cache.get(name, (None,))[0]
+            != get_contract_info_hash(name, info)
+        ]
+
+    def render(self, contracts_info: Dict[str, AbiContractInfo]) -> str:
+        for contract_name in list(self._contract_code_cache.keys()):
+            if contract_name not in contracts_info:
+                del self._contract_code_cache[contract_name]
+        contract_code_list = [
+            self.render_contract(name, info) for name, info in contracts_info.items()
+        ]
+        return self._api_template.render(
+            contract_code_list=contract_code_list,
+            contract_names=list(contracts_info.keys()),
+        )
+
+    def write(
+        self,
+        api_code_directory_path: str,
+        project_info: AbiProjectInfo,
+        project_module: str = BROWNIE_PROJECT_MODULE,
+    ):
+        """Write the API package to `api_code_directory_path`, with `project_module` as its `_project.py`."""
+        ensure_dir(api_code_directory_path)
+
+        atomic_write(
+            os.path.join(api_code_directory_path, "_contracts.py"),
+            self.render(project_info.contracts_info),
+        )
+
+        project_info.selector_index.save(
+            os.path.join(api_code_directory_path, SELECTOR_INDEX_FILENAME)
+        )
+
+        atomic_write(
+            os.path.join(api_code_directory_path, "contracts.py"),
+            """from ._contracts import *""",
+        )
+
+        atomic_write(
+            os.path.join(api_code_directory_path, "__init__.py"),
+            """from . import contracts
+from ._project import project_info""",
+        )
+
+        atomic_write(
+            os.path.join(api_code_directory_path, "_project.py"), project_module
+        )
+
+    def write_project(self, project_path: str, project_info: AbiProjectInfo):
+        """Write the API package of a brownie project under '<project_path>/api'."""
+        self.write(os.path.join(project_path, API_RELATIVE_DIR), project_info)
+
+        atomic_write(os.path.join(project_path, "__init__.py"), """from . import api""")
+
+
+def generate_api_code_for_abi_dir(abi_dir: str, output_path: Optional[str] = None):
+    """
+    Generate API code from the ABI JSON files in `abi_dir`, without loading brownie.
+
+    The package is written to `output_path`, by default '<abi_dir>/api' with `abi_dir`
+    made importable as a package, like for brownie projects.
+    """
+    abis = load_abi_dir(abi_dir)
+    project_info = get_abi_project_info(abis)
+
+    api_code_directory_path = output_path
+    if api_code_directory_path is None:
+        api_code_directory_path = os.path.join(abi_dir, API_RELATIVE_DIR)
+        atomic_write(os.path.join(abi_dir, "__init__.py"), """from . import api""")
+
+    ApiCodeGenerator().write(
+        api_code_directory_path, project_info, project_module=ABI_PROJECT_MODULE
+    )
+    atomic_write(os.path.join(api_code_directory_path, ABIS_FILENAME), json.dumps(abis))
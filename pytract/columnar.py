@@ -0,0 +1,218 @@
+"""
+Columnar conversion of bulk-read contract outputs into NumPy and Arrow arrays.
+
+Integer and boolean outputs occupy a single 32-byte ABI word, so their return data is
+converted in bulk with `numpy.frombuffer` instead of decoding values one by one.
+NumPy is only imported when columns are built, so list outputs work without it.
+"""
+
+import re
+from typing import TYPE_CHECKING, Any, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+WORD_SIZE = 32
+"""Size of an ABI word in bytes."""
+
+LIMBS_PER_WORD = WORD_SIZE // 8
+
+_INTEGER_TYPE_PATTERN = re.compile(r"^(u?)int(\d*)$")
+
+NUMPY_OUTPUT = "numpy"
+ARROW_OUTPUT = "arrow"
+LIST_OUTPUT = "list"
+OUTPUT_FORMATS = (NUMPY_OUTPUT, ARROW_OUTPUT, LIST_OUTPUT)
+
+
+def get_word_kind(abi_type: str) -> Optional[Tuple[bool, int]]:
+    """
+    `(signed, bits)` of integer and boolean types stored in a single ABI word, None for other types.
+    Booleans are reported as unsigned 1-bit integers.
+    """
+    if abi_type == "bool":
+        return False, 1
+    matched = _INTEGER_TYPE_PATTERN.match(abi_type)
+    if matched is None:
+        return None
+    signed = matched.group(1) == ""
+    bits = int(matched.group(2) or 256)
+    return signed, bits
+
+
+def is_word_output(abi_types: Sequence[str]) -> bool:
+    """Whether the return data of these output types is a plain sequence of words, one per output."""
+    return all(get_word_kind(it) is not None for it in abi_types)
+
+
+def words_from_return_data(return_data: Sequence[bytes], output_count: int) -> "np.ndarray":
+    """
+    Big-endian 64-bit limbs of return data made of words only, shaped `(items, outputs, 4)`.
+    Return data of any other size, like the empty data of reverted calls, is rejected
+    as decoding it value by value would.
+    """
+    import numpy as np
+
+    size = output_count * WORD_SIZE
+    for index, it in enumerate(return_data):
+        if len(it) != size:
+            raise Exception(
+                f"Return data of call {index} is {len(it)} bytes, expected {size} bytes of {output_count} outputs"
+            )
+    buffer = b"".join(return_data)
+    return np.frombuffer(buffer, dtype=">u8").reshape(
+        len(return_data), output_count, LIMBS_PER_WORD
+    )
+
+
+def words_from_values(values: Sequence[int], signed: bool) -> "np.ndarray":
+    """Big-endian 64-bit limbs of decoded integers, shaped `(items, 4)`."""
+    import numpy as np
+
+    buffer = b"".join(
+        int(it).to_bytes(WORD_SIZE, "big", signed=signed) for it in values
+    )
+    return np.frombuffer(buffer, dtype=">u8").reshape(len(values), LIMBS_PER_WORD)
+
+
+def to_plain(value: Any) -> Any:
+    """Generated struct classes into dicts and sequences into lists, as understood by Arrow."""
+    if hasattr(value, "_asdict"):
+        return {k: to_plain(v) for k, v in value._asdict().items()}
+    if isinstance(value, (list, tuple)):
+        return [to_plain(it) for it in value]
+    return value
+
+
+def object_array(values: Sequence[Any]) -> "np.ndarray":
+    import numpy as np
+
+    ret = np.empty(len(values), dtype=object)
+    for index, it in enumerate(values):
+        ret[index] = it
+    return ret
+
+
+def numpy_column(
+    abi_type: str,
+    words: Optional["np.ndarray"] = None,
+    values: Optional[Sequence[Any]] = None,
+    split_words: bool = False,
+) -> "np.ndarray":
+    """
+    NumPy array of one output, from its words or from decoded values.
+
+    Integers up to 64 bits become `int64`/`uint64` arrays and booleans `bool` arrays.
+    Wider integers become object arrays of Python ints, or with `split_words` a `(items, 4)`
+    `uint64` array of limbs, most significant first (two's complement for signed types).
+    """
+    import numpy as np
+
+    kind = get_word_kind(abi_type)
+    if kind is None:
+        assert values is not None, "Values are required for non-word outputs"
+        return object_array(values)
+    signed, bits = kind
+    if words is None:
+        assert values is not None, "Either words or values are required"
+        words = words_from_values(values, signed)
+    if abi_type == "bool":
+        return words[:, -1] != 0
+    if bits <= 64:
+        low = words[:, -1].astype(np.uint64)
+        return low.view(np.int64) if signed else low
+    if split_words:
+        return words.astype(np.uint64)
+    buffer = np.ascontiguousarray(words).tobytes()
+    return object_array(
+        [
+            int.from_bytes(buffer[offset : offset + WORD_SIZE], "big", signed=signed)
+            for offset in range(0, len(buffer), WORD_SIZE)
+        ]
+    )
+
+
+def arrow_column(
+    abi_type: str,
+    words: Optional["np.ndarray"] = None,
+    values: Optional[Sequence[Any]] = None,
+):
+    """
+    Arrow array of one output, from its words or from decoded values.
+
+    Integers wider than 64 bits do not fit any Arrow integer type, so they are stored as
+    32-byte big-endian `fixed_size_binary` values (two's complement for signed types).
+    """
+    import numpy as np
+    import pyarrow as pa
+
+    kind = get_word_kind(abi_type)
+    if kind is None:
+        assert values is not None, "Values are required for non-word outputs"
+        return pa.array([to_plain(it) for it in values])
+    signed, bits = kind
+    if bits <= 64:
+        return pa.array(numpy_column(abi_type, words=words, values=values))
+    if words is None:
+        assert values is not None, "Either words or values are required"
+        words = words_from_values(values, signed)
+    buffer = pa.py_buffer(np.ascontiguousarray(words).tobytes())
+    return pa.Array.from_buffers(pa.binary(WORD_SIZE), len(words), [None, buffer])
+
+
+def to_columns(
+    abi_types: Sequence[str],
+    output_names: Sequence[str],
+    output: str,
+    return_data: Optional[Sequence[bytes]] = None,
+    values_list: Optional[Sequence[Sequence[Any]]] = None,
+    split_words: bool = False,
+):
+    """
+    Columns of a batch of calls, from raw return data of word-only outputs or from decoded values.
+
+    A single output gives one NumPy or Arrow array. Multiple outputs give a tuple of NumPy arrays,
+    or an Arrow table with one column per output.
+    """
+    words = None
+    if return_data is not None:
+        words = words_from_return_data(return_data, len(abi_types))
+    columns = []
+    for index, abi_type in enumerate(abi_types):
+        output_words = None if words is None else words[:, index, :]
+        output_values = (
+            None if values_list is None else [it[index] for it in values_list]
+        )
+        if output == NUMPY_OUTPUT:
+            column = numpy_column(
+                abi_type, words=output_words, values=output_values, split_words=split_words
+            )
+        else:
+            column = arrow_column(abi_type, words=output_words, values=output_values)
+        columns.append(column)
+    if len(columns) == 1:
+        return columns[0]
+    if output == NUMPY_OUTPUT:
+        return tuple(columns)
+
+    import pyarrow as pa
+
+    return pa.table(dict(zip(output_names, columns)))
+
+
+def concat_columns(parts: List[Any], output: str):
+    """Join the columns of consecutive batches."""
+    if output == LIST_OUTPUT:
+        return [it for part in parts for it in part]
+    if output == NUMPY_OUTPUT:
+        import numpy as np
+
+        if len(parts) > 0 and isinstance(parts[0], tuple):
+            return tuple(np.concatenate(it) for it in zip(*parts))
+        return np.concatenate(parts)
+
+    import pyarrow as pa
+
+    if len(parts) > 0 and isinstance(parts[0], pa.Table):
+        return pa.concat_tables(parts)
+    return pa.concat_arrays(parts)
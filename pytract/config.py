@@ -0,0 +1,80 @@
+"""
+Global switches of pytract.
+
+Runtime type checking of the hot classes (`vm.VM`, `vm.Account`, `utils.AtomicTinyDB`,
+`utils.AtomicKVStore`, `utils.IndexedKVStore`) is controlled by `checks`:
+
+- "on": every call is checked by beartype (default)
+- "debug": checked unless Python runs with `-O`, like assertions
+- "off": no checks, calls go straight to the undecorated methods
+
+The initial value comes from the `PYTRACT_CHECKS` environment variable, and can be changed
+at any time with `pytract.configure(checks=...)`.
+"""
+
+import os
+import typing
+
+CHECKS_ENV_VAR = "PYTRACT_CHECKS"
+CHECK_MODES = ("on", "debug", "off")
+
+_checks = os.environ.get(CHECKS_ENV_VAR, "on")
+if _checks not in CHECK_MODES:
+    raise Exception(
+        f"Invalid {CHECKS_ENV_VAR} value '{_checks}', expected one of {CHECK_MODES}"
+    )
+
+_checked_classes: typing.List[
+    typing.Tuple[type, typing.Dict[str, typing.Tuple[typing.Any, typing.Any]]]
+] = []
+"""Classes decorated by `type_checked`, with the unchecked and checked version of every decorated attribute."""
+
+
+def get_checks() -> str:
+    return _checks
+
+
+def checks_enabled() -> bool:
+    if _checks == "debug":
+        return __debug__
+    return _checks == "on"
+
+
+def _apply_checks(
+    cls: type, swaps: typing.Dict[str, typing.Tuple[typing.Any, typing.Any]]
+):
+    enabled = checks_enabled()
+    for name, (unchecked, checked) in swaps.items():
+        setattr(cls, name, checked if enabled else unchecked)
+
+
+def type_checked(cls):
+    """
+    Class decorator standing in for `@beartype.beartype`.
+    Both versions of each method are kept, so switching checks off costs nothing per call.
+    """
+    import beartype
+
+    unchecked_attributes = dict(vars(cls))
+    beartype.beartype(cls)
+    swaps = {
+        name: (value, vars(cls)[name])
+        for name, value in unchecked_attributes.items()
+        if vars(cls).get(name) is not value
+    }
+    _checked_classes.append((cls, swaps))
+    _apply_checks(cls, swaps)
+    return cls
+
+
+def configure(checks: typing.Optional[str] = None):
+    """Change global switches. Options left as None are unchanged."""
+    global _checks
+    if checks is not None:
+        if checks not in CHECK_MODES:
+            raise Exception(
+                f"Invalid checks mode '{checks}', expected one of {CHECK_MODES}"
+            )
+        _checks = checks
+        for cls, swaps in _checked_classes:
+            _apply_checks(cls, swaps)
@@ -1,3 +1,7 @@
 CONTRACT_DEPLOYER_KEY = "from"
 FUNCTION_TYPE = "function"
 API_RELATIVE_DIR = "api"
+EVENT_TYPE = "event"
+SELECTOR_INDEX_FILENAME = "_selectors.json"
+CONSTRUCTOR_TYPE = "constructor"
+DEFAULT_LOG_CHUNK_SIZE = 2000
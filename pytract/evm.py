@@ -1,56 +1,295 @@
 """Embedded EVM, using Simular as backend."""
 
-import simular
 from contextlib import contextmanager
+import dataclasses
+import functools
+import hashlib
+import json
 import os
+import threading
 import typing
 
+from . import instrumentation
+from .utils import (
+    AsyncExecutorFacade,
+    ReadOnlyException,
+    atomic_write,
+    file_version,
+    read_versioned,
+)
+
 # from .locksmith import LockSmith
 
+if typing.TYPE_CHECKING:
+    # simular pulls in eth_utils, so it is only imported once an EVM or ABI is actually created
+    import simular
+
+AbiLike = typing.Union["simular.PyAbi", str]
+"""Either a parsed `simular.PyAbi`, or a contract name/address registered in `abi_registry`."""
+
+
+class AbiRegistry:
+    """
+    Process-wide cache of parsed `simular.PyAbi` objects.
+
+    Each distinct ABI (plus bytecode) is parsed once and stored by its content hash.
+    Contracts can then be referred to by name or by deployed address.
+    """
+
+    BROWNIE_BUILD_SUBDIRS = ("contracts", "interfaces")
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._abi_by_hash: typing.Dict[str, "simular.PyAbi"] = {}
+        self._hash_by_key: typing.Dict[str, str] = {}
+
+    @staticmethod
+    def _normalize_key(key: str) -> str:
+        # addresses are case insensitive (checksum casing is optional)
+        return key.lower() if key.startswith("0x") else key
+
+    @staticmethod
+    def hash_abi(
+        abi: typing.Union[str, list], bytecode: typing.Optional[bytes] = None
+    ) -> str:
+        if isinstance(abi, str):
+            abi = json.loads(abi)
+        hasher = hashlib.sha256(json.dumps(abi, sort_keys=True).encode())
+        if bytecode is not None:
+            hasher.update(bytecode)
+        return hasher.hexdigest()
+
+    def register(
+        self,
+        abi: typing.Union[str, list],
+        bytecode: typing.Optional[bytes] = None,
+        name: typing.Optional[str] = None,
+    ) -> "simular.PyAbi":
+        """Parse the ABI unless an identical one is already cached, optionally naming it."""
+        abi_hash = self.hash_abi(abi, bytecode)
+        with self._lock:
+            parsed = self._abi_by_hash.get(abi_hash)
+            if parsed is None:
+                import simular
+
+                abi_text = abi if isinstance(abi, str) else json.dumps(abi)
+                parsed = simular.PyAbi.from_abi_bytecode(abi_text, bytecode)
+                self._abi_by_hash[abi_hash] = parsed
+            if name is not None:
+                self._hash_by_key[self._normalize_key(name)] = abi_hash
+        return parsed
+
+    def register_address(self, address: str, abi: AbiLike):
+        """Bind a deployed contract address to an already registered ABI."""
+        with self._lock:
+            abi_hash = self._lookup_hash(abi)
+            self._hash_by_key[self._normalize_key(address)] = abi_hash
+
+    def _lookup_hash(self, abi: AbiLike) -> str:
+        with self._lock:
+            if isinstance(abi, str):
+                abi_hash = self._hash_by_key.get(self._normalize_key(abi))
+                if abi_hash is None:
+                    raise KeyError(f"No ABI registered for '{abi}'")
+                return abi_hash
+            for abi_hash, parsed in self._abi_by_hash.items():
+                if parsed is abi:
+                    return abi_hash
+        raise KeyError("Given PyAbi is not registered")
+
+    def get(self, key: str) -> "simular.PyAbi":
+        """Get the parsed ABI by contract name or address."""
+        with self._lock:
+            return self._abi_by_hash[self._lookup_hash(key)]
+
+    def resolve(self, abi: AbiLike) -> "simular.PyAbi":
+        if isinstance(abi, str):
+            return self.get(abi)
+        return abi
+
+    def load_build_directory(self, build_dir: str) -> typing.List[str]:
+        """Pre-warm the cache from a brownie `build/contracts` (or `build/interfaces`) directory."""
+        names = []
+        for filename in sorted(os.listdir(build_dir)):
+            if not filename.endswith(".json"):
+                continue
+            with open(os.path.join(build_dir, filename), "r") as f:
+                build_info = json.loads(f.read())
+            bytecode_hex = build_info.get("bytecode")
+            bytecode = (
+                bytes.fromhex(bytecode_hex.removeprefix("0x")) if bytecode_hex else None
+            )
+            name = build_info.get("contractName", os.path.splitext(filename)[0])
+            self.register(build_info["abi"], bytecode, name=name)
+            names.append(name)
+        return names
+
+    def load_brownie_project(self, project_path: str) -> typing.List[str]:
+        """Pre-warm the cache from every build artifact of a compiled brownie project."""
+        names = []
+        for subdir in self.BROWNIE_BUILD_SUBDIRS:
+            build_dir = os.path.join(project_path, "build", subdir)
+            if os.path.isdir(build_dir):
+                names.extend(self.load_build_directory(build_dir))
+        return names
+
+    def clear(self):
+        with self._lock:
+            self._abi_by_hash.clear()
+            self._hash_by_key.clear()
+
+
+abi_registry = AbiRegistry()
+"""The process-wide ABI registry."""
+
+
+@dataclasses.dataclass
+class TransactOperation:
+    """Transaction (write) operation to a contract, used in `AtomicEVM.execute_batch`."""
+
+    fn_name: str
+    args: str
+    caller: str
+    to: str
+    value: int
+    abi: AbiLike
+
+    def apply(self, evm: "simular.PyEvm") -> object:
+        return evm.transact(
+            self.fn_name,
+            self.args,
+            self.caller,
+            self.to,
+            self.value,
+            abi_registry.resolve(self.abi),
+        )
+
+
+@dataclasses.dataclass
+class DeployOperation:
+    """Contract deployment operation, used in `AtomicEVM.execute_batch`."""
+
+    args: str
+    caller: str
+    value: int
+    abi: AbiLike
+
+    def apply(self, evm: "simular.PyEvm") -> str:
+        return _deploy_and_register(evm, self.args, self.caller, self.value, self.abi)
+
+
+@dataclasses.dataclass
+class TransferOperation:
+    """Value transfer operation, used in `AtomicEVM.execute_batch`."""
+
+    caller: str
+    to: str
+    amount: int
+
+    def apply(self, evm: "simular.PyEvm") -> None:
+        return evm.transfer(self.caller, self.to, self.amount)
+
+
+BatchOperation = typing.Union[TransactOperation, DeployOperation, TransferOperation]
+
+
+@dataclasses.dataclass
+class BatchResult:
+    """Outcome of a single operation in a batch. Exactly one of `result` and `error` is meaningful."""
+
+    operation: BatchOperation
+    result: object = None
+    error: typing.Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _deploy_and_register(
+    evm: "simular.PyEvm", args: str, caller: str, value: int, abi: AbiLike
+) -> str:
+    parsed_abi = abi_registry.resolve(abi)
+    address = evm.deploy(args, caller, value, parsed_abi)
+    if isinstance(abi, str):
+        abi_registry.register_address(address, abi)
+    return address
+
 
 class AtomicEVM:
     """
     A persistant Embedded EVM.
+
+    Snapshots are published by atomic rename. With `readonly=True` the EVM loads the
+    latest published snapshot without locking, never writes, and reloads whenever
+    the writer publishes a new version.
     """
 
-    def __init__(self, storage_path: str):
+    def __init__(self, storage_path: str, readonly: bool = False):
         self.storage_path = storage_path
+        self.readonly = readonly
+        self._snapshot_version = None
         self.load()
 
     def persist(self):
-        snapshot = self.evm.create_snapshot()
-        with open(self.storage_path, "w+") as f:
-            f.write(snapshot)
+        if self.readonly:
+            raise ReadOnlyException(f"EVM '{self.storage_path}' is opened read-only")
+        with instrumentation.span("evm.persist", path=self.storage_path) as span:
+            snapshot = self.evm.create_snapshot()
+            atomic_write(self.storage_path, snapshot)
+            span.add("bytes_written", len(snapshot))
+        self._snapshot_version = file_version(self.storage_path)
 
     def load(self):
+        import simular
+
         if os.path.exists(self.storage_path):
-            with open(self.storage_path, "r") as f:
-                snapshot = f.read()
-                self.evm = simular.PyEvm.from_snapshot(snapshot)
+            snapshot, self._snapshot_version = read_versioned(self.storage_path)
+            self.evm = simular.PyEvm.from_snapshot(snapshot)
+        elif self.readonly:
+            raise FileNotFoundError(
+                f"No EVM snapshot published at '{self.storage_path}' yet"
+            )
         else:
             self.evm = simular.PyEvm()
             self.persist()
 
+    def refresh(self) -> bool:
+        """Reload the snapshot if a newer version has been published. Returns whether it was reloaded."""
+        if file_version(self.storage_path) != self._snapshot_version:
+            self.load()
+            return True
+        return False
+
     @contextmanager
     def context(self):
+        if self.readonly:
+            raise ReadOnlyException(f"EVM '{self.storage_path}' is opened read-only")
         try:
             yield self.evm
         finally:
             self.persist()
 
+    @contextmanager
+    def read_context(self):
+        """Context for operations which do not change the EVM state, so nothing is persisted."""
+        if self.readonly:
+            self.refresh()
+        yield self.evm
+
     def call(
         self,
         fn_name: str,
         args: str,
         to: str,
-        abi: "simular.PyAbi",
+        abi: AbiLike,
     ) -> object:
         """
         Transaction (read) operation to a contract at the given address `to`.
         This will NOT change state in the EVM.
         """
-        with self.context() as evm:
-            return evm.call(fn_name, args, to, abi)
+        with self.read_context() as evm:
+            return evm.call(fn_name, args, to, abi_registry.resolve(abi))
 
     def simulate(
         self,
@@ -59,19 +298,24 @@ class AtomicEVM:
         caller: str,
         to: str,
         value: int,
-        abi: "simular.PyAbi",
+        abi: AbiLike,
     ) -> object:
         """
         Transaction operation to a contract at the given address `to`.
         This can simulate a transact/call operation, but will NOT change state in the EVM.
         """
-        with self.context() as evm:
-            return evm.simulate(fn_name, args, caller, to, value, abi)
+        with self.read_context() as evm:
+            return evm.simulate(
+                fn_name, args, caller, to, value, abi_registry.resolve(abi)
+            )
 
-    def deploy(self, args: str, caller: str, value: int, abi: "simular.PyAbi") -> str:
-        """Deploy a contract"""
+    def deploy(self, args: str, caller: str, value: int, abi: AbiLike) -> str:
+        """
+        Deploy a contract.
+        If `abi` is a registered contract name, the new address is registered with the same ABI.
+        """
         with self.context() as evm:
-            return evm.deploy(args, caller, value, abi)
+            return _deploy_and_register(evm, args, caller, value, abi)
 
     def transact(
         self,
@@ -80,18 +324,20 @@ class AtomicEVM:
         caller: str,
         to: str,
         value: int,
-        abi: "simular.PyAbi",
+        abi: AbiLike,
     ) -> object:  # TODO: figure out the return type, and the "py: Python<'_>" argument
         """
         Transaction (write) operation to a contract at the given address `to`.
         This will change state in the EVM.
         """
         with self.context() as evm:
-            return evm.transact(fn_name, args, caller, to, value, abi)
+            return evm.transact(
+                fn_name, args, caller, to, value, abi_registry.resolve(abi)
+            )
 
     def create_snapshot(self) -> str:
         """Create a `SnapShot` of the current EVM state"""
-        with self.context() as evm:
+        with self.read_context() as evm:
             return evm.create_snapshot()
 
     def create_account(
@@ -103,10 +349,83 @@ class AtomicEVM:
 
     def get_balance(self, address: str) -> int:
         """Get the balance of the given user"""
-        with self.context() as evm:
+        with self.read_context() as evm:
             return evm.get_balance(address)
 
     def transfer(self, caller: str, to: str, amount: int) -> None:
         """Transfer the amount of value from `caller` to the given recipient `to`."""
         with self.context() as evm:
             return evm.transfer(caller, to, amount)
+
+    def execute_batch(
+        self, operations: typing.Iterable[BatchOperation], stop_on_error: bool = False
+    ) -> typing.List[BatchResult]:
+        """
+        Run transact/deploy/transfer operations in order, persisting the EVM state only once at the end.
+
+        Errors are collected per operation instead of being raised. If `stop_on_error` is set,
+        remaining operations are skipped after the first failure.
+        """
+        results: typing.List[BatchResult] = []
+        with self.context() as evm:
+            for operation in operations:
+                try:
+                    results.append(BatchResult(operation, result=operation.apply(evm)))
+                except Exception as e:
+                    results.append(BatchResult(operation, error=e))
+                    if stop_on_error:
+                        break
+        return results
+
+
+class AsyncAtomicEVM(AsyncExecutorFacade):
+    """
+    Asyncio facade of `AtomicEVM`, which never blocks the event loop.
+
+    State changing operations are queued and applied in order by a single writer.
+    Reads run concurrently on read-only `AtomicEVM` instances, which reload the
+    snapshot whenever the writer publishes a new one.
+    """
+
+    def __init__(self, storage_path: str, max_readers: int = 4):
+        self.storage_path = storage_path
+        super().__init__(
+            AtomicEVM(storage_path),
+            functools.partial(AtomicEVM, storage_path, readonly=True),
+            max_readers=max_readers,
+        )
+
+    async def call(self, fn_name: str, args: str, to: str, abi: AbiLike) -> object:
+        return await self._read("call", fn_name, args, to, abi)
+
+    async def simulate(
+        self, fn_name: str, args: str, caller: str, to: str, value: int, abi: AbiLike
+    ) -> object:
+        return await self._read("simulate", fn_name, args, caller, to, value, abi)
+
+    async def get_balance(self, address: str) -> int:
+        return await self._read("get_balance", address)
+
+    async def create_snapshot(self) -> str:
+        return await self._read("create_snapshot")
+
+    async def deploy(self, args: str, caller: str, value: int, abi: AbiLike) -> str:
+        return await self._write("deploy", args, caller, value, abi)
+
+    async def transact(
+        self, fn_name: str, args: str, caller: str, to: str, value: int, abi: AbiLike
+    ) -> object:
+        return await self._write("transact", fn_name, args, caller, to, value, abi)
+
+    async def create_account(
+        self, address: str, balance: typing.Optional[int] = None
+    ) -> None:
+        return await self._write("create_account", address, balance)
+
+    async def transfer(self, caller: str, to: str, amount: int) -> None:
+        return await self._write("transfer", caller, to, amount)
+
+    async def execute_batch(
+        self, operations: typing.Iterable[BatchOperation], stop_on_error: bool = False
+    ) -> typing.List[BatchResult]:
+        return await self._write("execute_batch", list(operations), stop_on_error)
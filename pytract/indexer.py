@@ -0,0 +1,209 @@
+"""Local SQLite index of decoded contract events, synced incrementally from the chain."""
+
+import json
+import sqlite3
+import typing
+from contextlib import contextmanager
+
+from .constants import DEFAULT_LOG_CHUNK_SIZE
+
+if typing.TYPE_CHECKING:
+    from .abi2api import ContractInstance, EventBase
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    address TEXT NOT NULL,
+    contract TEXT NOT NULL,
+    event TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    block_number INTEGER NOT NULL,
+    log_index INTEGER NOT NULL,
+    transaction_hash TEXT,
+    args TEXT NOT NULL,
+    PRIMARY KEY (address, block_number, log_index)
+);
+CREATE INDEX IF NOT EXISTS events_topic ON events (topic, block_number);
+CREATE INDEX IF NOT EXISTS events_block ON events (block_number);
+CREATE TABLE IF NOT EXISTS sync_state (
+    address TEXT PRIMARY KEY,
+    contract TEXT NOT NULL,
+    last_synced_block INTEGER NOT NULL
+);
+"""
+
+
+def _to_json_value(value):
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + bytes(value).hex()
+    if isinstance(value, (tuple, list)):
+        return [_to_json_value(it) for it in value]
+    return value
+
+
+def _hex_or_none(value) -> typing.Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    return "0x" + bytes(value).hex()
+
+
+class EventIndex:
+    """
+    Decoded events of chosen contracts, stored in a local SQLite database.
+
+    The last synced block is recorded per contract address in the same transaction
+    as the events of each chunk, so an interrupted sync resumes where it stopped.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._connection = sqlite3.connect(db_path)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.executescript(_SCHEMA)
+
+    @contextmanager
+    def transaction(self):
+        with self._connection:
+            yield self._connection
+
+    def last_synced_block(self, address: str) -> typing.Optional[int]:
+        row = self._connection.execute(
+            "SELECT last_synced_block FROM sync_state WHERE address = ?",
+            (address.lower(),),
+        ).fetchone()
+        return None if row is None else row["last_synced_block"]
+
+    def store_chunk(
+        self,
+        contract_name: str,
+        address: str,
+        to_block: int,
+        events: typing.Iterable["EventBase"],
+    ) -> int:
+        """Store decoded events of a chunk, and mark the contract synced up to `to_block`."""
+        address = address.lower()
+        rows = [
+            (
+                address,
+                contract_name,
+                type(event).__name__,
+                typing.cast(str, event.topic),
+                event.log_block_number,
+                event.log_index,
+                _hex_or_none(event.log_transaction_hash),
+                json.dumps(
+                    {k: _to_json_value(v) for k, v in event.to_dict().items()},
+                    ensure_ascii=False,
+                ),
+            )
+            for event in events
+        ]
+        with self.transaction() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            connection.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?)",
+                (address, contract_name, to_block),
+            )
+        return len(rows)
+
+    def sync(
+        self,
+        contract: "ContractInstance",
+        from_block: int = 0,
+        to_block: typing.Optional[int] = None,
+        chunk_size: int = DEFAULT_LOG_CHUNK_SIZE,
+        web3=None,
+    ) -> int:
+        """
+        Sync events of a generated contract instance, resuming after the last synced block.
+        Returns the number of events stored.
+        """
+        address = contract._contract.address
+        last_synced_block = self.last_synced_block(address)
+        if last_synced_block is not None:
+            from_block = max(from_block, last_synced_block + 1)
+        count = 0
+        for _, chunk_to_block, events in contract.iter_event_chunks(
+            from_block, to_block, chunk_size, web3=web3
+        ):
+            count += self.store_chunk(
+                contract._contract_name, address, chunk_to_block, events
+            )
+        return count
+
+    def query(
+        self,
+        address: typing.Optional[str] = None,
+        event: typing.Optional[str] = None,
+        from_block: typing.Optional[int] = None,
+        to_block: typing.Optional[int] = None,
+    ) -> typing.Iterator[dict]:
+        """Iterate over stored events in chain order, with `args` decoded from JSON."""
+        conditions, parameters = [], []
+        for condition, value in [
+            ("address = ?", None if address is None else address.lower()),
+            ("event = ?", event),
+            ("block_number >= ?", from_block),
+            ("block_number <= ?", to_block),
+        ]:
+            if value is not None:
+                conditions.append(condition)
+                parameters.append(value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        cursor = self._connection.execute(
+            f"SELECT * FROM events {where} ORDER BY block_number, log_index",
+            parameters,
+        )
+        for row in cursor:
+            ret = dict(row)
+            ret["args"] = json.loads(ret["args"])
+            yield ret
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_generated_contracts_module(project_path: str):
+    """Import `<project>.api.contracts` generated by `pytract process`."""
+    import importlib
+    import os
+    import sys
+
+    project_path = os.path.abspath(project_path)
+    parent_dir, package_name = os.path.split(project_path)
+    if parent_dir not in sys.path:
+        sys.path.insert(0, parent_dir)
+    return importlib.import_module(f"{package_name}.api.contracts")
+
+
+def index_project_events(
+    project_path: str,
+    contract_addresses: typing.Dict[str, str],
+    db_path: str,
+    from_block: int = 0,
+    to_block: typing.Optional[int] = None,
+    chunk_size: int = DEFAULT_LOG_CHUNK_SIZE,
+    network: typing.Optional[str] = None,
+) -> typing.Dict[str, int]:
+    """Sync events of the given `{contract name: address}` into the index at `db_path`."""
+    from brownie import network as brownie_network
+
+    contracts_module = load_generated_contracts_module(project_path)
+    if network is not None and not brownie_network.is_connected():
+        brownie_network.connect(network)
+    ret = {}
+    with EventIndex(db_path) as index:
+        for contract_name, address in contract_addresses.items():
+            contract_class: typing.Type["ContractInstance"] = getattr(
+                contracts_module, contract_name
+            )
+            contract = contract_class.from_address(address)
+            ret[address] = index.sync(contract, from_block, to_block, chunk_size)
+    return ret
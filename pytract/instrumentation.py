@@ -0,0 +1,418 @@
+"""
+Lightweight instrumentation of pytract hot paths: named spans and counters.
+
+Off by default. While disabled, `span` returns a shared no-op span and `count` returns at once,
+so instrumented code only pays a function call and a flag check.
+
+Instrumented spans:
+
+- "tinydb.transaction": locked access to an `AtomicTinyDB`, with `lock_wait_ns`, `bytes_read` and `bytes_written`
+- "vm.load_contract_data", "vm.persist_contract_data": with `lock_wait_ns` and `bytes_read` or `bytes_written`
+- "vm.commit": commit of a unit of work
+- "evm.persist": snapshot write of an `AtomicEVM`, with `bytes_written`
+- "codegen.format": `black` formatting of a contract's API code, with `bytes`
+- "abi2api.view", "abi2api.call", "abi2api.transact", "abi2api.call_batch", "abi2api.deploy":
+  RPC calls made by generated contract methods
+
+Every span counts `<name>.calls` and `<name>.duration_ns`, and numeric attributes added with
+`Span.add` or `record` are also counted as `<name>.<attribute>`.
+
+Finished spans and counters go to exporters: any callable taking a `SpanRecord`, `JsonLinesExporter`,
+or `OTLPJsonExporter` writing the OpenTelemetry OTLP/JSON encoding, as read by the collector's
+`otlpjsonfile` receiver.
+"""
+
+import contextvars
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Union
+
+_enabled = False
+_exporters: List["Exporter"] = []
+_counters: Dict[str, Union[int, float]] = {}
+_counters_lock = threading.Lock()
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "pytract_current_span", default=None
+)
+"""Innermost open span, in the current thread or asyncio task."""
+
+
+class SpanRecord(NamedTuple):
+    name: str
+    trace_id: int
+    span_id: int
+    parent_id: Optional[int]
+    start_time_ns: int
+    """Wall clock time, since the epoch."""
+    duration_ns: int
+    """Measured with the monotonic performance counter."""
+    attributes: Dict[str, Any]
+
+
+class Exporter:
+    """Receives finished spans and, on `flush`, the current counter values."""
+
+    def export_span(self, record: SpanRecord): ...
+
+    def export_counters(self, counters: Dict[str, Union[int, float]], time_ns: int): ...
+
+    def close(self): ...
+
+
+class CallbackExporter(Exporter):
+    def __init__(
+        self,
+        on_span: Callable[[SpanRecord], None],
+        on_counters: Optional[
+            Callable[[Dict[str, Union[int, float]], int], None]
+        ] = None,
+    ):
+        self.on_span = on_span
+        self.on_counters = on_counters
+
+    def export_span(self, record: SpanRecord):
+        self.on_span(record)
+
+    def export_counters(self, counters: Dict[str, Union[int, float]], time_ns: int):
+        if self.on_counters is not None:
+            self.on_counters(counters, time_ns)
+
+
+class JsonLinesExporter(Exporter):
+    """One JSON object per line: `{"type": "span", ...}` per span, `{"type": "counters", ...}` per flush."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a")
+        self._lock = threading.Lock()
+
+    def _write(self, obj: dict):
+        line = json.dumps(obj, default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+
+    def export_span(self, record: SpanRecord):
+        self._write(
+            dict(
+                type="span",
+                name=record.name,
+                trace_id=f"{record.trace_id:032x}",
+                span_id=f"{record.span_id:016x}",
+                parent_id=(
+                    None if record.parent_id is None else f"{record.parent_id:016x}"
+                ),
+                start_time_ns=record.start_time_ns,
+                duration_ns=record.duration_ns,
+                attributes=record.attributes,
+            )
+        )
+
+    def export_counters(self, counters: Dict[str, Union[int, float]], time_ns: int):
+        self._write(dict(type="counters", time_ns=time_ns, counters=counters))
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def get_otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # 64-bit integers are strings in the OTLP JSON encoding
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OTLPJsonExporter(Exporter):
+    """
+    Spans as OTLP/JSON `ExportTraceServiceRequest`s, one per line of `traces_path`.
+    Counters go to `metrics_path` if given, as cumulative monotonic sums.
+    """
+
+    SCOPE = {"name": "pytract"}
+
+    def __init__(
+        self,
+        traces_path: str,
+        metrics_path: Optional[str] = None,
+        service_name: str = "pytract",
+    ):
+        self._resource = {
+            "attributes": [
+                {"key": "service.name", "value": {"stringValue": service_name}}
+            ]
+        }
+        self._traces_file = open(traces_path, "a")
+        self._metrics_file = None if metrics_path is None else open(metrics_path, "a")
+        self._start_time_ns = time.time_ns()
+        self._lock = threading.Lock()
+
+    def export_span(self, record: SpanRecord):
+        span = {
+            "traceId": f"{record.trace_id:032x}",
+            "spanId": f"{record.span_id:016x}",
+            "name": record.name,
+            "kind": 1,
+            "startTimeUnixNano": str(record.start_time_ns),
+            "endTimeUnixNano": str(record.start_time_ns + record.duration_ns),
+            "attributes": [
+                {"key": k, "value": get_otlp_value(v)}
+                for k, v in record.attributes.items()
+            ],
+        }
+        if record.parent_id is not None:
+            span["parentSpanId"] = f"{record.parent_id:016x}"
+        if "error" in record.attributes:
+            span["status"] = {"code": 2, "message": str(record.attributes["error"])}
+        request = {
+            "resourceSpans": [
+                {
+                    "resource": self._resource,
+                    "scopeSpans": [{"scope": self.SCOPE, "spans": [span]}],
+                }
+            ]
+        }
+        line = json.dumps(request) + "\n"
+        with self._lock:
+            self._traces_file.write(line)
+
+    def export_counters(self, counters: Dict[str, Union[int, float]], time_ns: int):
+        if self._metrics_file is None:
+            return
+        metrics = []
+        for name, value in counters.items():
+            data_point: Dict[str, Any] = {
+                "startTimeUnixNano": str(self._start_time_ns),
+                "timeUnixNano": str(time_ns),
+            }
+            if isinstance(value, float):
+                data_point["asDouble"] = value
+            else:
+                data_point["asInt"] = str(value)
+            metrics.append(
+                {
+                    "name": name,
+                    "sum": {
+                        "dataPoints": [data_point],
+                        "aggregationTemporality": 2,
+                        "isMonotonic": True,
+                    },
+                }
+            )
+        request = {
+            "resourceMetrics": [
+                {
+                    "resource": self._resource,
+                    "scopeMetrics": [{"scope": self.SCOPE, "metrics": metrics}],
+                }
+            ]
+        }
+        line = json.dumps(request) + "\n"
+        with self._lock:
+            self._metrics_file.write(line)
+
+    def close(self):
+        with self._lock:
+            self._traces_file.close()
+            if self._metrics_file is not None:
+                self._metrics_file.close()
+
+
+class Span:
+    __slots__ = (
+        "name",
+        "attributes",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "_start_time_ns",
+        "_start_perf_ns",
+        "_token",
+    )
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        self.name = name
+        self.attributes = attributes
+
+    def set(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def add(self, key: str, amount: Union[int, float]):
+        """Add to a numeric attribute, also counted as `<span name>.<key>`."""
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+        count(f"{self.name}.{key}", amount)
+
+    def __enter__(self):
+        parent = _current_span.get()
+        if parent is None:
+            self.trace_id, self.parent_id = random.getrandbits(128), None
+        else:
+            self.trace_id, self.parent_id = parent.trace_id, parent.span_id
+        self.span_id = random.getrandbits(64)
+        self._token = _current_span.set(self)
+        self._start_time_ns = time.time_ns()
+        self._start_perf_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        duration_ns = time.perf_counter_ns() - self._start_perf_ns
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        count(f"{self.name}.calls")
+        count(f"{self.name}.duration_ns", duration_ns)
+        record = SpanRecord(
+            self.name,
+            self.trace_id,
+            self.span_id,
+            self.parent_id,
+            self._start_time_ns,
+            duration_ns,
+            self.attributes,
+        )
+        for it in _exporters:
+            it.export_span(record)
+
+
+class _NullSpan:
+    """Stands in for `Span` while instrumentation is disabled."""
+
+    __slots__ = ()
+
+    def set(self, key: str, value: Any): ...
+
+    def add(self, key: str, amount: Union[int, float]): ...
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback): ...
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str, **attributes) -> Union[Span, _NullSpan]:
+    """Context manager measuring the enclosed block as a span named `name`."""
+    if not _enabled:
+        return _NULL_SPAN
+    return Span(name, attributes)
+
+
+def count(name: str, amount: Union[int, float] = 1):
+    if not _enabled:
+        return
+    with _counters_lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def record(key: str, amount: Union[int, float]):
+    """Add to attribute `key` of the innermost span, or to counter `key` outside of spans."""
+    if not _enabled:
+        return
+    current = _current_span.get()
+    if current is None:
+        count(key, amount)
+    else:
+        current.add(key, amount)
+
+
+class _TimedLock:
+    __slots__ = ("_lock", "_span")
+
+    def __init__(self, lock, span: Union[Span, _NullSpan, None]):
+        self._lock = lock
+        self._span = span
+
+    def __enter__(self):
+        start_ns = time.perf_counter_ns()
+        ret = self._lock.__enter__()
+        wait_ns = time.perf_counter_ns() - start_ns
+        if self._span is None:
+            record("lock_wait_ns", wait_ns)
+        else:
+            self._span.add("lock_wait_ns", wait_ns)
+        return ret
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self._lock.__exit__(exc_type, exc_value, traceback)
+
+
+def timed_lock(lock, span: Union[Span, _NullSpan, None] = None):
+    """
+    `lock` as a context manager, adding the time spent acquiring it as `lock_wait_ns`
+    to `span`, or to the innermost span when acquired.
+    """
+    if not _enabled:
+        return lock
+    return _TimedLock(lock, span)
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def get_counters() -> Dict[str, Union[int, float]]:
+    with _counters_lock:
+        return dict(_counters)
+
+
+def reset_counters():
+    with _counters_lock:
+        _counters.clear()
+
+
+def flush():
+    """Send the current counter values to the exporters."""
+    counters, time_ns = get_counters(), time.time_ns()
+    for it in _exporters:
+        it.export_counters(counters, time_ns)
+
+
+def enable(*exporters: Union[Exporter, Callable[[SpanRecord], None]]):
+    """
+    Start instrumenting, sending spans to `exporters`. Plain callables receive each `SpanRecord`.
+    Exporters of a previous `enable` which are not given again get the counters and are closed.
+    """
+    global _enabled
+    new_exporters = [
+        it if isinstance(it, Exporter) else CallbackExporter(it) for it in exporters
+    ]
+    replaced = [
+        it for it in _exporters if all(it is not other for other in new_exporters)
+    ]
+    _exporters[:] = new_exporters
+    _enabled = True
+    counters, time_ns = get_counters(), time.time_ns()
+    for it in replaced:
+        it.export_counters(counters, time_ns)
+        it.close()
+
+
+def disable():
+    """Stop instrumenting. Counters are flushed to the exporters, which are then closed."""
+    global _enabled
+    if not _enabled:
+        return
+    flush()
+    _enabled = False
+    for it in _exporters:
+        it.close()
+    _exporters.clear()
+
+
+@contextmanager
+def instrumented(*exporters: Union[Exporter, Callable[[SpanRecord], None]]):
+    """Instrument the enclosed block."""
+    enable(*exporters)
+    try:
+        yield
+    finally:
+        disable()
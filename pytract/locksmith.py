@@ -1,13 +1,34 @@
-from .utils import AtomicKVStore, generate_address_and_key, check_key_validity
+from .utils import (
+    AtomicKVStore,
+    IndexedKVStore,
+    generate_address_and_key,
+    check_key_validity,
+)
+import json
 import typing
 
+DEFAULT_IMPORT_BATCH_SIZE = 10_000
+
 
 class LockSmith:
     """Create and store Web3 accounts by name"""
 
     # """Create and store Web3 accounts and contracts by name"""
-    def __init__(self, db_path: str):
-        self.db = AtomicKVStore(db_path)
+    def __init__(self, db_path: str, indexed: bool = False):
+        self.db_path = db_path
+        self.indexed = indexed
+        """Keep accounts in an `IndexedKVStore`, reading them from disk on demand."""
+        self._db: typing.Optional[typing.Union[AtomicKVStore, IndexedKVStore]] = None
+        self._names_by_address: typing.Optional[typing.Dict[str, str]] = None
+        """Reverse index from lowercased address to account name, built on first lookup."""
+
+    @property
+    def db(self) -> typing.Union[AtomicKVStore, IndexedKVStore]:
+        """The key store, only opened when first used."""
+        if self._db is None:
+            store_class = IndexedKVStore if self.indexed else AtomicKVStore
+            self._db = store_class(self.db_path)
+        return self._db
 
     def account(self, name: str):
         account = self.load_account(name)
@@ -16,11 +37,24 @@ class LockSmith:
         return account
 
     def load_account(self, name: str):
-        try:
-            account = self.db.get(name)
-            return account
-        except KeyError:
-            print(f"Account '{name}' does not exist.")
+        """The account of `name`, or None if there is none."""
+        return self.db.get_many([name])[0]
+
+    def get_many(self, names: typing.Iterable[str]) -> typing.List[typing.Optional[dict]]:
+        """Accounts of `names` in order, None for the missing ones."""
+        return self.db.get_many(names)
+
+    def _get_names_by_address(self) -> typing.Dict[str, str]:
+        if self._names_by_address is None:
+            self._names_by_address = {
+                account["address"].lower(): name
+                for name, account in self.db.items()
+            }
+        return self._names_by_address
+
+    def find_name(self, address: str) -> typing.Optional[str]:
+        """Name of the account owning `address`, regardless of checksum case, or None."""
+        return self._get_names_by_address().get(address.lower())
 
     def create_account(self, name: str):
         address, key = generate_address_and_key()
@@ -28,11 +62,30 @@ class LockSmith:
         return ret
 
     def import_account(self, name: str, address: str, key: typing.Optional[str] = None):
-        if key is not None:
-            check_key_validity(address, key, enforce=True)
-        ret = dict(address=address, key=key)
-        self.db.set(name, ret)
-        return ret
+        return self.import_many([dict(name=name, address=address, key=key)])[0]
+
+    def import_many(self, accounts: typing.Iterable[dict]) -> typing.List[dict]:
+        """
+        Import accounts given as dicts with `name`, `address` and optionally `key`, with a single write.
+        All keys are checked before anything is stored.
+        """
+        items: typing.Dict[str, dict] = {}
+        for it in accounts:
+            key = it.get("key")
+            if key is not None:
+                check_key_validity(it["address"], key, enforce=True)
+            items[it["name"]] = dict(address=it["address"], key=key)
+        names_by_address = self._names_by_address
+        if names_by_address is not None:
+            # addresses of overwritten accounts no longer belong to their names
+            for previous in self.db.get_many(items.keys()):
+                if previous is not None:
+                    names_by_address.pop(previous["address"].lower(), None)
+        self.db.set_many(items)
+        if names_by_address is not None:
+            for name, account in items.items():
+                names_by_address[account["address"].lower()] = name
+        return list(items.values())
 
     # def new_contract(self, name:str):
     #     ...
@@ -42,7 +95,38 @@ class LockSmith:
     #     self.list_contracts()
 
     def list_accounts(self):
-        return list(self.db.data.keys())
+        return self.db.keys()
+
+    def iter_accounts(self) -> typing.Iterator[typing.Tuple[str, dict]]:
+        """Names and accounts, without copying the store."""
+        return self.db.items()
 
     # def list_contracts(self):
     #     ...
+
+    def export_jsonl(self, path: str) -> int:
+        """Write one `{"name", "address", "key"}` object per line. Returns the number of accounts."""
+        count = 0
+        with open(path, "w") as f:
+            for name, account in self.iter_accounts():
+                f.write(json.dumps(dict(name=name, **account)) + "\n")
+                count += 1
+        return count
+
+    def import_jsonl(
+        self, path: str, batch_size: int = DEFAULT_IMPORT_BATCH_SIZE
+    ) -> int:
+        """Import accounts written by `export_jsonl`, streaming the file in batches. Returns the number of accounts."""
+        count = 0
+        batch: typing.List[dict] = []
+        with open(path, "r") as f:
+            for line in f:
+                if line.strip() == "":
+                    continue
+                batch.append(json.loads(line))
+                if len(batch) == batch_size:
+                    count += len(self.import_many(batch))
+                    batch = []
+        if batch != []:
+            count += len(self.import_many(batch))
+        return count
@@ -0,0 +1,387 @@
+"""
+Compact binary log of the state-changing operations of a `vm.VM`, and fast replay of it in memory.
+
+Records start with a code byte, `operation << 2 | number kind`, followed by fixed-size little-endian
+fields, so the common records (transfers and balance updates) decode with a single `struct` call.
+Addresses are interned: the first record mentioning one defines its index, and later records refer
+to it by index. Numbers are stored as int64, float64, or length-prefixed big-endian bytes for larger ints.
+
+A writer which dies while appending may leave an incomplete record at the end. Readers stop before it,
+and the next writer opening the log truncates it.
+"""
+
+import json
+import os
+import struct
+import threading
+from typing import Iterator, NamedTuple, Optional, Union
+
+Number = Union[int, float]
+
+MAGIC = b"PYTRACTOPLOG"
+VERSION = 1
+HEADER = MAGIC + bytes([VERSION])
+
+OP_ADDRESS = 1
+OP_CREATE_ACCOUNT = 2
+OP_SET_BALANCE = 3
+OP_TRANSFER = 4
+OP_CONTRACT_DATA = 5
+
+OPERATION_NAMES = {
+    OP_CREATE_ACCOUNT: "create_account",
+    OP_SET_BALANCE: "set_balance",
+    OP_TRANSFER: "transfer",
+    OP_CONTRACT_DATA: "contract_data",
+}
+"""Operations counted as steps. Address definitions are not steps."""
+
+NUMBER_INT64 = 0
+NUMBER_FLOAT = 1
+NUMBER_BIGINT = 2
+
+_NUMBER_FORMATS = {NUMBER_INT64: "q", NUMBER_FLOAT: "d", NUMBER_BIGINT: "H"}
+"""Format of the number field. Big ints store their length here, their bytes follow the record."""
+
+_ADDRESS = struct.Struct("<H")
+_CONTRACT_DATA = struct.Struct("<II")
+
+
+def _record_structs(prefix: str) -> dict[int, struct.Struct]:
+    return {k: struct.Struct(prefix + v) for k, v in _NUMBER_FORMATS.items()}
+
+
+_CREATE_ACCOUNT = _record_structs("<IH")
+"""Account index and key length, then the initial balance. The key follows the balance."""
+_SET_BALANCE = _record_structs("<I")
+_TRANSFER = _record_structs("<II")
+
+
+def get_number_kind(value: Number) -> int:
+    if isinstance(value, float):
+        return NUMBER_FLOAT
+    if -(2**63) <= value < 2**63:
+        return NUMBER_INT64
+    return NUMBER_BIGINT
+
+
+def pack_record(
+    op: int, structs: dict[int, struct.Struct], fields: tuple, value: Number
+) -> bytes:
+    kind = get_number_kind(value)
+    code = bytes([op << 2 | kind])
+    if kind != NUMBER_BIGINT:
+        return code + structs[kind].pack(*fields, value)
+    data = int(value).to_bytes((int(value).bit_length() + 8) // 8, "big", signed=True)
+    return code + structs[kind].pack(*fields, len(data)) + data
+
+
+def read_bytes(buffer: bytes, offset: int, length: int) -> bytes:
+    """
+    Bytes of a variable-size field. Raises `struct.error` if the buffer ends within them,
+    like `struct.Struct.unpack_from` does for fixed-size fields.
+    """
+    if offset + length > len(buffer):
+        raise struct.error(f"Field of {length} bytes at offset {offset} is incomplete")
+    return buffer[offset : offset + length]
+
+
+def unpack_record(
+    buffer: bytes, offset: int, structs: dict[int, struct.Struct], kind: int
+) -> tuple[tuple, int]:
+    """Fields of a record starting after its code byte, with the number last, and the offset after it."""
+    record_struct = structs[kind]
+    fields = record_struct.unpack_from(buffer, offset)
+    offset += record_struct.size
+    if kind == NUMBER_BIGINT:
+        length = fields[-1]
+        value = int.from_bytes(read_bytes(buffer, offset, length), "big", signed=True)
+        return fields[:-1] + (value,), offset + length
+    return fields, offset
+
+
+class OperationLog:
+    """
+    Append-only writer of an operation log. Records are buffered until `flush`,
+    which `VM` calls once per committed operation.
+
+    Only one writer may append to a log at a time.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._address_indices: dict[str, int] = {}
+        self.created = not os.path.exists(path) or os.path.getsize(path) == 0
+        """Whether the log was empty when opened."""
+        if not self.created:
+            buffer = read_log(path)
+            size = len(HEADER)
+            for op, fields, size in _iter_records(buffer):
+                if op == OP_ADDRESS:
+                    self._address_indices[fields[0]] = len(self._address_indices)
+            if size < len(buffer):
+                # new records must follow the last complete one
+                with open(path, "r+b") as f:
+                    f.truncate(size)
+        self._file = open(path, "ab")
+        if self.created:
+            self._file.write(HEADER)
+
+    def _get_address_index(self, address: str) -> int:
+        index = self._address_indices.get(address)
+        if index is None:
+            index = self._address_indices[address] = len(self._address_indices)
+            data = address.encode()
+            self._file.write(bytes([OP_ADDRESS << 2]) + _ADDRESS.pack(len(data)) + data)
+        return index
+
+    def create_account(self, address: str, key: str, balance: Number):
+        with self._lock:
+            index = self._get_address_index(address)
+            data = key.encode()
+            self._file.write(
+                pack_record(
+                    OP_CREATE_ACCOUNT, _CREATE_ACCOUNT, (index, len(data)), balance
+                )
+                + data
+            )
+
+    def set_balance(self, address: str, balance: Number):
+        with self._lock:
+            index = self._get_address_index(address)
+            self._file.write(
+                pack_record(OP_SET_BALANCE, _SET_BALANCE, (index,), balance)
+            )
+
+    def transfer(self, sender: str, receiver: str, amount: Number):
+        with self._lock:
+            sender_index = self._get_address_index(sender)
+            receiver_index = self._get_address_index(receiver)
+            self._file.write(
+                pack_record(
+                    OP_TRANSFER, _TRANSFER, (sender_index, receiver_index), amount
+                )
+            )
+
+    def contract_data(self, address: str, data: str):
+        with self._lock:
+            index = self._get_address_index(address)
+            encoded_data = data.encode()
+            self._file.write(
+                bytes([OP_CONTRACT_DATA << 2])
+                + _CONTRACT_DATA.pack(index, len(encoded_data))
+                + encoded_data
+            )
+
+    def flush(self):
+        with self._lock:
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class Operation(NamedTuple):
+    step: int
+    name: str
+    args: tuple
+
+
+def read_log(path: str) -> bytes:
+    with open(path, "rb") as f:
+        buffer = f.read()
+    if not buffer.startswith(MAGIC):
+        raise Exception(f"File '{path}' is not an operation log")
+    if buffer[len(MAGIC)] != VERSION:
+        raise Exception(
+            f"Unsupported operation log version {buffer[len(MAGIC)]} in '{path}'"
+        )
+    return buffer
+
+
+def _iter_records(buffer: bytes) -> Iterator[tuple[int, tuple, int]]:
+    offset = len(HEADER)
+    try:
+        while offset < len(buffer):
+            code = buffer[offset]
+            offset += 1
+            op, kind = code >> 2, code & 3
+            if op == OP_ADDRESS:
+                (length,) = _ADDRESS.unpack_from(buffer, offset)
+                offset += _ADDRESS.size
+                fields: tuple = (read_bytes(buffer, offset, length).decode(),)
+                offset += length
+            elif op == OP_CREATE_ACCOUNT:
+                (index, key_length, balance), offset = unpack_record(
+                    buffer, offset, _CREATE_ACCOUNT, kind
+                )
+                key = read_bytes(buffer, offset, key_length).decode()
+                offset += key_length
+                fields = (index, key, balance)
+            elif op == OP_SET_BALANCE:
+                fields, offset = unpack_record(buffer, offset, _SET_BALANCE, kind)
+            elif op == OP_TRANSFER:
+                fields, offset = unpack_record(buffer, offset, _TRANSFER, kind)
+            elif op == OP_CONTRACT_DATA:
+                index, length = _CONTRACT_DATA.unpack_from(buffer, offset)
+                offset += _CONTRACT_DATA.size
+                fields = (index, read_bytes(buffer, offset, length).decode())
+                offset += length
+            else:
+                raise Exception(f"Unknown operation code {code} at offset {offset - 1}")
+            yield op, fields, offset
+    except struct.error:
+        return  # the record at the end is incomplete
+
+
+def iter_records(buffer: bytes) -> Iterator[tuple[int, tuple]]:
+    """Operation code and fields of every complete record, with addresses as indices."""
+    for op, fields, _ in _iter_records(buffer):
+        yield op, fields
+
+
+def iter_addresses(path: str) -> Iterator[str]:
+    """Addresses defined in a log, in index order."""
+    for op, fields in iter_records(read_log(path)):
+        if op == OP_ADDRESS:
+            yield fields[0]
+
+
+def iter_operations(path: str) -> Iterator[Operation]:
+    """Operations of a log with addresses resolved, for inspection around a given step."""
+    addresses: list[str] = []
+    step = 0
+    for op, fields in iter_records(read_log(path)):
+        if op == OP_ADDRESS:
+            addresses.append(fields[0])
+            continue
+        if op == OP_TRANSFER:
+            args: tuple = (addresses[fields[0]], addresses[fields[1]], fields[2])
+        else:
+            args = (addresses[fields[0]],) + fields[1:]
+        yield Operation(step, OPERATION_NAMES[op], args)
+        step += 1
+
+
+class ReplayState:
+    """Accounts and contract data rebuilt in memory by `replay`."""
+
+    def __init__(self):
+        self.step = 0
+        """Number of operations applied."""
+        self.addresses: list[str] = []
+        """Addresses by index in the log."""
+        self.balances: list[Number] = []
+        """Balances by address index."""
+        self.keys: dict[int, str] = {}
+        """Private keys of the accounts created in the log, by address index."""
+        self.contract_data: dict[int, str] = {}
+        """Latest serialized data of each contract, by address index."""
+
+    def balance(self, address: str) -> Number:
+        return self.balances[self.addresses.index(address)]
+
+    def get_balances(self) -> dict[str, Number]:
+        return dict(zip(self.addresses, self.balances))
+
+    def get_contract_data(self, address: str) -> Optional[dict]:
+        data = self.contract_data.get(self.addresses.index(address))
+        return None if data is None else json.loads(data)
+
+    def persist(self, db_path: str, contract_data_dir: str):
+        """
+        Write the state as a new `VM` and open it, to load contracts as they were at this step.
+        Each file is written once, and the target files must not exist yet.
+        """
+        from .utils import atomic_write
+        from .vm import VM, AccountInfo
+
+        assert not os.path.exists(db_path), f"Database '{db_path}' already exists"
+        documents = {
+            str(document_id): AccountInfo(
+                address=self.addresses[index],
+                key=key,
+                balance=self.balances[index],
+            ).dict()
+            for document_id, (index, key) in enumerate(self.keys.items(), start=1)
+        }
+        atomic_write(db_path, json.dumps({"_default": documents}))
+        vm = VM(db_path, contract_data_dir)
+        for index, data in self.contract_data.items():
+            contract_db_filepath, _ = vm._get_contract_filepaths(self.addresses[index])
+            assert not os.path.exists(
+                contract_db_filepath
+            ), f"Contract data '{contract_db_filepath}' already exists"
+            atomic_write(str(contract_db_filepath), data)
+        return vm
+
+
+def replay(path: str, until: Optional[int] = None) -> ReplayState:
+    """
+    Apply the operations of a log in memory, stopping after `until` operations if given,
+    or before an incomplete record at the end.
+    Nothing is written, and transfers are applied without checks since only committed ones are logged.
+    """
+    buffer = read_log(path)
+    state = ReplayState()
+    addresses, balances = state.addresses, state.balances
+    keys, contract_data = state.keys, state.contract_data
+    transfer_int64 = _TRANSFER[NUMBER_INT64]
+    transfer_int64_size = transfer_int64.size
+    transfer_int64_code = OP_TRANSFER << 2 | NUMBER_INT64
+    offset = len(HEADER)
+    end = len(buffer)
+    step = 0
+    limit = -1 if until is None else until
+    try:
+        while offset < end and step != limit:
+            code = buffer[offset]
+            offset += 1
+            if code == transfer_int64_code:
+                # the common case, kept free of function calls
+                sender, receiver, amount = transfer_int64.unpack_from(buffer, offset)
+                offset += transfer_int64_size
+                balances[sender] -= amount
+                balances[receiver] += amount
+                step += 1
+                continue
+            op, kind = code >> 2, code & 3
+            if op == OP_ADDRESS:
+                (length,) = _ADDRESS.unpack_from(buffer, offset)
+                offset += _ADDRESS.size
+                addresses.append(read_bytes(buffer, offset, length).decode())
+                balances.append(0)
+                offset += length
+                continue
+            if op == OP_TRANSFER:
+                (sender, receiver, amount), offset = unpack_record(
+                    buffer, offset, _TRANSFER, kind
+                )
+                balances[sender] -= amount
+                balances[receiver] += amount
+            elif op == OP_SET_BALANCE:
+                (index, balance), offset = unpack_record(
+                    buffer, offset, _SET_BALANCE, kind
+                )
+                balances[index] = balance
+            elif op == OP_CREATE_ACCOUNT:
+                (index, key_length, balance), offset = unpack_record(
+                    buffer, offset, _CREATE_ACCOUNT, kind
+                )
+                keys[index] = read_bytes(buffer, offset, key_length).decode()
+                offset += key_length
+                balances[index] = balance
+            elif op == OP_CONTRACT_DATA:
+                index, length = _CONTRACT_DATA.unpack_from(buffer, offset)
+                offset += _CONTRACT_DATA.size
+                contract_data[index] = read_bytes(buffer, offset, length).decode()
+                offset += length
+            else:
+                raise Exception(f"Unknown operation code {code} at offset {offset - 1}")
+            step += 1
+    except struct.error:
+        pass  # the record at the end is incomplete, and was not applied
+    state.step = step
+    return state
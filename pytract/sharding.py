@@ -0,0 +1,272 @@
+"""
+Sharded layout of `vm.VM`, for simulations spread over worker processes.
+
+Accounts and contract data are partitioned by address prefix into shards, each with its own
+account store and locks. Commits on a single shard lock and write that shard only, so processes
+working on different shards share no lock or file, only the CPUs and the disk: throughput grows
+with the CPUs available. Transfers between shards are committed with a two-phase commit, see `VM._commit`.
+"""
+
+import concurrent.futures
+import contextlib
+import json
+import os
+import pathlib
+import typing
+
+import tinydb
+
+from .config import type_checked
+from .utils import AtomicTinyDB, atomic_write
+from .vm import (
+    DEFAULT_CONTRACT_CACHE_BUDGET,
+    DEFAULT_MAX_CACHED_CONTRACTS,
+    VM,
+    Account,
+    Number,
+    ensure_dir,
+    generate_account_static_info,
+)
+
+R = typing.TypeVar("R")
+
+ADDRESS_PREFIX_DIGITS = 4
+"""Hex digits of an address, after `0x`, deciding its shard."""
+
+
+def get_shard(address: str, shard_count: int) -> int:
+    """Shard of `address`. Shards cover equal ranges of address prefixes."""
+    prefix = int(address[2 : 2 + ADDRESS_PREFIX_DIGITS], 16)
+    return (prefix * shard_count) >> (4 * ADDRESS_PREFIX_DIGITS)
+
+
+@type_checked
+class ShardedVM(VM):
+    def __init__(
+        self,
+        db_dir: str,
+        contract_data_dir: str,
+        shard_count: int,
+        readonly: bool = False,
+        max_cached_contracts: int = DEFAULT_MAX_CACHED_CONTRACTS,
+        contract_cache_budget: int = DEFAULT_CONTRACT_CACHE_BUDGET,
+        oplog_path: typing.Optional[str] = None,
+    ) -> None:
+        """
+        Accounts are stored in `<db_dir>/shard_<i>.json` and contract data under
+        `<contract_data_dir>/shard_<i>`. Every process opening the same directories
+        must use the same `shard_count`.
+        """
+        assert shard_count > 0, "Shard count must be positive"
+        self._shard_count = shard_count
+        super().__init__(
+            db_dir,
+            contract_data_dir,
+            readonly=readonly,
+            max_cached_contracts=max_cached_contracts,
+            contract_cache_budget=contract_cache_budget,
+            oplog_path=oplog_path,
+        )
+
+    def _init_stores(self, db_path: str):
+        db_dir = pathlib.Path(db_path)
+        self._shard_dbs = [
+            AtomicTinyDB(str(db_dir / f"shard_{it}.json"), readonly=self._readonly)
+            for it in range(self._shard_count)
+        ]
+        self._shard_contract_data_dirs = [
+            self._contract_data_dir / f"shard_{it}" for it in range(self._shard_count)
+        ]
+        self._journal_dir = self._contract_data_dir / "journals"
+        if not self._readonly:
+            ensure_dir(db_dir)
+            ensure_dir(self._journal_dir)
+            for it in self._shard_contract_data_dirs:
+                ensure_dir(it)
+                ensure_dir(it / "db")
+                ensure_dir(it / ".lock")
+
+    @property
+    def shard_count(self):
+        return self._shard_count
+
+    def get_shard(self, address: str) -> int:
+        return get_shard(address, self._shard_count)
+
+    def _get_db(self, address: str) -> AtomicTinyDB:
+        return self._shard_dbs[self.get_shard(address)]
+
+    def _get_all_dbs(self) -> list[AtomicTinyDB]:
+        return self._shard_dbs
+
+    def _get_contract_data_db_dirs(self) -> list[pathlib.Path]:
+        return [it / "db" for it in self._shard_contract_data_dirs]
+
+    def _get_transaction_dbs(
+        self, addresses: list[str]
+    ) -> list[AtomicTinyDB]:
+        # always locked in shard order, so concurrent commits cannot deadlock
+        shards = sorted(set(self.get_shard(it) for it in addresses))
+        return [self._shard_dbs[it] for it in shards]
+
+    def _get_contract_filepaths(self, address: str):
+        shard_dir = self._shard_contract_data_dirs[self.get_shard(address)]
+        contract_db_filepath = shard_dir / "db" / f"{address}.json"
+        contract_lock_filepath = shard_dir / ".lock" / f".{address}.lock"
+        return contract_db_filepath, contract_lock_filepath
+
+    def _get_journal_path(self, journal: dict) -> pathlib.Path:
+        """
+        Journal of a commit. Commits on different shards run concurrently, so each gets its own,
+        named after the shards it changes so they are found without reading every journal.
+        """
+        shards = self._get_transaction_dbs(list(journal["balances"].keys()))
+        shard_names = "-".join(str(self._shard_dbs.index(it)) for it in shards)
+        return self._journal_dir / f"{journal['id']}.{shard_names}.json"
+
+    @staticmethod
+    def _get_journal_shards(journal_path: pathlib.Path) -> set[int]:
+        shard_names = journal_path.name.split(".")[1]
+        return {int(it) for it in shard_names.split("-") if it != ""}
+
+    @staticmethod
+    def _read_journal(journal_path: pathlib.Path) -> typing.Optional[dict]:
+        try:
+            with open(journal_path, "r") as f:
+                return json.loads(f.read())
+        except FileNotFoundError:
+            return None  # finished by another process meanwhile
+
+    def _get_journal_paths(self) -> list[pathlib.Path]:
+        if not os.path.isdir(self._journal_dir):
+            return []
+        return [
+            self._journal_dir / it
+            for it in sorted(os.listdir(self._journal_dir))
+            if it.endswith(".json")
+        ]
+
+    def _has_journal(self, journal: dict) -> bool:
+        # commits writing a single shard leave the shared journal directory alone
+        files = len(self._get_transaction_dbs(list(journal["balances"].keys())))
+        return files + len(journal["contracts"]) > 1
+
+    def _write_journal(self, journal: dict):
+        if self._has_journal(journal):
+            atomic_write(str(self._get_journal_path(journal)), json.dumps(journal))
+
+    def _remove_journal(self, journal: dict):
+        if self._has_journal(journal):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self._get_journal_path(journal))
+
+    def _get_commit_record(self, journal: dict) -> dict:
+        # the journal is kept apart, shards only mark the commits applied to them
+        return dict(id=journal["id"], journal=self._get_journal_path(journal).name)
+
+    def _is_commit_pending(self, record: dict) -> bool:
+        return os.path.exists(self._journal_dir / record["journal"])
+
+    def _finish_pending_commits(self, dbs: dict[AtomicTinyDB, tinydb.TinyDB]):
+        # writers hold the shards of their commit until its journal is removed, so a journal
+        # on a shard locked here was left by a writer which died
+        locked_shards = {self._shard_dbs.index(it) for it in dbs.keys()}
+        for journal_path in self._get_journal_paths():
+            shards = self._get_journal_shards(journal_path)
+            if shards & locked_shards:
+                # shards not locked here are finished by the next commit locking them
+                self._finish_journal(
+                    journal_path, dbs, remove=shards <= locked_shards
+                )
+
+    def _finish_journal(
+        self,
+        journal_path: pathlib.Path,
+        dbs: dict[AtomicTinyDB, tinydb.TinyDB],
+        remove: bool,
+    ):
+        journal = self._read_journal(journal_path)
+        if journal is None:
+            return
+        with self._contract_locks(list(journal["contracts"].keys())):
+            # the commit may have been finished by its writer while waiting for the locks
+            if os.path.exists(journal_path):
+                self._apply_journal(dbs, journal)
+                if remove:
+                    self._remove_journal(journal)
+
+    def recover(self):
+        for journal_path in self._get_journal_paths():
+            journal = self._read_journal(journal_path)
+            if journal is None:
+                continue
+            with self._transaction(list(journal["balances"].keys())) as dbs:
+                self._finish_journal(journal_path, dbs, remove=True)
+
+    def create_account(
+        self, init_balance: Number = 0, shard: typing.Optional[int] = None
+    ):
+        """Create an account, in `shard` if given. Addresses are drawn until one falls into it."""
+        assert init_balance >= 0, "Initial balance must be non-negative"
+        account_static_info = generate_account_static_info()
+        if shard is not None:
+            assert 0 <= shard < self._shard_count, f"Shard {shard} out of range"
+            while self.get_shard(account_static_info.address) != shard:
+                account_static_info = generate_account_static_info()
+        return self._insert_account(account_static_info, init_balance)
+
+    def get_accounts(self, shard: int) -> list[Account]:
+        """Unlocked accounts stored in `shard`."""
+        documents = self._shard_dbs[shard].search(tinydb.Query().noop())
+        return [Account(it["address"], it["key"], vm=self) for it in documents]
+
+
+def _run_worker(
+    worker: typing.Callable[..., R],
+    db_dir: str,
+    contract_data_dir: str,
+    shard_count: int,
+    shards: list[int],
+    args: tuple,
+) -> R:
+    vm = ShardedVM(db_dir, contract_data_dir, shard_count)
+    with vm.engage():
+        return worker(vm, shards, *args)
+
+
+def run_sharded_workers(
+    worker: typing.Callable[..., R],
+    db_dir: str,
+    contract_data_dir: str,
+    shard_count: int,
+    processes: typing.Optional[int] = None,
+    args: tuple = (),
+) -> list[R]:
+    """
+    Run `worker(vm, shards, *args)` once in each process of a pool, with a `ShardedVM` engaged.
+    Shards are dealt round robin, and each worker owns the ones it is given: it creates and
+    moves funds of accounts in its own shards, touching other shards only for transfers between them.
+
+    `worker` must be picklable, like a module level function.
+    Returns the results of the workers in order. `processes` defaults to the number of CPUs.
+    """
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = min(processes, shard_count)
+    shard_groups = [list(range(it, shard_count, processes)) for it in range(processes)]
+    # create the stores and finish interrupted commits before the workers start
+    ShardedVM(db_dir, contract_data_dir, shard_count)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [
+            executor.submit(
+                _run_worker,
+                worker,
+                db_dir,
+                contract_data_dir,
+                shard_count,
+                shards,
+                args,
+            )
+            for shards in shard_groups
+        ]
+        return [it.result() for it in futures]
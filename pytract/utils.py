@@ -1,27 +1,41 @@
 import os
+import asyncio
+import collections.abc
+import concurrent.futures
 import functools
+import threading
 import beartype
 import filelock
 import tinydb
 import json
+import mmap
+import struct
+import tempfile
+import typing
 import typing_extensions
 
 from contextlib import contextmanager
 from beartype.vale import Is
-import web3
+
+from . import instrumentation
+from .config import type_checked
 
 
 def generate_address_and_key():
-    account = web3.Account.create()
+    from eth_account import Account
+
+    account = Account.create()
     address = account.address
     key = account.key.hex()
     return address, key
 
 @beartype.beartype
 def check_key_validity(address: str, key: str, enforce: bool = False):
+    from eth_account import Account
+
     ret = False
     try:
-        account = web3.Account.from_key(key)
+        account = Account.from_key(key)
         ret = account.address == address
     except:
         pass
@@ -30,6 +44,8 @@ def check_key_validity(address: str, key: str, enforce: bool = False):
     return ret
 
 
+# no longer used by the stores, which check serializability with the dump they persist,
+# but kept along with `JSONSerializableObject` as part of the public API of this module
 def check_if_serializable(data:object) -> bool:
     serializable = False
     try:
@@ -52,39 +68,285 @@ def ensure_dir(dir_path: str):
         os.mkdir(dir_path)
 
 
+class ReadOnlyException(Exception): ...
+
+
+FileVersion = tuple[int, int, int]
+
+
+def stat_to_file_version(stat: os.stat_result) -> FileVersion:
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def file_version(path: str) -> typing.Optional[FileVersion]:
+    """Identify the currently published version of a file written by `atomic_write`, or None if missing."""
+    try:
+        return stat_to_file_version(os.stat(path))
+    except FileNotFoundError:
+        return None
+
+
+def read_versioned(path: str) -> tuple[str, FileVersion]:
+    """Read a file along with the version of exactly the content read."""
+    with open(path, "r") as f:
+        version = stat_to_file_version(os.fstat(f.fileno()))
+        return f.read(), version
+
+
+def fsync_dir(path: str):
+    """Make the entries of directory `path`, like a file renamed into it, survive a power loss."""
+    if os.name != "posix":
+        return  # directories cannot be opened elsewhere
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path: str, content: str):
+    """
+    Write to a temporary file and rename it over `path`.
+    Readers therefore see either the old or the new content, never a partial write.
+    The content and the rename reach the disk before returning, so a crash keeps either as well.
+    """
+    dirname, basename = os.path.split(os.path.abspath(path))
+    mode = os.stat(path).st_mode & 0o777 if os.path.exists(path) else 0o644
+    fd, tmp_path = tempfile.mkstemp(dir=dirname, prefix=f".{basename}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+        fsync_dir(dirname)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class AtomicJSONStorage(tinydb.Storage):
+    """TinyDB JSON storage which publishes every write with `atomic_write`."""
+
+    def __init__(self, path: str, **kwargs):
+        self._path = path
+        self.kwargs = kwargs
+        self.written: typing.Optional[dict] = None
+        """Data of the last write, which callers must not change afterwards."""
+
+    def read(self) -> typing.Optional[dict]:
+        if not os.path.exists(self._path):
+            return None
+        with open(self._path, "r") as f:
+            content = f.read()
+        instrumentation.record("bytes_read", len(content))
+        if content == "":
+            return None
+        return json.loads(content)
+
+    def write(self, data: dict):
+        content = json.dumps(data, **self.kwargs)
+        instrumentation.record("bytes_written", len(content))
+        atomic_write(self._path, content)
+        self.written = data
+
+
 # TODO: use tinydb context with filelock to ensure data consistency
 @contextmanager
 def tinydb_context(db_path: str):
     prefix, suffix = os.path.split(db_path)
     db_lockpath = os.path.join(prefix, f".{suffix}.lock")
-    with filelock.FileLock(db_lockpath):
-        with tinydb.TinyDB(db_path) as db:
-            yield db
+    with instrumentation.span("tinydb.transaction", path=db_path) as span:
+        with instrumentation.timed_lock(filelock.FileLock(db_lockpath), span):
+            with tinydb.TinyDB(db_path, storage=AtomicJSONStorage) as db:
+                yield db
 
 
-@beartype.beartype
+@type_checked
 class AtomicTinyDB:
-    def __init__(self, db_path: str):
+    """
+    TinyDB guarded by a file lock, which writes take.
+
+    Reads take no lock: they are served from an in-memory snapshot of the published version,
+    which is reloaded whenever another writer publishes a new one, and replaced by the data
+    of the writes made through this instance. With `readonly=True` nothing is written.
+    """
+
+    def __init__(self, db_path: str, readonly: bool = False):
+        self._db_path = db_path
+        self._readonly = readonly
         self._db_context_builder = functools.partial(tinydb_context, db_path)
+        self._snapshot: typing.Optional[tinydb.TinyDB] = None
+        self._snapshot_version: typing.Optional[FileVersion] = None
 
-    def update(self, *args, **kwargs):
+    @property
+    def readonly(self):
+        return self._readonly
+
+    def _load_snapshot(self) -> tinydb.TinyDB:
+        current_version = file_version(self._db_path)
+        if self._snapshot is None or current_version != self._snapshot_version:
+            data, version = {}, current_version
+            if current_version is not None:
+                content, version = read_versioned(self._db_path)
+                instrumentation.record("bytes_read", len(content))
+                if content != "":
+                    data = json.loads(content)
+            self._set_snapshot(data, version)
+        return self._snapshot
+
+    def _set_snapshot(self, data: dict, version: typing.Optional[FileVersion]):
+        snapshot = tinydb.TinyDB(storage=tinydb.storages.MemoryStorage)
+        snapshot.storage.write(data)
+        self._snapshot, self._snapshot_version = snapshot, version
+
+    @contextmanager
+    def _read_context(self):
+        # versions are published by atomic rename, so the latest one is read without the lock
+        yield self._load_snapshot()
+
+    @contextmanager
+    def _write_context(self):
+        if self._readonly:
+            raise ReadOnlyException(f"Database '{self._db_path}' is opened read-only")
         with self._db_context_builder() as db:
+            yield db
+            written = db.storage.written
+            if written is not None:
+                # still locked, so the published version is the one just written
+                self._set_snapshot(written, file_version(self._db_path))
+
+    @contextmanager
+    def transaction(self):
+        """
+        Hold the lock for the whole block, so reads and writes on the yielded database
+        form a single read-modify-write. Use `update_multiple` to change several documents in one write.
+        """
+        with self._write_context() as db:
+            yield db
+
+    def update(self, *args, **kwargs):
+        with self._write_context() as db:
             return db.update(*args, **kwargs)
 
     def search(self, *args, **kwargs):
-        with self._db_context_builder() as db:
+        with self._read_context() as db:
             return db.search(*args, **kwargs)
 
     def get(self, *args, **kwargs):
-        with self._db_context_builder() as db:
+        with self._read_context() as db:
             return db.get(*args, **kwargs)
 
     def insert(self, *args, **kwargs):
-        with self._db_context_builder() as db:
+        with self._write_context() as db:
             return db.insert(*args, **kwargs)
 
 
-@beartype.beartype
+class AsyncExecutorFacade:
+    """
+    Base of asyncio facades over blocking stores.
+
+    Writes are serialized through an asyncio queue and run one at a time on a dedicated
+    writer thread. Reads run concurrently on a pool of reader threads, each owning its own
+    read-only instance built by `reader_factory`, so they never take the writer's locks.
+    """
+
+    def __init__(
+        self,
+        writer: object,
+        reader_factory: typing.Callable[[], object],
+        max_readers: int = 4,
+    ):
+        self._writer = writer
+        self._reader_factory = reader_factory
+        self._readers = threading.local()
+        self._read_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_readers, thread_name_prefix="pytract-read"
+        )
+        self._write_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="pytract-write"
+        )
+        self._write_loop: typing.Optional[asyncio.AbstractEventLoop] = None
+        """Event loop of the write queue, which is created again when used from another loop."""
+        self._write_queue: typing.Optional[asyncio.Queue] = None
+        self._write_worker: typing.Optional[asyncio.Task] = None
+
+    def _get_reader(self):
+        reader = getattr(self._readers, "instance", None)
+        if reader is None:
+            reader = self._readers.instance = self._reader_factory()
+        return reader
+
+    def _call_reader(self, method_name: str, args: tuple, kwargs: dict):
+        return getattr(self._get_reader(), method_name)(*args, **kwargs)
+
+    async def _read(self, method_name: str, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._read_executor,
+            functools.partial(self._call_reader, method_name, args, kwargs),
+        )
+
+    async def _write(self, method_name: str, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        if self._write_queue is None or self._write_loop is not loop:
+            # writes queued on a previous loop still go through the single writer thread
+            self._write_loop = loop
+            self._write_queue = asyncio.Queue()
+            self._write_worker = loop.create_task(
+                self._process_writes(self._write_queue)
+            )
+        queue = self._write_queue
+        future = loop.create_future()
+        call = functools.partial(getattr(self._writer, method_name), *args, **kwargs)
+        await queue.put((call, future))
+        return await future
+
+    async def _process_writes(self, queue: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            call, future = await queue.get()
+            try:
+                result = await loop.run_in_executor(self._write_executor, call)
+                if not future.cancelled():
+                    future.set_result(result)
+            except Exception as e:
+                if not future.cancelled():
+                    future.set_exception(e)
+            finally:
+                queue.task_done()
+
+    async def aclose(self):
+        """Wait for queued writes to finish, then release the worker threads."""
+        loop = asyncio.get_running_loop()
+        if self._write_queue is not None and self._write_loop is loop:
+            await self._write_queue.join()
+            typing.cast(asyncio.Task, self._write_worker).cancel()
+        self._write_loop = self._write_queue = self._write_worker = None
+        self._read_executor.shutdown(wait=False)
+        # waiting for the writer thread would block the event loop
+        await loop.run_in_executor(
+            None, functools.partial(self._write_executor.shutdown, wait=True)
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+
+def serialize_json(data: object) -> str:
+    """Serialize to JSON, raising if not serializable. Doubles as the serializability check."""
+    try:
+        return json.dumps(data, ensure_ascii=False)
+    except (TypeError, ValueError) as e:
+        raise Exception(f"Data not JSON serializable: {e}") from e
+
+
+@type_checked
 class AtomicKVStore:
     def __init__(self, storage_location: str, readonly_keys: list[str] = []):
         self.storage_location = storage_location
@@ -92,32 +354,362 @@ class AtomicKVStore:
         self.load_data()
 
     def load_data(self):
+        self._payloads: dict[str, str] = {}
+        """Serialized value of each key, reused by `persist_data` until the value is set again or handed out."""
         if os.path.exists(self.storage_location):
             with open(self.storage_location, "r") as f:
-                self.data = json.loads(f.read())
+                self._data = json.loads(f.read())
         else:
-            self.data = {}
+            self._data = {}
             self.persist_data()
 
+    @property
+    def data(self) -> dict[str, object]:
+        """All values. They may be changed in place, so all of them are serialized again on the next write."""
+        self._payloads.clear()
+        return self._data
+
+    @data.setter
+    def data(self, value: dict[str, object]):
+        self._payloads.clear()
+        self._data = value
+
     def persist_data(self):
-        with open(self.storage_location, "w+") as f:
-            f.write(json.dumps(self.data, ensure_ascii=False))
+        # values are serialized once when set, only unseen ones are serialized here
+        entries = []
+        for key, value in self._data.items():
+            payload = self._payloads.get(key)
+            if payload is None:
+                payload = self._payloads[key] = serialize_json(value)
+            entries.append(f"{serialize_json(key)}: {payload}")
+        atomic_write(self.storage_location, "{" + ", ".join(entries) + "}")
 
     def set(
-        self, key: str, value: JSONSerializableObject
+        self, key: str, value: object
     ):  # value shall be json serializable
-        if key in self.readonly_keys:
-            if key in self.data.keys():
-                raise Exception(f"Cannot set readonly key '{key}' twice")
-        self.data[key] = value
+        self.set_many({key: value})
+
+    def set_many(self, items: dict[str, object]):
+        """
+        Set several keys with a single write. Nothing is set if any key is rejected.
+        The values are stored as they will be read back, so changing them afterwards does not change the store.
+        """
+        payloads = {}
+        for key, value in items.items():
+            if key in self.readonly_keys:
+                if key in self._data.keys():
+                    raise Exception(f"Cannot set readonly key '{key}' twice")
+            payloads[key] = serialize_json(value)
+        self._data.update({key: json.loads(it) for key, it in payloads.items()})
+        self._payloads.update(payloads)
         self.persist_data()
 
-    def get(self, key: str) -> JSONSerializableObject:
-        return self.data[key]
+    def get(self, key: str) -> object:
+        value = self._data[key]
+        # the caller may change the value in place
+        self._payloads.pop(key, None)
+        return value
+
+    def keys(self) -> list[str]:
+        return list(self._data.keys())
+
+    def items(self) -> typing.Iterator[tuple[str, object]]:
+        """Keys and values for reading only. Change values through `get` or `data`, so they are written again."""
+        return iter(list(self._data.items()))
+
+    def get_many(self, keys: typing.Iterable[str]) -> list[object]:
+        """Values of `keys` in order, None for the missing ones, for reading only like `items`."""
+        return [self._data.get(it) for it in keys]
 
     @contextmanager
     def context(self):
         try:
             yield self
         finally:
+            # values may have been changed in place, so serialize all of them again
+            self._payloads.clear()
             self.persist_data()
+
+
+class _IndexedKVData(collections.abc.Mapping):
+    """Read-only mapping over an `IndexedKVStore`, decoding values on access."""
+
+    def __init__(self, store: "IndexedKVStore"):
+        self._store = store
+
+    def __getitem__(self, key: str) -> object:
+        return self._store.get(key)
+
+    def __iter__(self):
+        return iter(list(self._store._index.keys()))
+
+    def __len__(self) -> int:
+        return len(self._store._index)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._store._index
+
+
+@type_checked
+class IndexedKVStore:
+    """
+    Key-value store with the API of `AtomicKVStore`, for stores too large to keep in memory.
+
+    Values are appended to a record file as `key length, value length, key, JSON value`, in batches
+    prefixed with their size, one batch per write. Only the index from key to value offset is kept
+    in memory, built at load time from the record headers, and `get` decodes just the requested
+    value from a memory map of the file.
+    Superseded records are dropped by `compact`, run by `set` once they outweigh the live ones.
+
+    A batch torn by a crash during a write is discarded on the next load, so every `set` and
+    `set_many` is atomic, and it is on disk once it returns. Handles in several threads or processes may share a store: writes
+    take a file lock, and reads and writes first pick up the batches appended by other handles,
+    or the file they rewrote with `compact`.
+    """
+
+    MAGIC = b"PYTRACTKV"
+    VERSION = 1
+    HEADER = MAGIC + bytes([VERSION])
+    BATCH_HEADER = struct.Struct("<I")
+    RECORD_HEADER = struct.Struct("<II")
+    COMPACT_MIN_BYTES = 1 << 20
+
+    def __init__(self, storage_location: str, readonly_keys: list[str] = []):
+        self.storage_location = storage_location
+        self.readonly_keys = readonly_keys
+        dirname, basename = os.path.split(os.path.abspath(storage_location))
+        self._lock = filelock.FileLock(os.path.join(dirname, f".{basename}.lock"))
+        self._file: typing.Optional[typing.BinaryIO] = None
+        self._map: typing.Optional[mmap.mmap] = None
+        self._inode: typing.Optional[int] = None
+        """Inode of the open file, which `compact` of another handle replaces."""
+        self._end = 0
+        """Offset after the last complete batch indexed."""
+        self._fetched: typing.Optional[dict[str, object]] = None
+        """Values returned by `get` inside `context`, written back when it exits."""
+        self.load_data()
+
+    @property
+    def data(self) -> collections.abc.Mapping[str, object]:
+        return _IndexedKVData(self)
+
+    def _remap(self):
+        if self._map is not None:
+            self._map.close()
+        file = typing.cast(typing.BinaryIO, self._file)
+        self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def load_data(self):
+        with self._lock:
+            self.close()
+            self._index: dict[str, tuple[int, int]] = {}
+            """Offset and length of the serialized value of each key."""
+            self._live_size = self._garbage_size = 0
+            path = self.storage_location
+            if not os.path.exists(path) or os.path.getsize(path) == 0:
+                # empty files cannot be mapped, so they get their header first
+                atomic_write(self.storage_location, self.HEADER.decode())
+            self._file = open(self.storage_location, "r+b")
+            self._inode = os.fstat(self._file.fileno()).st_ino
+            self._remap()
+            buffer = typing.cast(mmap.mmap, self._map)
+            if buffer[: len(self.HEADER)] != self.HEADER:
+                raise Exception(
+                    f"File '{self.storage_location}' is not an indexed key-value store"
+                )
+            self._end = len(self.HEADER)
+            self._index_batches()
+            if self._end != len(buffer):
+                # drop the batch torn by an interrupted write, as none is being written under the lock
+                self._file.truncate(self._end)
+                self._remap()
+
+    def _index_batches(self):
+        """Index the complete batches after the ones indexed already."""
+        buffer = typing.cast(mmap.mmap, self._map)
+        batch_header, record_header = self.BATCH_HEADER, self.RECORD_HEADER
+        offset, end = self._end, len(buffer)
+        while offset + batch_header.size <= end:
+            (batch_size,) = batch_header.unpack_from(buffer, offset)
+            offset += batch_header.size
+            batch_end = offset + batch_size
+            if batch_end > end:
+                break
+            while offset < batch_end:
+                key_length, value_length = record_header.unpack_from(buffer, offset)
+                value_offset = offset + record_header.size + key_length
+                key = buffer[offset + record_header.size : value_offset].decode()
+                self._set_location(key, (value_offset, value_length))
+                offset = value_offset + value_length
+            self._end = batch_end
+
+    def _set_location(self, key: str, location: tuple[int, int]):
+        previous = self._index.get(key)
+        if previous is not None:
+            self._live_size -= previous[1]
+            self._garbage_size += previous[1]
+        self._index[key] = location
+        self._live_size += location[1]
+
+    def _refresh(self):
+        """Pick up the writes of other handles: batches appended, or the file replaced by `compact`."""
+        stat = os.stat(self.storage_location)
+        if stat.st_ino != self._inode:
+            self.load_data()
+        elif stat.st_size > self._end:
+            if stat.st_size > len(typing.cast(mmap.mmap, self._map)):
+                self._remap()
+            self._index_batches()
+
+    def _read_value(self, key: str) -> bytes:
+        offset, length = self._index[key]
+        if offset + length > len(typing.cast(mmap.mmap, self._map)):
+            self._remap()
+        return typing.cast(mmap.mmap, self._map)[offset : offset + length]
+
+    def persist_data(self):
+        """Write back the values fetched in the current `context`. Every `set` is already on disk."""
+        if self._fetched is not None:
+            with self._lock:
+                self._refresh()
+                items = {}
+                for key, value in self._fetched.items():
+                    payload = serialize_json(value).encode()
+                    if key not in self._index or payload != self._read_value(key):
+                        items[key] = payload
+                self._append(items)
+
+    def _append(self, payloads: dict[str, bytes]):
+        """Write `payloads` as one batch, with the lock held and the index refreshed."""
+        if payloads == {}:
+            return
+        file = typing.cast(typing.BinaryIO, self._file)
+        offset = self._end + self.BATCH_HEADER.size
+        records = []
+        locations = {}
+        for key, payload in payloads.items():
+            encoded_key = key.encode()
+            records.append(self.RECORD_HEADER.pack(len(encoded_key), len(payload)))
+            records.append(encoded_key)
+            offset += self.RECORD_HEADER.size + len(encoded_key)
+            records.append(payload)
+            locations[key] = (offset, len(payload))
+            offset += len(payload)
+        batch = b"".join(records)
+        file.seek(self._end)
+        file.write(self.BATCH_HEADER.pack(len(batch)) + batch)
+        file.flush()
+        # the batch is on disk before it is indexed and the lock is released
+        os.fsync(file.fileno())
+        self._end = offset
+        for key, location in locations.items():
+            self._set_location(key, location)
+        if self._garbage_size > max(self._live_size, self.COMPACT_MIN_BYTES):
+            self.compact()
+
+    def compact(self):
+        """Rewrite the file with the live records only. Other handles reopen it on their next access."""
+        dirname, basename = os.path.split(os.path.abspath(self.storage_location))
+        with self._lock:
+            self._refresh()
+            fd, tmp_path = tempfile.mkstemp(
+                dir=dirname, prefix=f".{basename}.", suffix=".tmp"
+            )
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(self.HEADER)
+                    for key in self._index.keys():
+                        encoded_key = key.encode()
+                        value = self._read_value(key)
+                        f.write(
+                            self.BATCH_HEADER.pack(
+                                self.RECORD_HEADER.size + len(encoded_key) + len(value)
+                            )
+                        )
+                        f.write(self.RECORD_HEADER.pack(len(encoded_key), len(value)))
+                        f.write(encoded_key)
+                        f.write(value)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.storage_location)
+                fsync_dir(dirname)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            self.load_data()
+
+    def set(self, key: str, value: object):  # value shall be json serializable
+        self.set_many({key: value})
+
+    def set_many(self, items: dict[str, object]):
+        """
+        Set several keys with a single write, which a crash keeps whole or drops whole.
+        Nothing is set if any key is rejected.
+        """
+        payloads = {key: serialize_json(value).encode() for key, value in items.items()}
+        with self._lock:
+            self._refresh()
+            for key in items.keys():
+                if key in self.readonly_keys:
+                    if key in self._index:
+                        raise Exception(f"Cannot set readonly key '{key}' twice")
+            if self._fetched is not None:
+                for key in items.keys():
+                    self._fetched.pop(key, None)
+            self._append(payloads)
+
+    def get(self, key: str) -> object:
+        if self._fetched is not None and key in self._fetched:
+            return self._fetched[key]
+        self._refresh()
+        value = json.loads(self._read_value(key))
+        if self._fetched is not None:
+            self._fetched[key] = value
+        return value
+
+    def _peek(self, key: str) -> object:
+        """Value of an indexed key, without tracking it in `context`."""
+        if self._fetched is not None and key in self._fetched:
+            return self._fetched[key]
+        return json.loads(self._read_value(key))
+
+    def keys(self) -> list[str]:
+        self._refresh()
+        return list(self._index.keys())
+
+    def items(self) -> typing.Iterator[tuple[str, object]]:
+        """Keys and values, decoded one at a time."""
+        for key in self.keys():
+            yield key, self._peek(key)
+
+    def get_many(self, keys: typing.Iterable[str]) -> list[object]:
+        """Values of `keys` in order, None for the missing ones."""
+        self._refresh()
+        return [self._peek(it) if it in self._index else None for it in keys]
+
+    @contextmanager
+    def context(self):
+        """
+        Values fetched with `get` inside the block may be changed in place,
+        they are written back when it exits.
+        """
+        outer = self._fetched is not None
+        if not outer:
+            self._fetched = {}
+        try:
+            yield self
+        finally:
+            if not outer:
+                try:
+                    self.persist_data()
+                finally:
+                    self._fetched = None
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -1,10 +1,22 @@
 # smart contract web3 virtual machine
-from .utils import AtomicTinyDB, generate_address_and_key, check_key_validity
+from .utils import (
+    AsyncExecutorFacade,
+    AtomicTinyDB,
+    FileVersion,
+    ReadOnlyException,
+    atomic_write,
+    file_version,
+    read_versioned,
+    generate_address_and_key,
+    check_key_validity,
+)
+from . import instrumentation
+from .oplog import OperationLog, ReplayState, replay
 import tinydb
 
 # import abc
 import pydantic
-import beartype
+from .config import type_checked
 import filelock
 
 try:
@@ -22,16 +34,29 @@ except:
 
 from typing import Union
 from contextlib import contextmanager
+import collections
+import collections.abc
+import contextlib
+import contextvars
+import functools
 import os
 import pathlib
 import json
 import hashlib
+import threading
 import typing_extensions
+import uuid
 
 # import dill
 import typing
 
 Number = Union[int, float]
+
+DEFAULT_MAX_CACHED_CONTRACTS = 1024
+DEFAULT_CONTRACT_CACHE_BUDGET = 64 * 1024 * 1024
+"""Default total size in bytes of the serialized data of the contracts a `VM` keeps loaded."""
+COMMITS_TABLE = "commits"
+"""Table of the account stores recording the commits applied to them, see `VM._commit`."""
 P = typing_extensions.ParamSpec("P")
 R = typing.TypeVar("R")
 
@@ -42,12 +67,65 @@ def generate_account_static_info():
     return ret
 
 
-_default_vm: Optional["VM"] = None
+_engaged_vm: contextvars.ContextVar[Optional["VM"]] = contextvars.ContextVar(
+    "pytract_engaged_vm", default=None
+)
+"""VM engaged in the current thread or asyncio task."""
+
+_engaged_recipients: contextvars.ContextVar[dict["Account", "Account"]] = (
+    contextvars.ContextVar("pytract_engaged_recipients", default={})
+)
+"""Default recipient of each engaged account, in the current thread or asyncio task."""
+
+_engaged_callers: contextvars.ContextVar[dict["SmartContract", "Account"]] = (
+    contextvars.ContextVar("pytract_engaged_callers", default={})
+)
+"""Caller of each engaged contract, in the current thread or asyncio task."""
+
+_transfer_amounts: contextvars.ContextVar[dict["SmartContract", Number]] = (
+    contextvars.ContextVar("pytract_transfer_amounts", default={})
+)
+"""Amount received by each contract in the ongoing call, in the current thread or asyncio task."""
+
+
+_units: contextvars.ContextVar[dict["VM", "UnitOfWork"]] = (
+    contextvars.ContextVar("pytract_units", default={})
+)
+"""Unit of work open on each VM, in the current thread or asyncio task."""
+
+
+def _set_engaged(
+    var: contextvars.ContextVar[dict], key: object, value: object
+) -> contextvars.Token:
+    # the mappings are never mutated in place, so contexts copied from this one are not affected
+    return var.set({**var.get(), key: value})
 
 
 class EngageException(Exception): ...
 
 
+def get_data_hash(serialized_data: str) -> str:
+    return hashlib.sha256(serialized_data.encode()).hexdigest()
+
+
+class UnitOfWork:
+    """Changes of an ongoing call, written together by `VM.unit_of_work` when it ends."""
+
+    def __init__(self):
+        self.balance_deltas: dict[str, Number] = {}
+        """Pending balance changes, by account address."""
+        self.transfers: list[tuple[str, str, Number]] = []
+        """Transfers making up the balance changes, for the operation log."""
+        self.contracts: dict["SmartContract", None] = {}
+        """Contracts whose data may have changed, in the order they were touched."""
+
+    def add_balance_delta(self, address: str, delta: Number):
+        self.balance_deltas[address] = self.balance_deltas.get(address, 0) + delta
+
+    def add_contract(self, contract: "SmartContract"):
+        self.contracts[contract] = None
+
+
 class AccountBase(pydantic.BaseModel):
     type: Literal["account"] = "account"
 
@@ -79,12 +157,12 @@ class AccountInfo(AccountBase, AccountStaticInfo, AccountVolatileInfo): ...
 
 
 def get_vm_with_fallback(vm: Optional["VM"]):
-    global _default_vm
     if vm is None:
-        if _default_vm is None:
+        engaged_vm = _engaged_vm.get()
+        if engaged_vm is None:
             raise EngageException("VM not engaged")
         else:
-            return _default_vm
+            return engaged_vm
     else:
         return vm
 
@@ -96,38 +174,165 @@ def ensure_dir(dirpath: Union[str, pathlib.Path]):
         os.mkdir(dirpath)
 
 
-@beartype.beartype
+@type_checked
 class VM:
-    def __init__(self, db_path: str, contract_data_dir: str) -> None:
-        self._db = AtomicTinyDB(db_path)
+    def __init__(
+        self,
+        db_path: str,
+        contract_data_dir: str,
+        readonly: bool = False,
+        max_cached_contracts: int = DEFAULT_MAX_CACHED_CONTRACTS,
+        contract_cache_budget: int = DEFAULT_CONTRACT_CACHE_BUDGET,
+        oplog_path: Optional[str] = None,
+    ) -> None:
+        """
+        With `readonly=True` the VM never takes locks or writes. Account and contract data
+        are read from the latest version published by the writer.
+
+        Loaded contracts are kept by address, so loading one again returns the same object.
+        Beyond `max_cached_contracts` contracts or `contract_cache_budget` bytes of serialized data,
+        the least recently loaded ones are stored and dropped.
+
+        With `oplog_path`, every committed operation is appended to an operation log, which
+        `VM.replay` turns back into state. A new log starts with the accounts and contracts
+        already stored, so it replays on its own.
+        """
+        self._max_cached_contracts = max_cached_contracts
+        self._contract_cache_budget = contract_cache_budget
+        self._contracts: "collections.OrderedDict[str, SmartContract]" = (
+            collections.OrderedDict()
+        )
+        """Loaded contracts by address, least recently used first."""
+        self._contract_sizes: dict[str, int] = {}
+        self._contracts_size = 0
+        self._contracts_lock = threading.RLock()
+        self._readonly = readonly
         self._contract_data_dir = pathlib.Path(contract_data_dir)
+        if not readonly:
+            ensure_dir(self._contract_data_dir)
+        self._init_stores(db_path)
+        if not readonly:
+            self.recover()
+        self._oplog: Optional[OperationLog] = None
+        if oplog_path is not None:
+            if readonly:
+                raise ReadOnlyException("Cannot record operations in a read-only VM")
+            self._oplog = OperationLog(oplog_path)
+            if self._oplog.created:
+                self._log_stored_state()
+
+    def _init_stores(self, db_path: str):
+        self._db = AtomicTinyDB(db_path, readonly=self._readonly)
         self._contract_data_db_dir = self._contract_data_dir / "db"
         self._contract_data_lock_dir = self._contract_data_dir / ".lock"
-        ensure_dir(self._contract_data_dir)
-        ensure_dir(self._contract_data_db_dir)
-        ensure_dir(self._contract_data_lock_dir)
+        if not self._readonly:
+            ensure_dir(self._contract_data_db_dir)
+            ensure_dir(self._contract_data_lock_dir)
+
+    @property
+    def readonly(self):
+        return self._readonly
+
+    def _get_db(self, address: str) -> AtomicTinyDB:
+        """Store holding the account at `address`."""
+        return self._db
+
+    def _get_all_dbs(self) -> list[AtomicTinyDB]:
+        return [self._db]
+
+    def _get_contract_data_db_dirs(self) -> list[pathlib.Path]:
+        return [self._contract_data_db_dir]
+
+    def _get_transaction_dbs(
+        self, addresses: list[str]
+    ) -> list[AtomicTinyDB]:
+        """
+        Stores to lock, in order, for a commit changing the balances at `addresses`.
+        The single store is locked even without balance changes, as it records every commit.
+        """
+        return [self._db]
+
+    def _group_by_db(
+        self, addresses: collections.abc.Iterable[str]
+    ) -> dict[AtomicTinyDB, list[str]]:
+        ret: dict[AtomicTinyDB, list[str]] = {}
+        for address in addresses:
+            ret.setdefault(self._get_db(address), []).append(address)
+        return ret
+
+    @contextmanager
+    def _transaction(self, addresses: list[str]):
+        """
+        Hold the locks of the stores involved, yielding their open databases by store.
+        Commits left unfinished on these stores by a writer which died are finished first.
+        """
+        with contextlib.ExitStack() as stack:
+            dbs = {
+                it: stack.enter_context(it.transaction())
+                for it in self._get_transaction_dbs(addresses)
+            }
+            self._finish_pending_commits(dbs)
+            yield dbs
+
+    def _finish_pending_commits(self, dbs: dict[AtomicTinyDB, tinydb.TinyDB]):
+        # the single store records the last commit, whose contracts may not all be written
+        for journal in dbs[self._db].table(COMMITS_TABLE).all():
+            pending = [
+                address
+                for address, it in journal["contracts"].items()
+                if self._get_journal_version(address) == it["version"]
+            ]
+            if pending != []:
+                with self._contract_locks(pending):
+                    self._apply_contracts(journal)
+
+    def _get_commit_record(self, journal: dict) -> dict:
+        """What stores record of a commit applied to them. The single store keeps the whole journal."""
+        return journal
+
+    def _is_commit_pending(self, record: dict) -> bool:
+        """
+        Whether a commit recorded by a store may still be replayed, so the store keeps its record.
+        Commits on the single store are finished before the next one, which replaces the record.
+        """
+        return False
+
+    def _write_journal(self, journal: dict):
+        """Publish the journal of a commit changing several files. The single store records it instead."""
+
+    def _remove_journal(self, journal: dict):
+        """Drop the journal of a finished commit."""
 
     def transfer(self, sender: "Account", receiver: "Account", amount: Number):
+        """
+        Move `amount` from `sender` to `receiver`, if the sender can afford it.
+        Inside a unit of work the transfer is applied when the unit commits, otherwise right away.
+        """
         assert amount > 0, "Transfer amount must be positive"
-        sender_balance = sender.balance
-        sender_new_balance = sender_balance - amount
-        if sender_new_balance > 0:
-            # able to transact
-            receiver_new_balance = receiver.balance + amount
-            # this is atomic operation.
-            self.set_balance(sender, sender_new_balance)
-            self.set_balance(receiver, receiver_new_balance)
+        with self.unit_of_work() as unit:
+            sender_balance = self.balance(sender)
+            sender_new_balance = sender_balance - amount
+            if sender_new_balance > 0:
+                # able to transact
+                unit.add_balance_delta(sender._address, -amount)
+                unit.add_balance_delta(receiver._address, amount)
+                unit.transfers.append((sender._address, receiver._address, amount))
 
     def set_balance(self, account: "Account", balance: Number):
         assert balance >= 0, "Balance must be non-negative"
         doc_id = self.query_for_single_account_document_id(account)
-        updated_ids = self._db.update(
+        updated_ids = self._get_db(account._address).update(
             AccountVolatileInfo(balance=balance).dict(), doc_ids=[doc_id]
         )
         assert len(updated_ids) == 1, "Failed to set balance because of having "
+        if self._oplog is not None:
+            self._oplog.set_balance(account._address, balance)
+            self._oplog.flush()
 
     def query_for_single_account_document_id(self, account: "Account"):
-        candidates = self._db.search(cond=tinydb.Query().address == account._address)
+        candidates = self._get_db(account._address).search(
+            cond=tinydb.Query().address == account._address
+        )
         if candidates == []:
             raise Exception("Account does not exist")
         elif len(candidates) == 1:
@@ -135,72 +340,382 @@ class VM:
         else:
             raise Exception(f"Multiple accounts found for address '{account._address}'")
 
+    @staticmethod
+    def _get_balances_from_documents(
+        documents: list[tinydb.table.Document], addresses: list[str]
+    ) -> dict[str, Number]:
+        ret: dict[str, Number] = {}
+        for document in documents:
+            address = document["address"]
+            if address in ret:
+                raise Exception(f"Multiple accounts found for address '{address}'")
+            ret[address] = AccountInfo.parse_obj(document).balance
+        for address in addresses:
+            if address not in ret:
+                raise Exception("Account does not exist")
+        return ret
+
+    def _get_committed_balances(
+        self, addresses: list[str]
+    ) -> dict[str, Number]:
+        ret: dict[str, Number] = {}
+        for db, db_addresses in self._group_by_db(addresses).items():
+            documents = db.search(cond=tinydb.Query().address.one_of(db_addresses))
+            ret.update(self._get_balances_from_documents(documents, db_addresses))
+        return ret
+
     def balance(self, account: "Account"):
-        doc_id = self.query_for_single_account_document_id(account)
-        document = self._db.get(doc_id=doc_id)
-        balance = AccountInfo.parse_obj(document).balance
+        """Committed balance, plus the pending changes of the unit of work open in this context."""
+        balance = self._get_committed_balances([account._address])[account._address]
+        unit = _units.get().get(self)
+        if unit is not None:
+            balance += unit.balance_deltas.get(account._address, 0)
         return balance
 
-    def get_contract_db_and_lock_filepaths(self, contract: "SmartContract"):
+    @contextmanager
+    def unit_of_work(self):
+        """
+        Collect balance changes and contract data writes until the block ends, then commit them together.
+        Nested blocks join the outermost one. If the block raises, nothing is written and
+        the contracts touched reload their data.
+        """
+        unit = _units.get().get(self)
+        if unit is not None:
+            yield unit
+            return
+        unit = UnitOfWork()
+        token = _set_engaged(_units, self, unit)
+        try:
+            yield unit
+        except BaseException:
+            _units.reset(token)
+            for it in unit.contracts:
+                it._reload_data()
+            raise
+        _units.reset(token)
+        try:
+            with instrumentation.span(
+                "vm.commit",
+                transfers=len(unit.transfers),
+                contracts=len(unit.contracts),
+            ):
+                self._commit(unit)
+        except BaseException:
+            for it in unit.contracts:
+                it._reload_data()
+            raise
+
+    def _commit(self, unit: "UnitOfWork"):
+        """
+        Write the changes of a unit of work: one balance update and one write per changed contract.
+
+        When more than one file changes, a journal identified by a commit id records the balance
+        changes and the new contract data first. Stores mark the commits they applied along with
+        the balances, in the same write, and contract data is only written over the version the
+        commit was prepared against, so replaying a journal any number of times changes nothing
+        more. The single store of `VM` records the journal itself, which saves writing it apart:
+        a payable call costs one store write plus one contract write.
+
+        With several stores this is a two-phase commit: every store involved is locked and its
+        balances validated (prepare), then the journal records the decision and the stores are updated.
+        A commit which dies before its journal is written leaves no trace. One which dies after
+        is finished by the next commit locking its stores, or by `recover`.
+        """
+        balance_deltas = {k: v for k, v in unit.balance_deltas.items() if v != 0}
+        contract_data = {}
+        for it in unit.contracts:
+            data = it.serialize()
+            if get_data_hash(data) != it._serialized_data_history_hash:
+                contract_data[it._address] = (it, data)
+        if balance_deltas == {} and contract_data == {}:
+            return
+        if self._readonly:
+            raise ReadOnlyException("Cannot commit changes in a read-only VM")
+        if balance_deltas == {} and len(contract_data) == 1:
+            for contract, data in contract_data.values():
+                self.persist_contract_data(contract, data)
+            return
+        addresses = list(balance_deltas.keys())
+        with self._transaction(addresses) as dbs:
+            balances: dict[str, Number] = {}
+            for atomic_db, db_addresses in self._group_by_db(addresses).items():
+                documents = dbs[atomic_db].search(
+                    tinydb.Query().address.one_of(db_addresses)
+                )
+                balances.update(
+                    self._get_balances_from_documents(documents, db_addresses)
+                )
+            for address, delta in balance_deltas.items():
+                assert balances[address] + delta >= 0, "Balance must be non-negative"
+            with self._contract_locks(list(contract_data.keys())):
+                journal = dict(
+                    id=uuid.uuid4().hex,
+                    balances=balance_deltas,
+                    contracts={
+                        k: dict(
+                            version=self._get_journal_version(k),
+                            data=data,
+                        )
+                        for k, (_, data) in contract_data.items()
+                    },
+                )
+                self._write_journal(journal)
+                self._apply_journal(dbs, journal)
+                if self._oplog is not None:
+                    for sender, receiver, amount in unit.transfers:
+                        self._oplog.transfer(sender, receiver, amount)
+                    for address, (_, data) in contract_data.items():
+                        self._oplog.contract_data(address, data)
+                    self._oplog.flush()
+                versions = {
+                    address: file_version(str(self._get_contract_filepaths(address)[0]))
+                    for address in contract_data.keys()
+                }
+                self._remove_journal(journal)
+        for address, (contract, data) in contract_data.items():
+            contract._mark_persisted(data, versions[address])
 
-        address = contract._address
+    @contextmanager
+    def _contract_locks(self, addresses: list[str]):
+        # always locked in the same order, so concurrent commits cannot deadlock
+        with contextlib.ExitStack() as stack:
+            for address in sorted(addresses):
+                _, lock_filepath = self._get_contract_filepaths(address)
+                stack.enter_context(
+                    instrumentation.timed_lock(filelock.FileLock(lock_filepath))
+                )
+            yield
+
+    def _apply_journal(
+        self, dbs: dict[AtomicTinyDB, tinydb.TinyDB], journal: dict
+    ):
+        """Apply a journal to the stores it involves among `dbs`, then to its contracts."""
+        for atomic_db in self._get_transaction_dbs(list(journal["balances"].keys())):
+            if atomic_db in dbs:
+                self._apply_to_store(atomic_db, dbs[atomic_db], journal)
+        self._apply_contracts(journal)
+
+    def _apply_to_store(
+        self, atomic_db: AtomicTinyDB, db: tinydb.TinyDB, journal: dict
+    ):
+        """Add the balance changes of `journal` held by a store and record the commit, in a single write."""
+        data = db.storage.read() or {}
+        records = list(data.get(COMMITS_TABLE, {}).values())
+        if any(it["id"] == journal["id"] for it in records):
+            return
+        for document in data.get(db.default_table_name, {}).values():
+            address = document["address"]
+            if address in journal["balances"] and self._get_db(address) is atomic_db:
+                document["balance"] += journal["balances"][address]
+        records = [it for it in records if self._is_commit_pending(it)]
+        records.append(self._get_commit_record(journal))
+        data[COMMITS_TABLE] = {str(index + 1): it for index, it in enumerate(records)}
+        db.storage.write(data)
+        db.clear_cache()
+
+    def _apply_contracts(self, journal: dict):
+        """Write the contract data of `journal`, with the contract locks held."""
+        for address, it in journal["contracts"].items():
+            # any other version was written by this commit already, or by a later one
+            if self._get_journal_version(address) == it["version"]:
+                contract_db_filepath, _ = self._get_contract_filepaths(address)
+                atomic_write(str(contract_db_filepath), it["data"])
+
+    def _get_journal_version(self, address: str) -> Optional[list[int]]:
+        """Version of the contract data at `address` as journals record it, in JSON."""
+        version = file_version(str(self._get_contract_filepaths(address)[0]))
+        return None if version is None else list(version)
+
+    def recover(self):
+        """Finish commits interrupted by a crash, if any. Called when a writable VM is created."""
+        with self._transaction([]):
+            pass
+
+    def _get_contract_filepaths(self, address: str):
         contract_db_filepath = self._contract_data_db_dir / f"{address}.json"
         contract_lock_filepath = self._contract_data_lock_dir / f".{address}.lock"
         return contract_db_filepath, contract_lock_filepath
 
-    def load_contract_data(self, contract: "SmartContract"):
+    def get_contract_db_and_lock_filepaths(self, contract: "SmartContract"):
+        return self._get_contract_filepaths(contract._address)
+
+    def get_cached_contract(self, address: str) -> Optional["SmartContract"]:
+        """Contract loaded at `address`, with data published by other writers since reloaded."""
+        with self._contracts_lock:
+            contract = self._contracts.get(address)
+            if contract is not None:
+                self._contracts.move_to_end(address)
+        if contract is not None:
+            contract._refresh_data()
+        return contract
+
+    def cache_contract(self, contract: "SmartContract"):
+        with self._contracts_lock:
+            address = contract._address
+            self._contracts[address] = contract
+            self._contracts.move_to_end(address)
+            self._set_cached_contract_size(address, contract._serialized_data_size)
+            self._evict_contracts()
+
+    def _set_cached_contract_size(self, address: str, size: int):
+        with self._contracts_lock:
+            if address in self._contracts:
+                self._contracts_size += size - self._contract_sizes.get(address, 0)
+                self._contract_sizes[address] = size
+
+    def _evict_contracts(self):
+        unit = _units.get().get(self)
+        # contracts changed by the ongoing unit of work stay, so they are committed as loaded
+        pinned = {} if unit is None else unit.contracts
+        # the most recently used contract always stays
+        for address in list(self._contracts.keys())[:-1]:
+            if (
+                len(self._contracts) <= self._max_cached_contracts
+                and self._contracts_size <= self._contract_cache_budget
+            ):
+                break
+            contract = self._contracts[address]
+            if contract in pinned:
+                continue
+            if not self._readonly:
+                contract.store()
+            del self._contracts[address]
+            self._contracts_size -= self._contract_sizes.pop(address, 0)
+
+    def flush_contracts(self):
+        """Store loaded contracts, including changes `store` is not told about, like to nested values."""
+        with self._contracts_lock:
+            contracts = list(self._contracts.values())
+        for it in contracts:
+            it.store()
+
+    def get_contract_data_version(self, contract: "SmartContract"):
+        contract_db_filepath, _ = self.get_contract_db_and_lock_filepaths(contract)
+        return file_version(str(contract_db_filepath))
+
+    def load_versioned_contract_data(
+        self, contract: "SmartContract"
+    ) -> Optional[tuple[dict, FileVersion]]:
+        """Data of smart contract along with the version of the file it was read from"""
 
         contract_db_filepath, contract_lock_filepath = (
             self.get_contract_db_and_lock_filepaths(contract)
         )
-        if os.path.exists(contract_db_filepath):
-            with filelock.FileLock(contract_lock_filepath):
-                with open(contract_db_filepath, "r") as f:
+        if not os.path.exists(contract_db_filepath):
+            return None
+        with instrumentation.span(
+            "vm.load_contract_data", address=contract._address
+        ) as span:
+            if self._readonly:
+                # contract data is published by atomic rename, no lock needed to read it
+                content, version = read_versioned(str(contract_db_filepath))
+            else:
+                with instrumentation.timed_lock(
+                    filelock.FileLock(contract_lock_filepath), span
+                ):
                     # loaded_contract = typing.cast(SmartContract, dill.loads(f.read()))
-                    data = typing.cast(dict, json.loads(f.read()))
-                    return data
+                    content, version = read_versioned(str(contract_db_filepath))
+            span.add("bytes_read", len(content))
+            return typing.cast(dict, json.loads(content)), version
 
-    def persist_contract_data(self, contract: "SmartContract"):
-        """Update data of smart contract"""
+    def load_contract_data(self, contract: "SmartContract"):
+        loaded = self.load_versioned_contract_data(contract)
+        if loaded is not None:
+            return loaded[0]
+
+    def persist_contract_data(
+        self, contract: "SmartContract", data: Optional[str] = None
+    ):
+        """Update data of smart contract, with `data` serialized already if given"""
+
+        if self._readonly:
+            raise ReadOnlyException("Cannot persist contract data in a read-only VM")
 
         contract_db_filepath, contract_lock_filepath = (
             self.get_contract_db_and_lock_filepaths(contract)
         )
 
-        with filelock.FileLock(contract_lock_filepath):
-            data = contract.serialize()
-            # you may need filelock.
-            with open(contract_db_filepath, "w+") as f:
-                f.write(data)
+        with instrumentation.span(
+            "vm.persist_contract_data", address=contract._address
+        ) as span:
+            with instrumentation.timed_lock(
+                filelock.FileLock(contract_lock_filepath), span
+            ):
+                if data is None:
+                    data = contract.serialize()
+                atomic_write(str(contract_db_filepath), data)
+                version = file_version(str(contract_db_filepath))
+                if self._oplog is not None:
+                    self._oplog.contract_data(contract._address, data)
+                    self._oplog.flush()
+            span.add("bytes_written", len(data))
+        # not under the file lock, which evicting contracts takes while holding the cache lock
+        contract._mark_persisted(data, version)
 
     def create_account(self, init_balance: Number = 0):
         assert init_balance >= 0, "Initial balance must be non-negative"
         account_static_info = generate_account_static_info()
+        return self._insert_account(account_static_info, init_balance)
+
+    def _insert_account(
+        self, account_static_info: AccountStaticInfo, init_balance: Number
+    ):
         # private key
-        self._db.insert(
+        self._get_db(account_static_info.address).insert(
             AccountInfo(**account_static_info.dict(), balance=init_balance).dict()
         )
+        if self._oplog is not None:
+            self._oplog.create_account(
+                account_static_info.address, account_static_info.key, init_balance
+            )
+            self._oplog.flush()
 
         return Account(account_static_info.address, account_static_info.key, vm=self)
 
-    def _engage(self):
-        global _default_vm
-        if _default_vm is None:
-            _default_vm = self
+    def _log_stored_state(self):
+        oplog = typing.cast(OperationLog, self._oplog)
+        for db in self._get_all_dbs():
+            for document in db.search(tinydb.Query().noop()):
+                account_info = AccountInfo.parse_obj(document)
+                oplog.create_account(
+                    account_info.address, account_info.key, account_info.balance
+                )
+        for contract_data_db_dir in self._get_contract_data_db_dirs():
+            for path in sorted(contract_data_db_dir.glob("*.json")):
+                oplog.contract_data(path.stem, path.read_text())
+        oplog.flush()
+
+    @staticmethod
+    def replay(log_path: str, until: Optional[int] = None) -> ReplayState:
+        """
+        Rebuild in memory the state recorded in an operation log, after its first `until` operations
+        if given. Use `ReplayState.persist` to open that state as a `VM`.
+        """
+        return replay(log_path, until)
+
+    def close(self):
+        """Close the operation log, if any."""
+        if self._oplog is not None:
+            self._oplog.close()
+            self._oplog = None
+
+    def _engage(self) -> contextvars.Token:
+        if _engaged_vm.get() is None:
+            return _engaged_vm.set(self)
         else:
             raise EngageException("VM already engaged")
 
-    def _disengage(self):
-        global _default_vm
-        _default_vm = None
+    def _disengage(self, token: contextvars.Token):
+        _engaged_vm.reset(token)
 
     @contextmanager
     def engage(self):
+        """Engage this VM in the current thread or asyncio task, which may each engage their own."""
+        token = self._engage()
         try:
-            self._engage()
             yield self
         finally:
-            self._disengage()
+            self._disengage(token)
 
 
 # contract1 = vm.Contract() # create a new contract, no owner specified
@@ -238,7 +753,7 @@ def payable(
     return payable_func
 
 
-@beartype.beartype
+@type_checked
 class Account:
     def __init__(
         self, address: str, key: Optional[str] = None, vm: Optional[VM] = None
@@ -249,7 +764,6 @@ class Account:
             if not check_key_validity(address, key):
                 raise Exception("Key invalid. Cannot create account.")
         self._key = key
-        self._default_receipent = None
 
     def unlock(self, key: str):
         if self._key is not None:
@@ -259,6 +773,10 @@ class Account:
         else:
             raise Exception("Key invalid. Cannot unlock account.")
 
+    @property
+    def _default_receipent(self) -> Optional["Account"]:
+        return _engaged_recipients.get().get(self)
+
     def pay(self, amount: Number, recepient: Optional[Self] = None):
         if self._key is None:
             raise Exception("Account is not unlocked.")
@@ -273,22 +791,22 @@ class Account:
     def balance(self):
         return self._vm.balance(self)
 
-    def _engage(self, recepient: Self):
+    def _engage(self, recepient: Self) -> contextvars.Token:
         if self._default_receipent is not None:
             raise EngageException("Account already engaged")
         else:
-            self._default_receipent = recepient
+            return _set_engaged(_engaged_recipients, self, recepient)
 
-    def _disengage(self):
-        self._default_receipent = None
+    def _disengage(self, token: contextvars.Token):
+        _engaged_recipients.reset(token)
 
     @contextmanager
     def engage(self, recepient: Self):
+        token = self._engage(recepient)
         try:
-            self._engage(recepient)
             yield self
         finally:
-            self._disengage()
+            self._disengage(token)
 
 
 class PersistantDataDict(dict):
@@ -373,8 +891,10 @@ class SmartContract:  # anything done to a smart contract shall be stored.
         self._issuer = issuer
         self._vm = vm
         self._address = account._address
-        self._transfer_amount = 0
         self._serialized_data_history_hash = ""
+        self._serialized_data_size = 0
+        self._data_version: Optional[FileVersion] = None
+        """Version of the contract data file last read or written by this object."""
 
         self.load_data_and_register_issuer()
 
@@ -386,14 +906,22 @@ class SmartContract:  # anything done to a smart contract shall be stored.
 
         # if contract not found at address, then create new one.
         # self._account = Account(vm, issuer)
-        self._caller_account = None
         self.store()
+        self._vm.cache_contract(self)
 
     @classmethod
     def load(
         cls, address: str, issuer: Optional[Account] = None, vm: Optional[VM] = None
     ):
+        """Contract at `address`. If the VM has it loaded already, that same object is returned."""
         vm = get_vm_with_fallback(vm)
+        cached = vm.get_cached_contract(address)
+        if cached is not None:
+            if not isinstance(cached, cls):
+                raise Exception(
+                    f"Contract at '{address}' is already loaded as {type(cached).__name__}"
+                )
+            return cached
         account = Account(address, vm=vm)
         ret = cls(account=account, issuer=issuer, vm=vm)
         return ret
@@ -405,9 +933,12 @@ class SmartContract:  # anything done to a smart contract shall be stored.
         return cls(account=account, issuer=issuer, vm=vm)
 
     def load_data_and_register_issuer(self):
-        data = self._vm.load_contract_data(self)
-        if data is not None:
+        loaded = self._vm.load_versioned_contract_data(self)
+        if loaded is not None:
+            data, version = loaded
             self._data = PersistantDataDict(self, data)
+            # already persisted as is
+            self._mark_persisted(self.serialize(), version)
         else:
             self._data = PersistantDataDict(self, {})
             if self._issuer is not None:
@@ -424,37 +955,61 @@ class SmartContract:  # anything done to a smart contract shall be stored.
     def data(self):
         return self._data
 
-    def _engage(self, account: Account):
+    @property
+    def _caller_account(self) -> Optional[Account]:
+        """Account calling this contract in the current thread or asyncio task."""
+        return _engaged_callers.get().get(self)
+
+    @property
+    def _transfer_amount(self) -> Number:
+        """Amount received from the caller in the ongoing call."""
+        return _transfer_amounts.get().get(self, 0)
+
+    @_transfer_amount.setter
+    def _transfer_amount(self, amount: Number):
+        # contracts without an amount are left out, so the mapping does not keep them alive
+        amounts = {k: v for k, v in _transfer_amounts.get().items() if k is not self}
+        if amount != 0:
+            amounts[self] = amount
+        _transfer_amounts.set(amounts)
+
+    def _engage(self, account: Account) -> contextvars.Token:
         if self._caller_account is not None:
             raise EngageException("Contract already engaged")
         else:
-            self._caller_account = account
+            return _set_engaged(_engaged_callers, self, account)
 
-    def _disengage(self):
-        self._caller_account = None
-        self.persist_contract_data()
+    def _disengage(self, token: contextvars.Token):
+        _engaged_callers.reset(token)
+        self.store()
 
     @contextmanager
     def engage(self, account: Account):
-        try:
-            self._engage(account)
-            yield self
-        finally:
-            self._disengage()
+        """Call this contract as `account`. Balance and data changes are committed once, when the call ends."""
+        with self._vm.unit_of_work():
+            token = self._engage(account)
+            try:
+                yield self
+            finally:
+                self._disengage(token)
 
     def serialize(self):
         # return dill.dumps(self)
         return json.dumps(self.data, ensure_ascii=False)
 
-    def persist_contract_data(self):
+    def persist_contract_data(self, data: Optional[str] = None):
         # submit to vm
-        self._vm.persist_contract_data(self)
+        self._vm.persist_contract_data(self, data)
+
+    def _mark_persisted(self, serialized_data: str, version: Optional[FileVersion]):
+        self._serialized_data_history_hash = get_data_hash(serialized_data)
+        self._serialized_data_size = len(serialized_data)
+        self._data_version = version
+        self._vm._set_cached_contract_size(self._address, self._serialized_data_size)
 
     @property
     def _data_hash(self):
-        serialized_data = self.serialize()
-        serialized_data_hash = hashlib.sha256(serialized_data.encode()).hexdigest()
-        return serialized_data_hash
+        return get_data_hash(self.serialize())
 
     def pay_from_caller(self, amount: Number, caller: Optional[Account] = None):
         caller = self.resolve_caller(caller)
@@ -475,14 +1030,65 @@ class SmartContract:  # anything done to a smart contract shall be stored.
 
     @contextmanager
     def receive(self, amount: Number, account: Optional[Account] = None):
-        try:
-            self.pay_from_caller(amount, account)
-            yield self
-        finally:
-            self._transfer_amount = 0
+        with self._vm.unit_of_work():
+            # restores the amounts from before this call, including the one of an enclosing call
+            token = _transfer_amounts.set(_transfer_amounts.get())
+            try:
+                self.pay_from_caller(amount, account)
+                yield self
+            finally:
+                _transfer_amounts.reset(token)
+
+    def _reload_data(self):
+        """Drop changes not committed, after a unit of work failed or another writer published new data."""
+        loaded = self._vm.load_versioned_contract_data(self)
+        if loaded is not None:
+            data, version = loaded
+            self._data = PersistantDataDict(self, data)
+            self._mark_persisted(self.serialize(), version)
+
+    def _refresh_data(self):
+        if self._vm.get_contract_data_version(self) != self._data_version:
+            unit = _units.get().get(self._vm)
+            if unit is None or self not in unit.contracts:
+                self._reload_data()
 
     def store(self):
-        serialized_data_hash = self._data_hash
-        if serialized_data_hash != self._serialized_data_history_hash:
-            self.persist_contract_data()
-            self._serialized_data_history_hash = serialized_data_hash
+        unit = _units.get().get(self._vm)
+        if unit is not None:
+            # written at most once, when the unit of work commits
+            unit.add_contract(self)
+            return
+        serialized_data = self.serialize()
+        if get_data_hash(serialized_data) != self._serialized_data_history_hash:
+            self.persist_contract_data(serialized_data)
+
+
+class AsyncVM(AsyncExecutorFacade):
+    """
+    Asyncio facade of `VM`, which never blocks the event loop.
+
+    Account creation and balance updates are queued and applied in order by a single writer.
+    Balance reads run concurrently on read-only `VM` instances without taking the database lock.
+    """
+
+    def __init__(self, db_path: str, contract_data_dir: str, max_readers: int = 4):
+        self.vm = VM(db_path, contract_data_dir)
+        """The underlying blocking VM, for use with `SmartContract` in worker threads."""
+        super().__init__(
+            self.vm,
+            functools.partial(VM, db_path, contract_data_dir, readonly=True),
+            max_readers=max_readers,
+        )
+
+    async def create_account(self, init_balance: Number = 0) -> Account:
+        return await self._write("create_account", init_balance)
+
+    async def set_balance(self, account: Account, balance: Number):
+        return await self._write("set_balance", account, balance)
+
+    async def transfer(self, sender: Account, receiver: Account, amount: Number):
+        return await self._write("transfer", sender, receiver, amount)
+
+    async def balance(self, account: Account) -> Number:
+        return await self._read("balance", account)
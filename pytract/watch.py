@@ -0,0 +1,293 @@
+"""
+Watch the build artifacts of a brownie project and regenerate its API code when they change.
+
+The project stays loaded for the lifetime of the watcher. Changed artifacts are loaded into
+it one by one, and only the contracts whose ABI changed are rendered again.
+File events come from `watchdog` (inotify on Linux) when installed, otherwise the build
+directories are polled.
+"""
+
+import json
+import os
+import pathlib
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set
+
+from brownie.network.contract import ContractContainer
+
+try:
+    # normalizes offsets into tuples, as brownie does when loading a project
+    from brownie.project.main import (
+        _load_contract_build_json_from_disk,
+        _load_interface_build_json_from_disk,
+    )
+except ImportError:
+    _load_contract_build_json_from_disk = _load_interface_build_json_from_disk = None
+
+from .abi2api import (
+    ProjectInfo,
+    get_contract_info,
+    load_project_and_get_project_info,
+)
+from .codegen import ApiCodeGenerator
+from .utils import FileVersion, file_version
+
+BUILD_CONTRACTS_RELATIVE_DIR = os.path.join("build", "contracts")
+BUILD_INTERFACES_RELATIVE_DIR = os.path.join("build", "interfaces")
+
+DEFAULT_DEBOUNCE = 0.3
+"""Seconds without further changes before regenerating."""
+
+DEFAULT_POLL_INTERVAL = 1.0
+"""Seconds between scans of the build directories when not woken up by file events."""
+
+
+def load_build_json(path: str, is_interface: bool) -> dict:
+    """Build artifact at `path`, or an empty dict if it cannot be parsed, like while it is being written."""
+    loader = (
+        _load_interface_build_json_from_disk
+        if is_interface
+        else _load_contract_build_json_from_disk
+    )
+    try:
+        if loader is not None:
+            return loader(pathlib.Path(path))
+        with open(path, "r") as f:
+            return json.load(f)
+    except ValueError:
+        return {}
+
+
+class BrownieProjectAdapter:
+    """
+    The private parts of brownie used to update a loaded project in place, all checked up front,
+    so an incompatible brownie version fails clearly instead of halfway through an update.
+    """
+
+    REQUIRED_ATTRIBUTES = (
+        "_build._add_contract",
+        "_build._remove_contract",
+        "_build._add_interface",
+        "_build._remove_interface",
+        "_containers.pop",
+        "interface._add",
+    )
+
+    def __init__(self, project):
+        missing = []
+        for it in self.REQUIRED_ATTRIBUTES:
+            value = project
+            for name in it.split("."):
+                value = getattr(value, name, None)
+            if not callable(value):
+                missing.append(it)
+        if missing != []:
+            raise Exception(
+                f"Incompatible brownie version {get_brownie_version()}: loaded projects lack {', '.join(missing)}, needed to watch build artifacts"
+            )
+        self.project = project
+
+    def add_contract(
+        self, name: str, build_json: dict
+    ) -> Optional[ContractContainer]:
+        """Add or replace a contract artifact. Returns its container, or None if it cannot be deployed."""
+        self.project._build._add_contract(build_json)
+        if not build_json.get("bytecode"):
+            return None
+        container = ContractContainer(self.project, build_json)
+        self.project._containers[name] = container
+        setattr(self.project, name, container)
+        return container
+
+    def remove_contract(self, name: str):
+        self.project._build._remove_contract(name)
+        self.project._containers.pop(name, None)
+
+    def add_interface(self, name: str, build_json: dict):
+        self.project._build._add_interface(build_json)
+        self.project.interface._add(name, build_json["abi"])
+
+    def remove_interface(self, name: str):
+        self.project._build._remove_interface(name)
+        self.project.interface.__dict__.pop(name, None)
+
+
+def get_brownie_version() -> str:
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        return version("eth-brownie")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+class BuildWatcher:
+    def __init__(
+        self,
+        project_path: str,
+        debounce: float = DEFAULT_DEBOUNCE,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        use_file_events: bool = True,
+    ):
+        self.project_path = project_path
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.contracts_dir = os.path.join(project_path, BUILD_CONTRACTS_RELATIVE_DIR)
+        self.interfaces_dir = os.path.join(project_path, BUILD_INTERFACES_RELATIVE_DIR)
+
+        self.project_info: ProjectInfo = load_project_and_get_project_info(
+            project_path
+        )
+        self.brownie = BrownieProjectAdapter(self.project_info.project)
+        self.generator = ApiCodeGenerator()
+        self.generator.write_project(project_path, self.project_info)
+
+        self._versions: Dict[str, FileVersion] = self.scan()
+        """Versions of the artifacts reflected in the generated code, or found unparsable."""
+        self.unparsable_paths: Set[str] = set()
+        """Artifacts that could not be parsed, skipped until they change again."""
+        self._wakeup = threading.Event()
+        self._observer = self._start_observer() if use_file_events else None
+
+    def _start_observer(self):
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return None
+
+        wakeup = self._wakeup
+
+        class WakeupHandler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                wakeup.set()
+
+        observer = Observer()
+        for it in [self.contracts_dir, self.interfaces_dir]:
+            if os.path.isdir(it):
+                observer.schedule(WakeupHandler(), it, recursive=False)
+        observer.daemon = True
+        observer.start()
+        return observer
+
+    @property
+    def uses_file_events(self) -> bool:
+        return self._observer is not None
+
+    def scan(self) -> Dict[str, FileVersion]:
+        """Versions of all build artifacts, by path."""
+        ret = {}
+        for directory in [self.contracts_dir, self.interfaces_dir]:
+            if not os.path.isdir(directory):
+                continue
+            for entry in os.scandir(directory):
+                if entry.name.endswith(".json"):
+                    version = file_version(entry.path)
+                    if version is not None:
+                        ret[entry.path] = version
+        return ret
+
+    def get_changed_paths(self) -> List[str]:
+        """Artifacts added, modified or removed since they were last applied."""
+        versions = self.scan()
+        return sorted(
+            path
+            for path in set(versions) | set(self._versions)
+            if versions.get(path) != self._versions.get(path)
+        )
+
+    def wait_for_changes(self, timeout: Optional[float] = None) -> List[str]:
+        """
+        Block until artifacts change and then stay unchanged for `debounce` seconds,
+        so a whole `brownie compile` is picked up at once. Returns an empty list on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        changed_paths = self.get_changed_paths()
+        while changed_paths == []:
+            wait_time = self.poll_interval
+            if deadline is not None:
+                wait_time = min(wait_time, deadline - time.monotonic())
+                if wait_time <= 0:
+                    return []
+            self._wakeup.wait(wait_time)
+            self._wakeup.clear()
+            changed_paths = self.get_changed_paths()
+        while True:
+            time.sleep(self.debounce)
+            latest_changed_paths = self.get_changed_paths()
+            if latest_changed_paths == changed_paths and not self._wakeup.is_set():
+                return changed_paths
+            self._wakeup.clear()
+            changed_paths = latest_changed_paths
+
+    def apply_changes(self, changed_paths: List[str]) -> List[str]:
+        """
+        Load changed artifacts into the project and regenerate the API code if any contract changed.
+        Returns the names of contracts added, changed or removed.
+
+        Artifacts which cannot be parsed are reported and skipped until they change again,
+        like ones still being written when the debounce ran out.
+        """
+        contracts_info = self.project_info.contracts_info
+        removed_contracts = []
+        for path in changed_paths:
+            name = os.path.splitext(os.path.basename(path))[0]
+            version = file_version(path)
+            is_interface = os.path.dirname(path) == self.interfaces_dir
+            self.unparsable_paths.discard(path)
+            if version is None:
+                self._versions.pop(path, None)
+                if is_interface:
+                    self.brownie.remove_interface(name)
+                elif name in contracts_info:
+                    self.brownie.remove_contract(name)
+                    del contracts_info[name]
+                    removed_contracts.append(name)
+                continue
+            build_json = load_build_json(path, is_interface)
+            self._versions[path] = version
+            if build_json == {}:
+                print(
+                    f"Warning: cannot parse build artifact '{path}', skipped until it changes"
+                )
+                self.unparsable_paths.add(path)
+                continue
+            if is_interface:
+                self.brownie.add_interface(name, build_json)
+                continue
+            container = self.brownie.add_contract(name, build_json)
+            if container is not None:
+                contracts_info[name] = get_contract_info(container)
+
+        changed_contracts = self.generator.get_changed_contracts(contracts_info)
+        if changed_contracts != [] or removed_contracts != []:
+            self.project_info._selector_index = None
+            self.generator.write_project(self.project_path, self.project_info)
+        return changed_contracts + removed_contracts
+
+    def run(
+        self,
+        on_regenerate: Optional[Callable[[List[str]], None]] = None,
+        stop_event: Optional[threading.Event] = None,
+    ):
+        """Regenerate the API code on every change, until `stop_event` is set."""
+        while stop_event is None or not stop_event.is_set():
+            changed_paths = self.wait_for_changes(timeout=self.poll_interval)
+            if changed_paths == []:
+                continue
+            changed_contracts = self.apply_changes(changed_paths)
+            if changed_contracts != [] and on_regenerate is not None:
+                on_regenerate(changed_contracts)
+
+    def close(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
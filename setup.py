@@ -24,9 +24,11 @@ PACKAGE_REQUIRES = open("requirements.txt").read().splitlines()
 
 # extra dependencies
 SIMULAR_REQUIRES = open("requirements_simular.txt").read().splitlines()
+COLUMNAR_REQUIRES = open("requirements_columnar.txt").read().splitlines()
+WATCH_REQUIRES = open("requirements_watch.txt").read().splitlines()
 
 # full dependencies
-ALL_REQUIRES = merge_requirements([PACKAGE_REQUIRES, SIMULAR_REQUIRES])
+ALL_REQUIRES = merge_requirements([PACKAGE_REQUIRES, SIMULAR_REQUIRES, COLUMNAR_REQUIRES, WATCH_REQUIRES])
 
 setup(
     name=PKG_NAME,
@@ -45,5 +47,10 @@ setup(
             "pytract = pytract.__main__:main",
         ],
     },
-    extras_require={"simular": SIMULAR_REQUIRES, "all": ALL_REQUIRES},
+    extras_require={
+        "simular": SIMULAR_REQUIRES,
+        "columnar": COLUMNAR_REQUIRES,
+        "watch": WATCH_REQUIRES,
+        "all": ALL_REQUIRES,
+    },
 )
@@ -0,0 +1,120 @@
+# `pytract process --abi-dir` test: the API package is generated from plain ABI files and used without brownie
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ABI_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pool_abi_example"
+)
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+FAUCET_ARTIFACT = os.path.join(
+    REPO_DIR, "test", "brownie_project", "build", "contracts", "Faucet.json"
+)
+
+PACKAGE_FILES = [
+    "__init__.py",
+    "_abis.json",
+    "_contracts.py",
+    "_project.py",
+    "_selectors.json",
+    "contracts.py",
+]
+
+GENERATE_CODE = """
+import sys
+from pytract.__main__ import main
+
+sys.argv = ["pytract", "process"] + sys.argv[1:]
+main()
+assert "brownie" not in sys.modules, "brownie was imported"
+assert "web3" not in sys.modules, "web3 was imported"
+"""
+
+
+USE_CODE = """
+import os
+import sys
+
+sys.modules["brownie"] = None  # importing brownie fails from here on
+from pool_abis.api import contracts, project_info
+from pytract import abi2api
+from pytract.evm import AtomicEVM
+
+assert contracts.Pool._contract_name == "Pool"
+assert "Pool" in project_info.contracts_info
+deployer = "0x" + "d0" * 20
+evm = AtomicEVM(os.path.join(sys.argv[1], "evm.json"))
+evm.create_account(deployer, 10**18)
+txparams = abi2api.TransactionParameters(issuer=deployer)
+with abi2api.EVMBackend(evm).engage():
+    # the build artifact has a bytecode to deploy
+    faucet = contracts.Faucet.deploy(txparams)
+    assert list(faucet.function.returnVars()) == [1, 2, 3]
+    try:
+        contracts.Pool.deploy(txparams)
+        raise AssertionError("a contract without bytecode was deployed")
+    except Exception as e:
+        assert "known only by its ABI" in str(e), e
+try:
+    contracts.Faucet.deploy(txparams)
+    raise AssertionError("deployed without brownie or an EVM backend")
+except Exception as e:
+    assert "EVMBackend" in str(e), e
+"""
+
+
+def generate(*args: str):
+    subprocess.run(
+        [sys.executable, "-c", GENERATE_CODE, *args],
+        check=True,
+        cwd=REPO_DIR,
+        env=dict(os.environ, PYTHONPATH=REPO_DIR),
+    )
+
+
+def check_package(package_path: str):
+    assert sorted(os.listdir(package_path)) == PACKAGE_FILES, os.listdir(package_path)
+    with open(os.path.join(package_path, "_contracts.py"), "r") as f:
+        assert "class Pool(abi2api.ContractInstance):" in f.read()
+
+
+def main():
+    workdir = tempfile.mkdtemp()
+    try:
+        # explicit output path
+        output_path = os.path.join(workdir, "pool_api")
+        generate("--abi-dir", ABI_DIR, "--output", output_path)
+        check_package(output_path)
+
+        # regenerating keeps permissions and leaves no temporary files behind
+        contracts_path = os.path.join(output_path, "_contracts.py")
+        os.chmod(contracts_path, 0o600)
+        generate("--abi-dir", ABI_DIR, "--output", output_path)
+        check_package(output_path)
+        assert os.stat(contracts_path).st_mode & 0o777 == 0o600
+
+        # by default the package is written next to the ABIs, which become a package too
+        abi_dir = os.path.join(workdir, "pool_abis")
+        shutil.copytree(ABI_DIR, abi_dir)
+        generate("--abi-dir", abi_dir)
+        check_package(os.path.join(abi_dir, "api"))
+        assert sorted(os.listdir(abi_dir)) == ["Pool.json", "__init__.py", "api"]
+
+        # the generated package is importable and deploys contracts with a bytecode, without brownie
+        shutil.copy(FAUCET_ARTIFACT, abi_dir)
+        generate("--abi-dir", abi_dir)
+        subprocess.run(
+            [sys.executable, "-c", USE_CODE, workdir],
+            check=True,
+            cwd=workdir,
+            env=dict(os.environ, PYTHONPATH=os.pathsep.join([REPO_DIR, workdir])),
+        )
+    finally:
+        shutil.rmtree(workdir)
+    print("API packages generated from ABI files")
+
+
+if __name__ == "__main__":
+    main()
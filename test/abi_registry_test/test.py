@@ -0,0 +1,84 @@
+# ABI registry test: identical ABIs are parsed once, lookups by name, address and parsed object, and concurrent use
+import json
+import os
+import threading
+
+from pytract.evm import AbiRegistry
+
+PROJECT_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "brownie_project"
+)
+THREAD_COUNT = 4
+REGISTRATIONS_PER_THREAD = 200
+
+
+def get_event_abi(index: int) -> list:
+    return [
+        {
+            "anonymous": False,
+            "inputs": [],
+            "name": f"Event{index}",
+            "type": "event",
+        }
+    ]
+
+
+def main():
+    registry = AbiRegistry()
+    names = registry.load_brownie_project(PROJECT_DIR)
+    assert names == ["Faucet", "MyInterface"]
+
+    with open(os.path.join(PROJECT_DIR, "build", "contracts", "Faucet.json")) as f:
+        build_info = json.loads(f.read())
+    bytecode = bytes.fromhex(build_info["bytecode"].removeprefix("0x"))
+
+    # the same ABI and bytecode, even with keys in another order, is parsed only once
+    reordered_abi = [dict(reversed(list(it.items()))) for it in build_info["abi"]]
+    parsed = registry.register(reordered_abi, bytecode, name="FaucetCopy")
+    assert parsed is registry.get("Faucet") is registry.get("FaucetCopy")
+    assert len(registry._abi_by_hash) == 2
+    # without bytecode it is a different entry
+    assert registry.register(build_info["abi"]) is not parsed
+
+    # addresses are bound by name or by parsed object, in any checksum case
+    address = "0x5FbDB2315678afecb367f032d93F642f64180aa3"
+    registry.register_address(address, "Faucet")
+    assert registry.get(address.lower()) is parsed
+    other_address = "0x" + "ab" * 20
+    registry.register_address(other_address, parsed)
+    assert registry.resolve(other_address.upper().replace("0X", "0x")) is parsed
+    assert registry.resolve(parsed) is parsed
+
+    for key in ["Missing", "0x" + "00" * 20]:
+        try:
+            registry.get(key)
+            raise AssertionError(f"'{key}' was found")
+        except KeyError:
+            pass
+
+    # lookups by parsed object while other threads register new ABIs
+    errors = []
+
+    def register_many(thread_index: int):
+        try:
+            for index in range(REGISTRATIONS_PER_THREAD):
+                registry.register(
+                    get_event_abi(thread_index * REGISTRATIONS_PER_THREAD + index)
+                )
+                registry.register_address(other_address, parsed)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [
+        threading.Thread(target=register_many, args=(it,)) for it in range(THREAD_COUNT)
+    ]
+    for it in threads:
+        it.start()
+    for it in threads:
+        it.join()
+    assert errors == [], errors
+    assert len(registry._abi_by_hash) == 3 + THREAD_COUNT * REGISTRATIONS_PER_THREAD
+
+
+if __name__ == "__main__":
+    main()
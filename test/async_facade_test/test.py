@@ -0,0 +1,105 @@
+# asyncio facade test: writes apply in order, reads run on read-only instances, and the event loop is never blocked
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+
+from pytract.evm import AsyncAtomicEVM, TransferOperation
+from pytract.utils import AsyncExecutorFacade
+from pytract.vm import AsyncVM
+
+ALICE = "0x" + "a1" * 20
+BOB = "0x" + "b0" * 20
+TRANSFER_COUNT = 20
+SLOW_WRITE_SECONDS = 0.3
+
+
+class SlowWriter:
+    def __init__(self):
+        self.calls = []
+
+    def write(self, value):
+        time.sleep(SLOW_WRITE_SECONDS)
+        self.calls.append(value)
+        return value
+
+
+async def count_ticks(ticks: list, stop: asyncio.Event):
+    while not stop.is_set():
+        ticks.append(time.perf_counter())
+        await asyncio.sleep(0.01)
+
+
+async def run_without_blocking(coroutine):
+    """Run `coroutine` while checking that the event loop keeps running other tasks."""
+    ticks: list = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(count_ticks(ticks, stop))
+    try:
+        return await coroutine
+    finally:
+        stop.set()
+        await ticker
+        gaps = [b - a for a, b in zip(ticks, ticks[1:])]
+        assert max(gaps, default=0) < SLOW_WRITE_SECONDS / 2, gaps
+
+
+async def test_vm_first_loop(vm: AsyncVM):
+    # the VM keeps a sender balance above zero
+    alice = await vm.create_account(init_balance=TRANSFER_COUNT + 1)
+    bob = await vm.create_account()
+    await run_without_blocking(
+        asyncio.gather(*[vm.transfer(alice, bob, 1) for _ in range(TRANSFER_COUNT)])
+    )
+    balances = await asyncio.gather(vm.balance(alice), vm.balance(bob))
+    assert balances == [1, TRANSFER_COUNT]
+    return alice, bob
+
+
+async def test_vm_second_loop(vm: AsyncVM, alice, bob):
+    # the facade is used again from a new event loop
+    await vm.transfer(bob, alice, 5)
+    assert await vm.balance(alice) == 6
+    await vm.aclose()
+
+
+async def test_evm(evm: AsyncAtomicEVM):
+    async with evm:
+        await evm.create_account(ALICE, 100)
+        await evm.create_account(BOB, 0)
+        await asyncio.gather(*[evm.transfer(ALICE, BOB, 1) for _ in range(10)])
+        results = await evm.execute_batch(
+            [TransferOperation(ALICE, BOB, 5), TransferOperation(BOB, ALICE, 10**30)]
+        )
+        assert [it.ok for it in results] == [True, False]
+        assert await evm.get_balance(BOB) == 15
+        assert await evm.get_balance(ALICE) == 85
+
+
+async def test_slow_writer():
+    writer = SlowWriter()
+    facade = AsyncExecutorFacade(writer, SlowWriter, max_readers=1)
+    pending = [asyncio.create_task(facade._write("write", it)) for it in range(3)]
+    await asyncio.sleep(0)
+    await run_without_blocking(facade.aclose())
+    assert [it.result() for it in pending] == [0, 1, 2]
+    assert writer.calls == [0, 1, 2]
+
+
+def main():
+    workdir = tempfile.mkdtemp()
+    try:
+        vm = AsyncVM(
+            os.path.join(workdir, "db.json"), os.path.join(workdir, "contract_data")
+        )
+        alice, bob = asyncio.run(test_vm_first_loop(vm))
+        asyncio.run(test_vm_second_loop(vm, alice, bob))
+        asyncio.run(test_evm(AsyncAtomicEVM(os.path.join(workdir, "evm.json"))))
+        asyncio.run(test_slow_writer())
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
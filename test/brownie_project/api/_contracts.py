@@ -1,15 +1,21 @@
-from brownie.network.account import Account
-from brownie.network.contract import Contract, ProjectContract
 from pytract import abi2api
-from typing import Optional, Union
+from typing import TYPE_CHECKING, Any, NamedTuple, Optional, Sequence, Union
 from ._project import project_info
 
+if TYPE_CHECKING:
+    # packages generated from ABI files are used without brownie
+    from brownie.network.account import Account
+    from brownie.network.contract import Contract, ProjectContract
+
 
 class Faucet(abi2api.ContractInstance):
     _project = project_info.project
     _contract_info = project_info.contracts_info["Faucet"]
     _contract_name = "Faucet"
 
+    class Struct:
+        pass
+
     class Function(abi2api.FunctionBase):
         def returnVars(
             self,
@@ -23,7 +29,7 @@ class Faucet(abi2api.ContractInstance):
             Outputs:
                 (uint256, uint256, uint256)
             """
-            values = self._contract.returnVars()
+            values = self._view("returnVars", [])
             return values
 
         def withdraw(
@@ -40,15 +46,18 @@ class Faucet(abi2api.ContractInstance):
             Outputs:
                 (No parameters)
             """
-            values = self._contract.withdraw(
-                withdraw_amount, self.txparams_with_fallback(_txparams).dict()
-            )
+            values = self._transact("withdraw", [withdraw_amount], _txparams)
             return values
 
+    class Event:
+        pass
+
+    _events = {}
+
     def __init__(
         self,
-        contract: Union[Contract, ProjectContract],
-        issuer: Optional[Account] = None,
+        contract: "Union[Contract, ProjectContract, abi2api.EVMContract]",
+        issuer: "Optional[Union[Account, str]]" = None,
         _txparams: Optional[abi2api.TransactionParameters] = None,
     ):  # to create you need to either deploy or load contract by address
         super().__init__(contract, issuer)
@@ -70,7 +79,7 @@ class Faucet(abi2api.ContractInstance):
 
         parameters = _txparams.to_contract_deploy_parameters(args)
 
-        deployed_contract: ProjectContract = cls._contract_info.contract_container.deploy(*parameters.to_args())  # type: ignore
+        deployed_contract = cls._deploy_contract(parameters)
 
         return cls(deployed_contract, _txparams.issuer, _txparams)
 
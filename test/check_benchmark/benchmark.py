@@ -0,0 +1,60 @@
+# per-call cost of runtime type checks on VM.transfer and AtomicKVStore.set
+import json
+import os
+import tempfile
+import time
+
+import pytract
+from pytract.utils import AtomicKVStore, atomic_write, check_if_serializable
+from pytract.vm import VM
+
+REPEAT = 200
+STORE_SIZE = 100
+
+
+class ReserializingKVStore(AtomicKVStore):
+    """The former `set`: validates with a full dump, then dumps the whole store again on persist, written the same way."""
+
+    def set(self, key, value):
+        assert check_if_serializable(value)
+        self.data[key] = value
+        atomic_write(self.storage_location, json.dumps(self.data, ensure_ascii=False))
+
+
+def time_per_call(func, repeat: int = REPEAT) -> float:
+    start = time.perf_counter()
+    for index in range(repeat):
+        func(index)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def benchmark_set(store_class, path: str) -> float:
+    store = store_class(path)
+    for index in range(STORE_SIZE):
+        store.set(f"key_{index}", {"balance": index, "history": list(range(20))})
+    return time_per_call(
+        lambda index: store.set(f"key_{index % STORE_SIZE}", {"balance": index, "history": list(range(20))})
+    )
+
+
+def benchmark(checks: str, workdir: str):
+    pytract.configure(checks=checks)
+
+    vm = VM(os.path.join(workdir, f"{checks}_vm.json"), os.path.join(workdir, f"{checks}_contracts"))
+    sender = vm.create_account(10**9)
+    receiver = vm.create_account(0)
+    transfer_us = time_per_call(lambda _: vm.transfer(sender, receiver, 1))
+
+    set_us = benchmark_set(AtomicKVStore, os.path.join(workdir, f"{checks}_kv.json"))
+    return transfer_us, set_us
+
+
+with tempfile.TemporaryDirectory() as workdir:
+    results = {checks: benchmark(checks, workdir) for checks in ["on", "off"]}
+    pytract.configure(checks="on")
+    reserializing_set_us = benchmark_set(ReserializingKVStore, os.path.join(workdir, "reserializing_kv.json"))
+
+for name, index in [("VM.transfer", 0), ("AtomicKVStore.set", 1)]:
+    on_us, off_us = results["on"][index], results["off"][index]
+    print(f"{name}: {on_us:.1f} us/call with checks, {off_us:.1f} us/call without, saving {on_us - off_us:.1f} us/call ({(1 - off_us / on_us) * 100:.1f}%)")
+print(f"AtomicKVStore.set with full re-serialization: {reserializing_set_us:.1f} us/call, saving {reserializing_set_us - results['on'][1]:.1f} us/call by serializing once")
@@ -0,0 +1,118 @@
+# engagement test: VMs and EVM backends are engaged per asyncio task or thread, and finished payable calls leave nothing behind
+import asyncio
+import gc
+import os
+import shutil
+import tempfile
+import threading
+import types
+import weakref
+
+import pytract
+from pytract import abi2api
+from pytract.vm import VM, SmartContract, _transfer_amounts, get_vm_with_fallback
+
+ROUNDS = 20
+
+
+class Tip(SmartContract):
+    @pytract.vm.payable
+    def tip(self):
+        self.data["received"] = self.data.get("received", 0) + self._transfer_amount
+        return self._transfer_amount
+
+
+async def tip_repeatedly(vm: VM) -> Tip:
+    with vm.engage():
+        account = vm.create_account(init_balance=1000)
+        contract = Tip.create(issuer=account)
+        for _ in range(ROUNDS):
+            # the other task is engaged with its own VM in between
+            assert get_vm_with_fallback(None) is vm
+            assert contract.tip(account, 2) == 2
+            await asyncio.sleep(0)
+        assert _transfer_amounts.get() == {}
+    return contract
+
+
+async def run_tasks(vms: list) -> list:
+    return await asyncio.gather(*[tip_repeatedly(it) for it in vms])
+
+
+def check_payable_calls(workdir: str):
+    # one cached contract at most, so creating another drops the first from the VM
+    vm = VM(
+        os.path.join(workdir, "db.json"),
+        os.path.join(workdir, "contract_data"),
+        max_cached_contracts=1,
+    )
+    account = vm.create_account(init_balance=1000)
+    contract = Tip.create(issuer=account, vm=vm)
+    # a nested call gets the amounts of both, and the outer amount is back after it
+    with contract.receive(3, account):
+        assert contract.tip(account, 2) == 5
+        assert contract._transfer_amount == 3
+    assert contract._transfer_amount == 0
+
+    # nothing refers to the contract once the calls are over
+    assert _transfer_amounts.get() == {}
+    contract_ref = weakref.ref(contract)
+    del contract
+    Tip.create(issuer=account, vm=vm)
+    gc.collect()
+    assert contract_ref() is None
+
+
+def check_evm_backends():
+    # engaging does not touch the EVM, so stand-ins will do
+    backends = [abi2api.EVMBackend(types.SimpleNamespace(name=it)) for it in "ab"]
+    barrier = threading.Barrier(len(backends))
+    seen = []
+
+    def engage(backend: abi2api.EVMBackend):
+        with backend.engage():
+            barrier.wait()  # both are engaged at once
+            seen.append(abi2api.get_evm_backend() is backend)
+            barrier.wait()
+
+    threads = [threading.Thread(target=engage, args=(it,)) for it in backends]
+    for it in threads:
+        it.start()
+    for it in threads:
+        it.join()
+    assert seen == [True, True]
+    assert abi2api.get_evm_backend() is None
+
+    # a rejected second engagement leaves the first one engaged
+    with backends[0].engage():
+        try:
+            with backends[1].engage():
+                raise AssertionError("two backends engaged in one thread")
+        except Exception as e:
+            assert "already engaged" in str(e)
+        assert abi2api.get_evm_backend() is backends[0]
+    assert abi2api.get_evm_backend() is None
+
+
+def main():
+    workdir = tempfile.mkdtemp()
+    try:
+        vms = [
+            VM(
+                os.path.join(workdir, f"db_{it}.json"),
+                os.path.join(workdir, f"contract_data_{it}"),
+            )
+            for it in range(2)
+        ]
+        contracts = asyncio.run(run_tasks(vms))
+        for contract in contracts:
+            assert contract.balance == contract.data["received"] == 2 * ROUNDS
+        check_payable_calls(workdir)
+    finally:
+        shutil.rmtree(workdir)
+    check_evm_backends()
+    print(f"{len(vms)} VMs engaged in concurrent tasks, {ROUNDS} payable calls each")
+
+
+if __name__ == "__main__":
+    main()
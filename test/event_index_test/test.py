@@ -0,0 +1,82 @@
+# sync recorded Transfer logs into a local event index, without a node
+import pytract.abi2api
+import pytract.indexer
+import json
+import os
+
+TOKEN_ADDRESS = "0x5fbdb2315678afecb367f032d93f642f64180aa3"
+TRANSFER_ABI = {
+    "type": "event",
+    "name": "Transfer",
+    "anonymous": False,
+    "inputs": [
+        {"name": "from", "type": "address", "indexed": True},
+        {"name": "to", "type": "address", "indexed": True},
+        {"name": "value", "type": "uint256", "indexed": False},
+    ],
+}
+
+
+class Transfer(pytract.abi2api.EventBase):
+    __slots__ = ("from_", "to", "value")
+    _event_info = pytract.abi2api.parse_event_info(
+        pytract.abi2api.parse_abi(TRANSFER_ABI)
+    )
+    topic = _event_info.topic
+
+
+class Token(pytract.abi2api.ContractInstance):
+    _contract_name = "Token"
+    _events = {Transfer.topic: Transfer}
+
+
+class RecordedLogs:
+    """Serves recorded logs like `web3.eth.get_logs`."""
+
+    def __init__(self, logs: list, block_number: int):
+        self.logs = logs
+        self.block_number = block_number
+        self.requests = 0
+
+    def get_logs(self, log_filter: dict):
+        self.requests += 1
+        return [
+            log
+            for log in self.logs
+            if log_filter["fromBlock"] <= log["blockNumber"] <= log_filter["toBlock"]
+            and log["topics"][0] in log_filter["topics"][0]
+        ]
+
+    @property
+    def eth(self):
+        return self
+
+
+def main():
+    db_path = os.path.abspath("./events.sqlite")
+    with open("logs.json", "r") as f:
+        logs = json.loads(f.read())
+
+    web3 = RecordedLogs(logs, block_number=120)
+    token = Token(pytract.abi2api.EVMContract(None, "Token", TOKEN_ADDRESS))  # type: ignore
+
+    try:
+        with pytract.indexer.EventIndex(db_path) as index:
+            count = index.sync(token, to_block=60, chunk_size=16, web3=web3)
+            print("First sync:", count, "events, up to block", index.last_synced_block(TOKEN_ADDRESS))
+            assert count == 6
+
+            count = index.sync(token, chunk_size=16, web3=web3)
+            print("Resumed sync:", count, "events, up to block", index.last_synced_block(TOKEN_ADDRESS))
+            assert count == 6
+            assert index.last_synced_block(TOKEN_ADDRESS) == 120
+
+            events = list(index.query(address=TOKEN_ADDRESS, from_block=50))
+            print("Events since block 50:", [it["args"]["value"] for it in events])
+            assert [it["block_number"] for it in events] == [53, 63, 73, 83, 93, 103, 113]
+    finally:
+        os.remove(db_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# embedded EVM backend test: the generated API of the test project deploys, calls and transacts on an AtomicEVM
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+
+from pytract import abi2api
+from pytract.evm import AtomicEVM
+
+PROJECT_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "brownie_project"
+)
+
+DEPLOYER = "0x" + "d0" * 20
+USER = "0x" + "05" * 20
+
+
+def import_contracts(workdir: str):
+    """
+    Import the generated API from a copy of the test project. The Vyper contract has no
+    build artifact and would be compiled by brownie when loading the project, so it is left out.
+    """
+    project_copy = os.path.join(workdir, "brownie_project")
+    shutil.copytree(
+        PROJECT_DIR,
+        project_copy,
+        ignore=shutil.ignore_patterns("*.vy", "__pycache__"),
+    )
+    sys.path.insert(0, workdir)
+    return importlib.import_module("brownie_project.api.contracts")
+
+
+def main():
+    workdir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    try:
+        contracts = import_contracts(workdir)
+        evm = AtomicEVM(os.path.join(workdir, "evm.json"))
+        evm.create_account(DEPLOYER, 10**18)
+        evm.create_account(USER, 0)
+
+        with abi2api.EVMBackend(evm).engage():
+            faucet = contracts.Faucet.deploy(
+                abi2api.TransactionParameters(issuer=DEPLOYER)
+            )
+            assert isinstance(faucet._contract, abi2api.EVMContract)
+            assert list(faucet.function.returnVars()) == [1, 2, 3]
+
+            evm.transfer(DEPLOYER, faucet._contract.address, 1000)
+            faucet.function.withdraw(10, abi2api.TransactionParameters(issuer=USER))
+            assert evm.get_balance(faucet._contract.address) == 990
+            assert evm.get_balance(USER) == 10
+
+            # loading by address resolves to the same contract on the engaged backend
+            loaded = contracts.Faucet.from_address(faucet._contract.address)
+            assert list(loaded.function.returnVars()) == [1, 2, 3]
+
+        # the deployed contract is persisted with the EVM state
+        reopened = AtomicEVM(evm.storage_path, readonly=True)
+        assert reopened.get_balance(faucet._contract.address) == 990
+        assert abi2api.get_evm_backend() is None
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
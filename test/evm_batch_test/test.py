@@ -0,0 +1,104 @@
+# batch execution test: results follow the input order, failed operations do not abort the batch, and state is persisted once
+import os
+import shutil
+import tempfile
+
+from pytract import evm as evm_module
+from pytract.evm import (
+    AtomicEVM,
+    DeployOperation,
+    TransactOperation,
+    TransferOperation,
+    abi_registry,
+)
+
+BUILD_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "brownie_project",
+    "build",
+    "contracts",
+)
+
+ALICE = "0x" + "a1" * 20
+BOB = "0x" + "b0" * 20
+NOBODY = "0x" + "0e" * 20
+
+
+def count_persists():
+    writes = []
+    original = evm_module.atomic_write
+
+    def counting_atomic_write(path, content):
+        writes.append(path)
+        return original(path, content)
+
+    evm_module.atomic_write = counting_atomic_write
+    return writes, original
+
+
+def main():
+    workdir = tempfile.mkdtemp()
+    try:
+        abi_registry.load_build_directory(BUILD_DIR)
+        evm = AtomicEVM(os.path.join(workdir, "evm.json"))
+        evm.create_account(ALICE, 10**18)
+        evm.create_account(BOB, 0)
+
+        writes, original = count_persists()
+        try:
+            results = evm.execute_batch(
+                [
+                    DeployOperation("()", ALICE, 0, "Faucet"),
+                    TransferOperation(ALICE, BOB, 100),
+                    TransferOperation(NOBODY, BOB, 10**30),  # no funds
+                    TransferOperation(ALICE, BOB, 5),
+                ]
+            )
+        finally:
+            evm_module.atomic_write = original
+        assert len(writes) == 1
+
+        assert [type(it.operation) for it in results] == [
+            DeployOperation,
+            TransferOperation,
+            TransferOperation,
+            TransferOperation,
+        ]
+        assert [it.ok for it in results] == [True, True, False, True]
+        assert results[2].error is not None
+        faucet_address = results[0].result
+        assert faucet_address.startswith("0x")
+
+        # the operations after the failing one were applied, and persisted
+        assert AtomicEVM(evm.storage_path).get_balance(BOB) == 105
+
+        # a reverting transaction is an error of its own operation
+        results = evm.execute_batch(
+            [
+                TransferOperation(ALICE, faucet_address, 1000),
+                TransactOperation(
+                    "withdraw", "(2000)", BOB, faucet_address, 0, "Faucet"
+                ),
+                TransactOperation("withdraw", "(10)", BOB, faucet_address, 0, "Faucet"),
+            ]
+        )
+        assert [it.ok for it in results] == [True, False, True]
+        assert evm.get_balance(faucet_address) == 990
+        bob_balance = evm.get_balance(BOB)
+
+        # stop_on_error skips the rest of the batch
+        results = evm.execute_batch(
+            [
+                TransferOperation(NOBODY, BOB, 10**30),
+                TransferOperation(ALICE, BOB, 1),
+            ],
+            stop_on_error=True,
+        )
+        assert [it.ok for it in results] == [False]
+        assert AtomicEVM(evm.storage_path).get_balance(BOB) == bob_balance
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -27,6 +27,50 @@ class TestContract(pytract.vm.SmartContract):
         print("Donation from:", self._caller_account)
         print("Donation amount:", self._transfer_amount)
 
+    @pytract.vm.payable
+    def count_donation(self):
+        self.data["donations"] = self.data.get("donations", 0) + 1
+        self.data["last_amount"] = self._transfer_amount
+
+    @pytract.vm.payable
+    def refuse_donation(self):
+        self.data["donations"] = -1
+        raise Exception("Donation refused")
+
+
+def count_writes(func):
+    """Number of files published by `func`, by TinyDB and by the contract store."""
+    writes = []
+    original_atomic_write = pytract.utils.atomic_write
+
+    def counting_atomic_write(path, content):
+        writes.append(path)
+        return original_atomic_write(path, content)
+
+    pytract.utils.atomic_write = pytract.vm.atomic_write = counting_atomic_write
+    try:
+        func()
+    finally:
+        pytract.utils.atomic_write = pytract.vm.atomic_write = original_atomic_write
+    return len(writes)
+
+
+def crash_on_contract_write(func):
+    """Run `func`, failing like a crash once it writes contract data."""
+    original_atomic_write = pytract.vm.atomic_write
+
+    def crashing_atomic_write(path, content):
+        raise Exception("Crashed")
+
+    pytract.vm.atomic_write = crashing_atomic_write
+    try:
+        func()
+        raise AssertionError("No contract data written")
+    except Exception as e:
+        assert str(e) == "Crashed", e
+    finally:
+        pytract.vm.atomic_write = original_atomic_write
+
 
 def main():
     db_path = os.path.abspath("./db.json")
@@ -67,6 +111,57 @@ def main():
 
         main_test()
 
+        # a payable call is one unit of work: one balance update recording the commit, and one contract write
+        writes = count_writes(lambda: contract_1.count_donation(account_1, 1))
+        print("Writes per payable call:", writes)
+        assert writes == 2, writes
+        assert contract_1.data["donations"] == 1
+        # with the contract data unchanged, only balances are written
+        writes = count_writes(lambda: contract_1.make_donation(account_1, 1))
+        assert writes == 1, writes
+        assert contract_1.balance == 4
+
+        # a failing call writes nothing and drops its changes
+        try:
+            contract_1.refuse_donation(account_1, 1)
+        except Exception as e:
+            print("Refused:", e)
+        assert contract_1.balance == 4
+        assert contract_1.data["donations"] == 1
+
+        # a commit interrupted after the balances were written is finished by the next VM
+        crash_on_contract_write(lambda: contract_1.count_donation(account_1, 1))
+        assert contract_1.balance == 5
+        assert contract_1.data["donations"] == 1
+        recovered_vm = pytract.vm.VM(db_path, contract_data_dir)
+        recovered_contract = TestContract.load(contract_1._address, vm=recovered_vm)
+        assert recovered_contract.balance == 5
+        assert recovered_contract.data["donations"] == 2
+        # finishing it again changes nothing
+        assert count_writes(lambda: pytract.vm.VM(db_path, contract_data_dir)) == 0
+        assert recovered_contract.balance == 5
+
+        # loaded contracts are kept by address: loading again returns the same object
+        assert TestContract.load(contract_1._address, vm=vm) is contract_1
+        assert TestContract.load(recovered_contract._address, vm=recovered_vm) is recovered_contract
+        # a reader VM picks up data published by the writer since it was loaded
+        reader_vm = pytract.vm.VM(db_path, contract_data_dir, readonly=True)
+        reader_contract = TestContract.load(contract_1._address, vm=reader_vm)
+        recovered_contract.count_donation(account_1, 1)
+        assert TestContract.load(contract_1._address, vm=reader_vm) is reader_contract
+        assert reader_contract.data["donations"] == 3
+
+        # least recently loaded contracts are stored and dropped beyond the cache size
+        small_vm = pytract.vm.VM(db_path, contract_data_dir, max_cached_contracts=2)
+        contracts = [TestContract.create(issuer=account_1, vm=small_vm) for _ in range(2)]
+        contracts[0].data["nested"] = {"value": 0}
+        contracts[0].data["nested"]["value"] = 1  # not seen by the data dict
+        TestContract.load(contracts[1]._address, vm=small_vm)
+        contracts.append(TestContract.create(issuer=account_1, vm=small_vm))
+        reloaded = TestContract.load(contracts[0]._address, vm=small_vm)
+        assert reloaded is not contracts[0]
+        assert reloaded.data["nested"]["value"] == 1
+
     def test_and_cleanup():
         try:
             test()
@@ -0,0 +1,163 @@
+# bulk reads: columns built from raw return words match the values decoded one by one, on every path, and reverted calls are rejected
+import numpy as np
+
+from generated_api_common import *
+from pytract.abi2api import MULTICALL3_ADDRESS, EVMBackend, EVMContract
+
+IDS = list(range(1, 1201))
+BATCH_SIZE = 500
+HOLDERS = ["0x" + f"{it:040x}" for it in range(1, 301)]
+
+
+def get_accumulators(id: int) -> tuple:
+    # wide and narrow signed values, and uint64 values above the int64 range
+    return (-(id * 10**40) if id % 3 else id * 10**40, 2**64 - id, -id * 7)
+
+
+def get_reserves(id: int) -> tuple:
+    return (2**111 + id, -id * 60 if id % 2 else id * 60, id % 5 == 0)
+
+
+def balance_of(owner: str) -> int:
+    return int(owner, 16) * 10**60
+
+
+class StubEVM:
+    """Answers `AtomicEVM.call` with the same values as the node."""
+
+    def call(self, name: str, args: str, address: str, contract_name: str):
+        arg = args.strip("()")
+        if name == "balanceOf":
+            return balance_of(arg)
+        return dict(getAccumulators=get_accumulators, getReserves=get_reserves)[name](
+            int(arg)
+        )
+
+
+def from_limbs(limbs: np.ndarray, signed: bool) -> int:
+    return int.from_bytes(limbs.astype(">u8").tobytes(), "big", signed=signed)
+
+
+def check_numpy(pool, **kwargs):
+    accumulated, count, delta = pool.function.map(
+        "getAccumulators", IDS, batch_size=BATCH_SIZE, **kwargs
+    )
+    expected = list(zip(*map(get_accumulators, IDS)))
+    assert accumulated.dtype == object and list(accumulated) == list(expected[0])
+    assert count.dtype == np.uint64 and count.tolist() == list(expected[1])
+    assert delta.dtype == np.int64 and delta.tolist() == list(expected[2])
+
+    reserve, tick, active = pool.function.map(
+        "getReserves", IDS, batch_size=BATCH_SIZE, **kwargs
+    )
+    expected = list(zip(*map(get_reserves, IDS)))
+    assert list(reserve) == list(expected[0])
+    assert tick.dtype == np.int64 and tick.tolist() == list(expected[1])
+    assert active.dtype == np.bool_ and active.tolist() == list(expected[2])
+
+    balances = pool.function.map("balanceOf", HOLDERS, batch_size=BATCH_SIZE, **kwargs)
+    assert isinstance(balances, np.ndarray)
+    assert list(balances) == [balance_of(it) for it in HOLDERS]
+
+    # wide integers split into limbs, most significant first, in two's complement
+    accumulated, count, _ = pool.function.map(
+        "getAccumulators", IDS, batch_size=BATCH_SIZE, split_words=True, **kwargs
+    )
+    assert accumulated.shape == (len(IDS), 4) and accumulated.dtype == np.uint64
+    assert [from_limbs(it, True) for it in accumulated] == [
+        get_accumulators(it)[0] for it in IDS
+    ]
+    assert count.dtype == np.uint64  # narrow outputs are never split
+
+
+def check_arrow(pool, **kwargs):
+    import pyarrow as pa
+
+    table = pool.function.map(
+        "getAccumulators", IDS, batch_size=BATCH_SIZE, output="arrow", **kwargs
+    )
+    assert isinstance(table, pa.Table)
+    assert table.column_names == ["accumulated", "count", "delta"]
+    assert table.schema.field("accumulated").type == pa.binary(32)
+    assert table.schema.field("count").type == pa.uint64()
+    assert table.schema.field("delta").type == pa.int64()
+    rows = zip(
+        table.column("accumulated").to_pylist(),
+        table.column("count").to_pylist(),
+        table.column("delta").to_pylist(),
+    )
+    assert [
+        (int.from_bytes(accumulated, "big", signed=True), count, delta)
+        for accumulated, count, delta in rows
+    ] == [get_accumulators(it) for it in IDS]
+
+    table = pool.function.map(
+        "getReserves", IDS, batch_size=BATCH_SIZE, output="arrow", **kwargs
+    )
+    assert table.schema.field("active").type == pa.bool_()
+    assert table.schema.field("tick").type == pa.int64()
+    assert [
+        int.from_bytes(it, "big") for it in table.column("reserve").to_pylist()
+    ] == [get_reserves(it)[0] for it in IDS]
+    assert table.column("active").to_pylist() == [get_reserves(it)[2] for it in IDS]
+
+
+def check_list(pool, **kwargs):
+    values = pool.function.map(
+        "getReserves", IDS, batch_size=BATCH_SIZE, output="list", **kwargs
+    )
+    assert [tuple(it) for it in values] == [get_reserves(it) for it in IDS]
+
+
+def check_reverted_calls(node: StubNode, pool, paths: dict):
+    # reverted calls return no words, which fails the batch instead of shifting the rows after them
+    selector = bytes.fromhex(get_function_info("getReserves").selector[2:])
+    node.reverting.add(selector + encode(["uint256"], [IDS[7]]))
+    for name, kwargs in paths.items():
+        for output in ["numpy", "arrow"]:
+            try:
+                pool.function.map("getReserves", IDS[:10], output=output, **kwargs)
+                raise AssertionError(f"reverted call accepted on the {name} path")
+            except Exception as e:
+                if name == "multicall":
+                    assert str(e) == "Call 7 of the batch reverted", e
+                else:
+                    assert str(e).startswith("Return data of call 7 is 0 bytes"), e
+    node.reverting.clear()
+
+
+def main():
+    node = StubNode(
+        handlers=dict(
+            getAccumulators=get_accumulators,
+            getReserves=get_reserves,
+            balanceOf=balance_of,
+        )
+    )
+    pool = Pool(StubContract())
+    paths = dict(
+        concurrent=dict(web3=node),
+        sequential=dict(web3=node, max_workers=1),
+        multicall=dict(web3=node, multicall_address=MULTICALL3_ADDRESS),
+    )
+    for kwargs in paths.values():
+        check_numpy(pool, **kwargs)
+        check_arrow(pool, **kwargs)
+        check_list(pool, **kwargs)
+
+    # results decoded by the embedded EVM go through the same columns
+    evm_pool = Pool(EVMContract(EVMBackend(StubEVM()), "Pool", POOL_ADDRESS))
+    check_numpy(evm_pool)
+    check_arrow(evm_pool)
+    check_list(evm_pool)
+
+    check_reverted_calls(node, pool, paths)
+
+    empty = pool.function.map("getReserves", [], web3=node)
+    assert [len(it) for it in empty] == [0, 0, 0]
+    assert pool.function.map("getReserves", [], output="list", web3=node) == []
+    print(f"{len(IDS)} calls per function over {len(paths) + 1} paths")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# contract wrappers resolved by address are cached, bounded, and dropped on invalidation
+import gc
+
+from brownie.network.contract import Contract
+
+from generated_api_common import *
+from pytract.abi2api import ContractCache, contract_cache
+
+
+def test_cache_bounds():
+    cache = ContractCache(maxsize=2)
+    wrappers = [Pool(StubContract(f"0x{it:040x}")) for it in range(3)]
+    keys = [(Pool, f"0x{it:040x}") for it in range(3)]
+    for key, wrapper in zip(keys, wrappers):
+        cache.put(key, wrapper)
+    # the oldest entry left the LRU, but is still found while referenced elsewhere
+    assert len(cache._lru) == 2
+    assert cache.get(keys[0]) is wrappers[0]
+    assert list(cache._lru.keys()) == [keys[2], keys[0]]
+
+    # once only the cache refers to them, wrappers beyond the LRU are gone
+    del wrappers
+    gc.collect()
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[2]) is not None and len(cache) == 2
+
+    cache.invalidate(Pool, keys[2][1].upper().replace("0X", "0x"))
+    assert cache.get(keys[2]) is None and cache.get(keys[0]) is not None
+    cache.clear()
+    assert len(cache) == 0
+
+
+def main():
+    test_cache_bounds()
+
+    resolved = []
+    original_from_abi = Contract.__dict__["from_abi"]
+
+    def from_abi(cls, name: str, address: str, abi: list):
+        resolved.append(address)
+        return StubContract(address)
+
+    Contract.from_abi = classmethod(from_abi)
+    try:
+        contract_cache.clear()
+        pool = Pool.from_address(POOL_ADDRESS)
+        assert resolved == [POOL_ADDRESS]
+        # the same address in any case is resolved once
+        assert Pool.from_address(POOL_ADDRESS.lower()) is pool
+        assert len(resolved) == 1
+
+        # another issuer shares the resolved contract in a new wrapper
+        issued = Pool.from_address(POOL_ADDRESS, issuer=ALICE)
+        assert issued is not pool and issued._contract is pool._contract
+        assert issued.properties.issuer == ALICE
+        assert len(resolved) == 1
+
+        assert Pool.from_address(POOL_ADDRESS, use_cache=False) is not pool
+        assert len(resolved) == 2
+
+        Pool.invalidate_cache(POOL_ADDRESS)
+        assert Pool.from_address(POOL_ADDRESS) is not pool
+        assert len(resolved) == 3
+    finally:
+        Contract.from_abi = original_from_abi
+        contract_cache.clear()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# generated event classes: logs are decoded into typed events, in chain order, over adaptive block chunks
+from eth_abi import encode
+from eth_utils import keccak
+
+from generated_api_common import *
+from pytract.abi_info import EventDecoder, parse_abi, parse_event_info
+
+LAST_BLOCK = 1000
+
+
+def address_topic(address: str) -> bytes:
+    return encode(["address"], [address])
+
+
+def make_logs() -> list:
+    logs = []
+    for block_number in range(5, LAST_BLOCK, 50):
+        logs.append(
+            make_log(
+                Pool.Event.Transfer,
+                block_number,
+                [address_topic(ALICE), address_topic(BOB)],
+                ["uint256"],
+                [block_number * 10**18],
+            )
+        )
+        logs.append(
+            make_log(
+                Pool.Event.Deposit,
+                block_number + 1,
+                [address_topic(BOB), keccak(text="savings")],
+                ["int128", "bool"],
+                [-block_number, block_number % 100 == 5],
+            )
+        )
+    return logs
+
+
+def check_all_indexed_event():
+    # ERC721 transfers have no data, every field comes from the topics
+    event_info = parse_event_info(
+        parse_abi(
+            dict(
+                type="event",
+                name="Transfer",
+                anonymous=False,
+                inputs=[
+                    dict(name=name, type=type_, indexed=True)
+                    for name, type_ in [
+                        ("from", "address"),
+                        ("to", "address"),
+                        ("tokenId", "uint256"),
+                    ]
+                ],
+            )
+        )
+    )
+    log = dict(
+        topics=[event_info.topic]
+        + [
+            "0x" + encode([it], [value]).hex()
+            for it, value in [("address", ALICE), ("address", BOB), ("uint256", 42)]
+        ],
+        data="0x",
+    )
+    assert EventDecoder(event_info).decode_values(log) == [
+        ALICE.lower(),
+        BOB.lower(),
+        42,
+    ]
+
+
+def main():
+    check_all_indexed_event()
+    logs = make_logs()
+    node = StubNode(logs=logs, block_number=LAST_BLOCK)
+    node.max_log_range = 100
+    pool = Pool(StubContract())
+
+    events = list(pool.iter_events(0, chunk_size=64, web3=node))
+    assert len(events) == len(logs)
+    assert [it.log_block_number for it in events] == [it["blockNumber"] for it in logs]
+
+    transfer, deposit = events[0], events[1]
+    assert isinstance(transfer, Pool.Event.Transfer)
+    assert isinstance(deposit, Pool.Event.Deposit)
+    # `from` is a keyword, so its attribute gets a trailing underscore
+    assert transfer.to_dict() == dict(
+        from_=ALICE.lower(), to=BOB.lower(), value=5 * 10**18
+    )
+    # indexed strings only come as their hash
+    assert deposit.tag == keccak(text="savings")
+    assert deposit.amount == -5 and deposit.locked is True
+    assert deposit.owner == BOB.lower()
+    assert deposit.log_transaction_hash == logs[1]["transactionHash"]
+
+    # only the requested events are fetched
+    deposits = list(
+        pool.iter_events(0, LAST_BLOCK, events=[Pool.Event.Deposit], web3=node)
+    )
+    assert [type(it) for it in deposits] == [Pool.Event.Deposit] * (len(logs) // 2)
+
+    # chunks cover the range without gaps, shrinking below the node's limit after a rejection
+    node.log_requests.clear()
+    chunks = list(pool.iter_event_chunks(0, LAST_BLOCK, chunk_size=64, web3=node))
+    assert chunks[0][0] == 0 and chunks[-1][1] == LAST_BLOCK
+    assert all(b[0] == a[1] + 1 for a, b in zip(chunks, chunks[1:]))
+    assert max(it[1] - it[0] + 1 for it in chunks) <= node.max_log_range
+    assert len(node.log_requests) > len(chunks)  # some requests were rejected
+    assert sum(len(it[2]) for it in chunks) == len(logs)
+
+    # without a block limit, the chunks grow over sparse ranges
+    node.max_log_range = None
+    chunks = list(pool.iter_event_chunks(0, LAST_BLOCK, chunk_size=8, web3=node))
+    assert chunks[-1][1] - chunks[-1][0] > 8
+    print(
+        f"{len(events)} events decoded, {len(chunks)} chunks over {LAST_BLOCK} blocks"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# gas estimate cache: estimates reused by argument shape, expired by blocks, and dropped when the cached limit fails,
+# sending the transaction again only when it ran out of gas or was never mined
+from brownie.exceptions import VirtualMachineError
+
+from generated_api_common import *
+from pytract.abi2api import (
+    GasEstimateCache,
+    TransactionParameters,
+    get_gas_estimate_cache,
+    use_gas_estimate_cache,
+)
+
+ESTIMATE = 50_000
+
+
+class StubReceipt:
+    def __init__(self, tx: dict, status: int = 1, gas_used: int = 21_000):
+        self.tx = tx
+        self.status = status
+        self.gas_used = gas_used
+
+
+OUT_OF_GAS_TXID = "0x" + "01" * 32
+REVERTED_TXID = "0x" + "02" * 32
+
+
+def make_revert_error(txid: str = "") -> VirtualMachineError:
+    # brownie builds these from RPC error payloads, which are not needed here
+    error = VirtualMachineError.__new__(VirtualMachineError)
+    Exception.__init__(error, "revert")
+    error.txid = txid
+    error.revert_type = "revert"
+    return error
+
+
+def main():
+    sent: list = []
+    # ways to fail the next broadcasts made with a cached gas limit
+    failures: list = []
+
+    def transfer(to: str, amount: int, tx: dict):
+        sent.append(tx)
+        if "gas_limit" in tx and failures != []:
+            failure = failures.pop(0)
+            if failure == "rejected":
+                raise make_revert_error()
+            if failure == "out of gas revert":
+                raise make_revert_error(OUT_OF_GAS_TXID)
+            if failure == "revert":
+                raise make_revert_error(REVERTED_TXID)
+            return StubReceipt(tx, status=0, gas_used=tx["gas_limit"])
+        return StubReceipt(tx)
+
+    node = StubNode(block_number=1000)
+    limit = int(ESTIMATE * 1.2)
+    node.receipts[OUT_OF_GAS_TXID] = {"status": 0, "gasUsed": limit}
+    node.receipts[REVERTED_TXID] = {"status": 0, "gasUsed": limit // 2}
+    contract = StubContract(handlers=dict(transfer=transfer))
+    pool = Pool(contract)
+    txparams = TransactionParameters(issuer=ALICE)
+    cache = GasEstimateCache(web3=node, block_poll_interval=0)
+
+    use_gas_estimate_cache(cache)
+    try:
+        assert get_gas_estimate_cache() is cache
+        # the same argument shape is estimated once, buffered by the default buffer
+        pool.function.transfer(BOB, 5, _txparams=txparams)
+        pool.function.transfer(ALICE, 7, _txparams=txparams)
+        assert len(contract.estimates) == 1
+        assert [it["gas_limit"] for it in sent] == [int(ESTIMATE * 1.2)] * 2
+        assert all("gas_buffer" not in it for it in sent)
+
+        # zero amounts cost less gas, so they are another shape
+        pool.function.transfer(BOB, 0, _txparams=txparams)
+        assert len(contract.estimates) == 2
+
+        # the buffer of the transaction applies to cached estimates
+        sent.clear()
+        pool.function.transfer(
+            BOB, 5, _txparams=TransactionParameters(issuer=ALICE, gas_buffer=2)
+        )
+        assert len(contract.estimates) == 2
+        assert sent[-1]["gas_limit"] == ESTIMATE * 2
+
+        # estimates expire after `max_blocks`
+        node.block_number += cache.max_blocks + 1
+        pool.function.transfer(BOB, 5, _txparams=txparams)
+        assert len(contract.estimates) == 3
+
+        # running out of gas with the cached limit, or being rejected before mining, retries without it
+        for failure in ["rejected", "out of gas revert", "out of gas"]:
+            sent.clear()
+            failures.append(failure)
+            receipt = pool.function.transfer(BOB, 5, _txparams=txparams)
+            assert [("gas_limit" in it) for it in sent] == [True, False]
+            assert receipt.status == 1 and receipt.tx is sent[-1]
+            key = cache.get_key(contract, "transfer", [BOB, 5])
+            assert cache.get(key) is None
+            # the next transaction estimates again
+            pool.function.transfer(BOB, 5, _txparams=txparams)
+            assert cache.get(key) == ESTIMATE
+
+        # any other revert was mined already: it is not sent again, and the estimate is dropped
+        sent.clear()
+        failures.append("revert")
+        try:
+            pool.function.transfer(BOB, 5, _txparams=txparams)
+            raise AssertionError("revert was not raised")
+        except VirtualMachineError as e:
+            assert e.txid == REVERTED_TXID
+        assert len(sent) == 1
+        assert cache.get(cache.get_key(contract, "transfer", [BOB, 5])) is None
+
+        # an explicit gas limit bypasses the cache
+        estimate_count = len(contract.estimates)
+        pool.function.transfer(
+            BOB, 1, _txparams=TransactionParameters(issuer=ALICE, gas_limit=30_000)
+        )
+        assert len(contract.estimates) == estimate_count
+        assert sent[-1]["gas_limit"] == 30_000
+    finally:
+        use_gas_estimate_cache(None)
+
+    assert get_gas_estimate_cache() is None
+    estimate_count = len(contract.estimates)
+    pool.function.transfer(BOB, 5, _txparams=txparams)
+    assert len(contract.estimates) == estimate_count
+    assert "gas_limit" not in sent[-1]
+    print(f"{estimate_count} gas estimates, cache disabled again")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+# shared by the generated API tests: the API of test/pool_abi_example generated into a temporary package,
+# and stand-ins for brownie contracts and the node, so no network is needed
+import atexit
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+
+import brownie.network
+from brownie.network.contract import Contract
+from eth_abi import decode, encode
+
+from pytract import abi2api
+from pytract.codegen import generate_api_code_for_abi_dir
+
+ABI_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pool_abi_example"
+)
+
+POOL_ADDRESS = "0x5FbDB2315678afecb367f032d93F642f64180aa3"
+ALICE = "0x" + "a1" * 20
+BOB = "0x" + "b0" * 20
+
+_workdir = tempfile.mkdtemp()
+atexit.register(shutil.rmtree, _workdir)
+generate_api_code_for_abi_dir(ABI_DIR, os.path.join(_workdir, "pool_api"))
+sys.path.insert(0, _workdir)
+pool_api = importlib.import_module("pool_api")
+Pool = pool_api.contracts.Pool
+project_info = pool_api.project_info
+contract_info = project_info.contracts_info["Pool"]
+
+
+def get_function_info(name: str):
+    return next(it for it in contract_info.function_info_list if it.name == name)
+
+
+def get_types(params) -> list:
+    return [it.canonical_type for it in params]
+
+
+class StubMethod:
+    """Contract method of a `StubContract`, called like brownie's `ContractCall` and `ContractTx`."""
+
+    def __init__(self, contract: "StubContract", name: str):
+        self._contract = contract
+        self._name = name
+
+    def __call__(self, *args):
+        self._contract.calls.append((self._name, args))
+        return self._contract.handlers[self._name](*args)
+
+    def encode_input(self, *args) -> str:
+        function_info = get_function_info(self._name)
+        data = bytes.fromhex(function_info.selector[2:])
+        data += encode(get_types(function_info.inputs), list(args))
+        return "0x" + data.hex()
+
+    def estimate_gas(self, *args) -> int:
+        self._contract.estimates.append((self._name, args))
+        return self._contract.gas_estimate
+
+
+class StubContract(Contract):
+    """
+    Stands in for a brownie `Contract`, answering calls with `handlers` by function name.
+    Nothing of `Contract` is used, it is only subclassed to pass type validation.
+    """
+
+    _name = "Pool"
+    """Read by brownie when reporting missing attributes, before falling back to `__getattr__`."""
+
+    def __init__(self, address: str = POOL_ADDRESS, handlers: dict = {}):
+        self.address = address
+        self.tx = None
+        self.handlers = dict(handlers)
+        self.calls: list = []
+        self.estimates: list = []
+        self.gas_estimate = 50_000
+
+    def __getattr__(self, name: str) -> StubMethod:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return StubMethod(self, name)
+
+
+class StubNode:
+    """
+    Stands in for brownie's `web3`. `eth_call`s to the pool, directly or through Multicall3,
+    are decoded and answered with `handlers` by function name.
+    """
+
+    def __init__(self, handlers: dict = {}, logs: list = [], block_number: int = 0):
+        self.handlers = dict(handlers)
+        self.logs = list(logs)
+        self.block_number = block_number
+        self.max_log_range = None
+        """Reject `eth_getLogs` over more blocks than this, like rate limited nodes."""
+        self.calls: list = []
+        self.log_requests: list = []
+        self.transaction_count = 0
+        self.mined: set = set()
+        self.receipts: dict = {}
+        """Receipts returned for transaction hashes, beyond the bare ones of `mined`."""
+        self.reverting: set = set()
+        """Calldata of calls that revert, answered with empty return data."""
+
+    @property
+    def eth(self):
+        return self
+
+    def _answer(self, data: bytes) -> bytes:
+        if bytes(data) in self.reverting:
+            return b""
+        candidates, args = project_info.selector_index.decode_calldata(data)
+        function_info = candidates[0][1]
+        self.calls.append((function_info.name, args))
+        values = self.handlers[function_info.name](*args)
+        if len(function_info.outputs) == 1:
+            values = (values,)
+        return encode(get_types(function_info.outputs), list(values))
+
+    def call(self, tx: dict) -> bytes:
+        data = (
+            bytes.fromhex(tx["data"][2:]) if isinstance(tx["data"], str) else tx["data"]
+        )
+        if tx["to"] == abi2api.MULTICALL3_ADDRESS:
+            assert data[:4] == abi2api.MULTICALL3_AGGREGATE3_SELECTOR
+            (calls,) = decode(["(address,bool,bytes)[]"], data[4:])
+            results = [
+                (bytes(it[2]) not in self.reverting, self._answer(it[2]))
+                for it in calls
+            ]
+            return encode(["(bool,bytes)[]"], [results])
+        assert tx["to"].lower() == POOL_ADDRESS.lower()
+        return self._answer(data)
+
+    def get_logs(self, log_filter: dict) -> list:
+        self.log_requests.append((log_filter["fromBlock"], log_filter["toBlock"]))
+        block_count = log_filter["toBlock"] - log_filter["fromBlock"] + 1
+        if self.max_log_range is not None and block_count > self.max_log_range:
+            raise ValueError("query returned more than 10000 results")
+        return [
+            it
+            for it in self.logs
+            if log_filter["fromBlock"] <= it["blockNumber"] <= log_filter["toBlock"]
+            and it["topics"][0] in log_filter["topics"][0]
+        ]
+
+    def get_transaction_count(self, address: str, block_identifier: str) -> int:
+        return self.transaction_count
+
+    def get_transaction_receipt(self, txid: str):
+        from web3.exceptions import TransactionNotFound
+
+        if txid in self.receipts:
+            return self.receipts[txid]
+        if txid not in self.mined:
+            raise TransactionNotFound(txid)
+        return {"transactionHash": txid}
+
+
+@contextmanager
+def use_node(node: StubNode):
+    """Make `node` the web3 used by code importing it from `brownie.network`."""
+    original = brownie.network.web3
+    brownie.network.web3 = node
+    try:
+        yield node
+    finally:
+        brownie.network.web3 = original
+
+
+def make_log(
+    event_class, block_number: int, topics: list, data_types: list, data: list
+) -> dict:
+    """Raw log of a pool event, with the indexed values already encoded as topics."""
+    return {
+        "address": POOL_ADDRESS.lower(),
+        "topics": [event_class.topic] + ["0x" + it.hex() for it in topics],
+        "data": "0x" + encode(data_types, data).hex(),
+        "blockNumber": block_number,
+        "transactionHash": "0x" + f"{block_number:064x}",
+        "logIndex": 0,
+    }
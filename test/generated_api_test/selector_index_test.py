@@ -0,0 +1,131 @@
+# the selector index maps calldata and logs back to the contracts and ABI entries they came from
+import os
+import tempfile
+
+from eth_abi import encode
+from eth_utils import keccak
+
+from generated_api_common import *
+from pytract.abi_info import (
+    AbiContractInfo,
+    FunctionInfo,
+    ParamType,
+    SelectorIndex,
+    load_json_file,
+)
+
+TOKEN_ABI = [
+    it
+    for it in load_json_file(os.path.join(ABI_DIR, "Pool.json"))
+    if it.get("name") in ("balanceOf", "transfer", "Transfer")
+]
+"""An ERC20-like contract sharing selectors and topics with the pool."""
+
+
+def same_entries(index: SelectorIndex, other: SelectorIndex) -> bool:
+    # decoders cached while decoding are left out
+    return index.functions == other.functions and index.events == other.events
+
+
+def check_pool_index(index: SelectorIndex):
+    balance_of = get_function_info("balanceOf")
+    calldata = (
+        "0x"
+        + (bytes.fromhex(balance_of.selector[2:]) + encode(["address"], [ALICE])).hex()
+    )
+    assert index.lookup_function(calldata) == [("Pool", balance_of)]
+    candidates, args = index.decode_calldata(calldata)
+    assert candidates == [("Pool", balance_of)]
+    assert args == (ALICE.lower(),)
+    # calldata may be given as bytes as well
+    assert index.decode_calldata(bytes.fromhex(calldata[2:]))[1] == args
+
+    # functions without inputs have nothing to decode
+    get_positions = get_function_info("getPositions")
+    assert index.decode_calldata(get_positions.selector) == (
+        [("Pool", get_positions)],
+        (),
+    )
+
+    assert index.lookup_function("0xdeadbeef") == []
+    assert index.decode_calldata("0xdeadbeef" + "00" * 32) is None
+
+    log = make_log(
+        Pool.Event.Deposit,
+        1,
+        [encode(["address"], [BOB]), keccak(text="savings")],
+        ["int128", "bool"],
+        [-7, True],
+    )
+    ((contract_name, event_info),) = index.lookup_event(log["topics"][0])
+    assert contract_name == "Pool" and event_info.name == "Deposit"
+    candidates, values = index.decode_log(log)
+    assert candidates[0][1].name == "Deposit"
+    assert values == [BOB.lower(), keccak(text="savings"), -7, True]
+
+    assert index.decode_log(dict(log, topics=["0x" + "00" * 32])) is None
+    assert index.decode_log(dict(log, topics=[])) is None
+
+
+def check_colliding_selectors(transfer: FunctionInfo, calldata: bytes):
+    # selectors are 4 bytes, so other signatures may share them
+    amounts = FunctionInfo(
+        name="move", inputs=[ParamType(type="uint256"), ParamType(type="uint256")]
+    )
+    flag = FunctionInfo(name="toggle", inputs=[ParamType(type="bool")])
+    index = SelectorIndex(
+        functions={
+            transfer.selector: [("Flag", flag), ("Vault", amounts), ("Pool", transfer)]
+        }
+    )
+    # the address does not decode as a bool, so the next signature is tried
+    assert index.decode_calldata(calldata) == ([("Vault", amounts)], (int(BOB, 16), 10))
+    # the contract at the receiving address is tried first
+    index.register_address(POOL_ADDRESS, "Pool")
+    assert index.decode_calldata(calldata, to=POOL_ADDRESS.upper()) == (
+        [("Pool", transfer)],
+        (BOB.lower(), 10),
+    )
+    assert index.decode_calldata(calldata, to=ALICE)[0] == [("Vault", amounts)]
+    # calldata no signature decodes is not decoded at all
+    del index.functions[transfer.selector][1:]
+    assert index.decode_calldata(calldata) is None
+
+
+def main():
+    # the generated package persisted its index, which is loaded instead of rebuilt
+    assert os.path.exists(project_info.selector_index_path)
+    loaded = project_info.selector_index
+    built = SelectorIndex.from_contracts_info(project_info.contracts_info)
+    assert same_entries(loaded, built)
+    check_pool_index(loaded)
+    check_pool_index(built)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "selectors.json")
+        built.save(path)
+        assert same_entries(SelectorIndex.load(path), built)
+
+    # contracts sharing a selector are all candidates, decoded with one signature
+    index = SelectorIndex.from_contracts_info(
+        dict(Pool=contract_info, Token=AbiContractInfo.from_abi(TOKEN_ABI))
+    )
+    transfer = get_function_info("transfer")
+    calldata = bytes.fromhex(transfer.selector[2:]) + encode(
+        ["address", "uint256"], [BOB, 10]
+    )
+    candidates, args = index.decode_calldata(calldata)
+    assert [it[0] for it in candidates] == ["Pool", "Token"]
+    assert args == (BOB.lower(), 10)
+    assert [it[0] for it in index.lookup_event(Pool.Event.Transfer.topic)] == [
+        "Pool",
+        "Token",
+    ]
+    assert [it[0] for it in index.lookup_event(Pool.Event.Deposit.topic)] == ["Pool"]
+
+    check_colliding_selectors(transfer, calldata)
+    print(f"{len(built.functions)} selectors, {len(built.events)} topics indexed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# struct outputs are decoded straight into the generated struct classes, from the node and from the embedded EVM
+from generated_api_common import *
+from pytract.abi2api import EVMBackend, EVMContract
+
+POSITIONS = [
+    (ALICE, 10**18, [-60, 60]),
+    (BOB, 0, [-887272, 887272]),
+]
+
+
+class StubEVM:
+    """Answers `AtomicEVM.call` like simular does, with tuples for structs."""
+
+    def __init__(self):
+        self.calls: list = []
+
+    def call(self, name: str, args: str, address: str, contract_name: str):
+        # arguments come formatted for simular, like "(1)"
+        self.calls.append((name, args, address, contract_name))
+        if name == "getPosition":
+            return POSITIONS[int(args.strip("()"))]
+        if name == "getPositions":
+            return list(POSITIONS)
+        raise AssertionError(f"unexpected call to {name}")
+
+
+def check_positions(pool):
+    Position = Pool.Struct.Position
+    position = pool.function.getPosition(1)
+    assert isinstance(position, Position)
+    assert position.owner.lower() == BOB.lower()
+    assert position.amount == 0
+    assert list(position.ticks) == [-887272, 887272]
+
+    positions = pool.function.getPositions()
+    assert all(isinstance(it, Position) for it in positions)
+    assert [(it.owner.lower(), it.amount, list(it.ticks)) for it in positions] == [
+        (owner.lower(), amount, ticks) for owner, amount, ticks in POSITIONS
+    ]
+    # the generated classes are named tuples, so positional access keeps working
+    assert positions[0][1] == 10**18
+
+
+def main():
+    # brownie path: raw `eth_call` return data decoded by the output decoder
+    node = StubNode(
+        handlers=dict(
+            getPosition=lambda index: POSITIONS[index],
+            getPositions=lambda: POSITIONS,
+        )
+    )
+    with use_node(node):
+        check_positions(Pool(StubContract()))
+    assert [it[0] for it in node.calls] == ["getPosition", "getPositions"]
+
+    # embedded EVM path: values decoded by the EVM converted into struct classes
+    evm = StubEVM()
+    check_positions(Pool(EVMContract(EVMBackend(evm), "Pool", POOL_ADDRESS)))
+    assert [it[0] for it in evm.calls] == ["getPosition", "getPositions"]
+    assert all(it[2:] == (POOL_ADDRESS, "Pool") for it in evm.calls)
+    print(f"{len(POSITIONS)} positions decoded through both backends")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+# transaction pipeline: consecutive local nonces, concurrent broadcasts, nonces of failed broadcasts, resets waiting for submissions, and replacement of stuck transactions
+import concurrent.futures
+import threading
+import time
+
+from generated_api_common import *
+from pytract.abi2api import TransactionParameters, TransactionPipeline
+
+FIRST_NONCE = 7
+GAS_PRICE = 100
+
+
+class StubReceipt:
+    def __init__(self, txid: str, tx: dict):
+        self.txid = txid
+        self.nonce = tx["nonce"]
+        self.gas_price = tx.get("gas_price")
+        self.confirmations: list = []
+
+    def wait(self, required_confs: int):
+        self.confirmations.append(required_confs)
+
+
+def make_transfer(node: StubNode, mine_after: int = 1):
+    """Broadcasts accepted by the node, mined starting from broadcast `mine_after` of each nonce."""
+    broadcasts: dict = {}
+
+    def transfer(to: str, amount: int, tx: dict):
+        assert tx["from"] == ALICE and tx["required_confs"] == 0
+        if amount == 0:
+            raise ValueError("rejected by the node")
+        count = broadcasts[tx["nonce"]] = broadcasts.get(tx["nonce"], 0) + 1
+        receipt = StubReceipt(f"0x{tx['nonce']:032x}{count:032x}", tx)
+        if count >= mine_after:
+            node.mined.add(receipt.txid)
+        return receipt
+
+    return transfer
+
+
+def check_concurrent_broadcasts(
+    node: StubNode, pipeline: TransactionPipeline, txparams: TransactionParameters
+):
+    # broadcasts from one address overlap, and a failed one gives its nonce back even below a later one
+    barrier = threading.Barrier(2, timeout=5)
+    transfer = make_transfer(node)
+
+    def wait_for_other(to: str, amount: int, tx: dict):
+        barrier.wait()
+        return transfer(to, amount, tx)
+
+    pool = Pool(StubContract(handlers=dict(transfer=transfer)))
+    overlapping_pool = Pool(StubContract(handlers=dict(transfer=wait_for_other)))
+
+    def submit(amount: int):
+        try:
+            return pipeline.submit(
+                overlapping_pool.function.transfer, BOB, amount, _txparams=txparams
+            ).result()
+        except ValueError:
+            return None
+
+    with concurrent.futures.ThreadPoolExecutor(2) as executor:
+        (receipt,) = [it for it in executor.map(submit, [1, 0]) if it is not None]
+    failed_nonce = {FIRST_NONCE + 21, FIRST_NONCE + 22} - {receipt.nonce}
+    for expected_nonces in [failed_nonce, {FIRST_NONCE + 23}]:
+        receipt = pipeline.submit(pool.function.transfer, BOB, 1, _txparams=txparams)
+        assert {receipt.result().nonce} == expected_nonces
+
+
+def main():
+    node = StubNode()
+    node.transaction_count = FIRST_NONCE
+    pool = Pool(StubContract(handlers=dict(transfer=make_transfer(node))))
+    txparams = TransactionParameters(issuer=ALICE, gas_price=GAS_PRICE)
+
+    with TransactionPipeline(web3=node, poll_interval=0.01) as pipeline:
+        # submissions from many threads get consecutive nonces
+        with concurrent.futures.ThreadPoolExecutor(8) as executor:
+            futures = list(
+                executor.map(
+                    lambda it: pipeline.submit(
+                        pool.function.transfer, BOB, it + 1, _txparams=txparams
+                    ),
+                    range(20),
+                )
+            )
+        receipts = [it.result() for it in futures]
+        assert sorted(it.nonce for it in receipts) == list(
+            range(FIRST_NONCE, FIRST_NONCE + 20)
+        )
+        assert all(it.confirmations == [1] for it in receipts)
+
+        # a rejected broadcast does not consume its nonce
+        try:
+            pipeline.submit(pool.function.transfer, BOB, 0, _txparams=txparams)
+            raise AssertionError("the broadcast should have failed")
+        except ValueError:
+            pass
+        receipt = pipeline.submit(
+            pool.function.transfer, BOB, 1, _txparams=txparams
+        ).result()
+        assert receipt.nonce == FIRST_NONCE + 20
+
+        check_concurrent_broadcasts(node, pipeline, txparams)
+
+        # a broadcast failing after the node got it keeps its nonce
+        def drop_connection(to: str, amount: int, tx: dict):
+            node.transaction_count = tx["nonce"] + 1
+            raise ConnectionError("connection dropped")
+
+        dropped_pool = Pool(StubContract(handlers=dict(transfer=drop_connection)))
+        try:
+            pipeline.submit(dropped_pool.function.transfer, BOB, 1, _txparams=txparams)
+            raise AssertionError("the broadcast should have failed")
+        except ConnectionError:
+            pass
+        receipt = pipeline.submit(
+            pool.function.transfer, BOB, 1, _txparams=txparams
+        ).result()
+        assert receipt.nonce == FIRST_NONCE + 25
+
+        # resets wait for submissions in progress, then nonces come from the node again
+        node.transaction_count = 100
+        reset_thread = threading.Thread(target=pipeline.nonces.reset)
+        with pipeline.nonces.address_lock(ALICE):
+            reset_thread.start()
+            reset_thread.join(0.1)
+            assert reset_thread.is_alive()
+            assert pipeline.nonces.peek(ALICE) == FIRST_NONCE + 26
+        reset_thread.join()
+        with pipeline.nonces.address_lock(ALICE):
+            assert pipeline.nonces.peek(ALICE) == 100
+
+    # a stuck transaction is replaced with the same nonce and a bumped gas price
+    stuck_pool = Pool(StubContract(handlers=dict(transfer=make_transfer(node, 2))))
+    with TransactionPipeline(
+        web3=node, stuck_timeout=0.05, poll_interval=0.01, required_confs=0
+    ) as pipeline:
+        started = time.monotonic()
+        receipt = pipeline.submit(
+            stuck_pool.function.transfer, BOB, 1, _txparams=txparams
+        ).result()
+        assert time.monotonic() - started >= 0.05
+        assert receipt.nonce == 100 and receipt.confirmations == []
+        assert receipt.gas_price == int(GAS_PRICE * pipeline.gas_price_bump) + 1
+
+    # transactions never mined give up after the allowed replacements
+    node.transaction_count = 101
+    never_pool = Pool(StubContract(handlers=dict(transfer=make_transfer(node, 10))))
+    with TransactionPipeline(
+        web3=node, stuck_timeout=0.01, poll_interval=0.01, max_replacements=2
+    ) as pipeline:
+        future = pipeline.submit(
+            never_pool.function.transfer, BOB, 1, _txparams=txparams
+        )
+        try:
+            future.result()
+            raise AssertionError("the transaction should have timed out")
+        except TimeoutError as e:
+            assert "after 2 replacements" in str(e)
+    print(f"{len(receipts) + 7} transactions submitted")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# import time regression test: each submodule is imported in a fresh interpreter with `python -X importtime`
+# budgets are in milliseconds of cumulative import time, scaled by PYTRACT_IMPORT_BUDGET_SCALE on slow machines
+import importlib.util
+import os
+import subprocess
+import sys
+
+BUDGET_SCALE = float(os.environ.get("PYTRACT_IMPORT_BUDGET_SCALE", "1"))
+
+HEAVY_MODULES = ["brownie", "web3", "black", "jinja2", "simular", "numpy"]
+
+# module: (budget in ms, heavy modules it is allowed to import)
+# modules are skipped when a heavy module they import is not installed, like optional extras
+IMPORT_BUDGETS = {
+    "pytract": (50, []),
+    "pytract.constants": (50, []),
+    "pytract.config": (50, []),
+    "pytract.utils": (600, []),
+    "pytract.abi_info": (600, []),
+    "pytract.codegen": (800, []),
+    "pytract.indexer": (100, []),
+    "pytract.vm": (800, []),
+    "pytract.sharding": (800, []),
+    "pytract.oplog": (50, []),
+    "pytract.instrumentation": (50, []),
+    "pytract.locksmith": (600, []),
+    "pytract.evm": (600, []),
+    "pytract.columnar": (50, []),
+    "pytract.abi2api": (4000, ["brownie", "web3"]),
+    "pytract.watch": (4000, ["brownie", "web3"]),
+}
+
+
+def measure_import(module_name: str):
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    ).stderr
+    cumulative_us = None
+    imported = set()
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.strip()
+        imported.add(name.split(".")[0])
+        if name == module_name and cumulative.strip().isdigit():
+            cumulative_us = int(cumulative)
+    assert cumulative_us is not None, f"No import time reported for '{module_name}'"
+    return cumulative_us / 1000, imported
+
+
+failures = []
+for module_name, (budget_ms, allowed_heavy_modules) in IMPORT_BUDGETS.items():
+    missing = [it for it in allowed_heavy_modules if importlib.util.find_spec(it) is None]
+    if missing != []:
+        print(f"{module_name}: skipped, {', '.join(missing)} not installed")
+        continue
+    elapsed_ms, imported = measure_import(module_name)
+    budget_ms *= BUDGET_SCALE
+    unexpected = [
+        it
+        for it in HEAVY_MODULES
+        if it in imported and it not in allowed_heavy_modules
+    ]
+    print(f"{module_name}: {elapsed_ms:.1f} ms (budget {budget_ms:.0f} ms)")
+    if elapsed_ms > budget_ms:
+        failures.append(f"'{module_name}' took {elapsed_ms:.1f} ms to import, over its budget of {budget_ms:.0f} ms")
+    if unexpected != []:
+        failures.append(f"'{module_name}' imports {', '.join(unexpected)}")
+
+assert failures == [], "\n".join(failures)
+print("All imports within budget")
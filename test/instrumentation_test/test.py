@@ -0,0 +1,114 @@
+# instrumentation test: VM operations produce spans and counters, exported as JSON lines and OTLP/JSON to exporters closed when replaced
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import pytract
+from pytract import instrumentation
+from pytract.vm import VM, SmartContract
+
+OVERHEAD_ITERATIONS = 100_000
+
+
+class Counter(SmartContract):
+    @pytract.vm.payable
+    def increment(self):
+        self.data["count"] = self.data.get("count", 0) + 1
+
+
+def read_lines(path: str):
+    with open(path, "r") as f:
+        return [json.loads(it) for it in f]
+
+
+def check_replaced_exporters(path: str):
+    # exporters replaced by enabling again get the counters and are closed, those given again are kept
+    instrumentation.reset_counters()
+    replaced = instrumentation.JsonLinesExporter(path)
+    kept = []
+    kept_exporter = instrumentation.CallbackExporter(kept.append)
+    instrumentation.enable(replaced, kept_exporter)
+    try:
+        instrumentation.count("replaced.calls")
+        instrumentation.enable(kept_exporter)
+        assert replaced._file.closed
+        assert read_lines(path)[-1]["counters"] == {"replaced.calls": 1}
+        with instrumentation.span("after"):
+            pass
+        assert [it.name for it in kept] == ["after"]
+    finally:
+        instrumentation.disable()
+        instrumentation.reset_counters()
+
+
+def main():
+    workdir = tempfile.mkdtemp()
+    try:
+        db_path = os.path.join(workdir, "db.json")
+        contract_data_dir = os.path.join(workdir, "contract_data")
+        jsonl_path = os.path.join(workdir, "spans.jsonl")
+        traces_path = os.path.join(workdir, "traces.jsonl")
+        metrics_path = os.path.join(workdir, "metrics.jsonl")
+
+        # disabled: nothing is counted
+        vm = VM(db_path, contract_data_dir)
+        account = vm.create_account(init_balance=100)
+        assert instrumentation.get_counters() == {}
+
+        spans = []
+        with instrumentation.instrumented(
+            spans.append,
+            instrumentation.JsonLinesExporter(jsonl_path),
+            instrumentation.OTLPJsonExporter(traces_path, metrics_path),
+        ):
+            counter = Counter.create(issuer=account, vm=vm)
+            counter.increment(account, 10)
+            counters = instrumentation.get_counters()
+
+        names = {it.name for it in spans}
+        assert {"tinydb.transaction", "vm.commit", "vm.persist_contract_data"} <= names
+        assert counters["vm.commit.calls"] == 1
+        assert counters["tinydb.transaction.lock_wait_ns"] > 0
+        assert counters["tinydb.transaction.bytes_written"] > 0
+        assert counters["vm.persist_contract_data.bytes_written"] > 0
+
+        # storage spans run inside the commit span, in the same trace
+        commit = next(it for it in spans if it.name == "vm.commit")
+        children = [it for it in spans if it.parent_id == commit.span_id]
+        assert children and all(it.trace_id == commit.trace_id for it in children)
+
+        lines = read_lines(jsonl_path)
+        assert len([it for it in lines if it["type"] == "span"]) == len(spans)
+        assert lines[-1]["type"] == "counters"
+        assert lines[-1]["counters"]["vm.commit.calls"] == 1
+
+        traces = read_lines(traces_path)
+        otlp_span = traces[0]["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+        assert len(otlp_span["traceId"]) == 32 and len(otlp_span["spanId"]) == 16
+        metrics = read_lines(metrics_path)[-1]["resourceMetrics"][0]["scopeMetrics"][0]
+        assert "vm.commit.calls" in {it["name"] for it in metrics["metrics"]}
+
+        print(*sorted(f"{k}: {v}" for k, v in counters.items()), sep="\n")
+
+        check_replaced_exporters(os.path.join(workdir, "replaced.jsonl"))
+
+        # disabling stops counting, and disabled spans cost little
+        instrumentation.reset_counters()
+        counter.increment(account, 10)
+        assert instrumentation.get_counters() == {}
+        start = time.perf_counter()
+        for _ in range(OVERHEAD_ITERATIONS):
+            with instrumentation.span("noop", key=1):
+                pass
+        elapsed = time.perf_counter() - start
+        print(
+            f"Disabled span overhead: {elapsed / OVERHEAD_ITERATIONS * 1e9:.0f} ns per span"
+        )
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
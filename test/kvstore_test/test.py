@@ -0,0 +1,195 @@
+# indexed key-value store test: same behavior as AtomicKVStore, recovery from torn writes, sharing between handles, and lazy loading
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from pytract.locksmith import LockSmith
+from pytract.utils import AtomicKVStore, IndexedKVStore
+
+BENCHMARK_KEYS = 2000
+BENCHMARK_VALUE = {"history": list(range(4000))}
+WRITER_PROCESSES = 4
+WRITES_PER_PROCESS = 50
+
+
+def check_api(store_class, path: str):
+    store = store_class(path, readonly_keys=["owner"])
+    store.set("owner", "alice")
+    store.set("balance", {"amount": 1})
+    try:
+        store.set("owner", "bob")
+        raise AssertionError("readonly key was set twice")
+    except Exception as e:
+        assert "readonly" in str(e)
+    with store.context():
+        store.get("balance")["amount"] += 1
+    store.set_many({"a": [1], "b": None})
+    # values passed to `set` belong to the caller
+    value = {"amount": 0}
+    store.set("c", value)
+    value["amount"] = 1
+    store.set("b", None)
+
+    store = store_class(path, readonly_keys=["owner"])
+    assert store.get("owner") == "alice"
+    assert store.get("balance") == {"amount": 2}
+    assert dict(store.data) == {
+        "owner": "alice",
+        "balance": {"amount": 2},
+        "a": [1],
+        "b": None,
+        "c": {"amount": 0},
+    }
+    assert store.keys() == ["owner", "balance", "a", "b", "c"]
+    assert dict(store.items()) == dict(store.data)
+    assert store.get_many(["c", "missing", "a"]) == [{"amount": 0}, None, [1]]
+    try:
+        store.get("missing")
+        raise AssertionError("missing key was found")
+    except KeyError:
+        pass
+
+
+def check_in_place_changes(path: str):
+    """Values handed out by `AtomicKVStore` and changed in place are written along with the next change."""
+    store = AtomicKVStore(path)
+    store.set_many({"a": [1], "b": {"amount": 1}, "c": 0})
+    store.get("a").append(2)
+    store.set("c", 1)
+    store.data["b"]["amount"] += 1
+    store.set("c", 2)
+    assert AtomicKVStore(path).data == {"a": [1, 2], "b": {"amount": 2}, "c": 2}
+
+    # replaced values are serialized again, and the file is replaced rather than rewritten in place
+    inode = os.stat(path).st_ino
+    store.data = {"a": [3], "b": None}
+    store.persist_data()
+    assert AtomicKVStore(path).data == {"a": [3], "b": None}
+    assert os.stat(path).st_ino != inode
+
+
+def check_shared_store(path: str):
+    """Handles on one store see each other's writes, including after one of them compacts the file."""
+    first = IndexedKVStore(path, readonly_keys=["owner"])
+    second = IndexedKVStore(path, readonly_keys=["owner"])
+    first.set("owner", "alice")
+    assert second.get("owner") == "alice"
+    try:
+        second.set("owner", "bob")
+        raise AssertionError("readonly key was set twice")
+    except Exception as e:
+        assert "readonly" in str(e)
+    second.set("balance", 1)
+    assert first.get("balance") == 1
+
+    first.set("balance", 2)
+    first.compact()
+    # the second handle writes to the compacted file, not to the one it replaced
+    second.set("after_compact", 3)
+    assert first.get("after_compact") == 3
+    assert dict(IndexedKVStore(path).data) == {
+        "owner": "alice",
+        "balance": 2,
+        "after_compact": 3,
+    }
+
+
+def write_keys(path: str, process: int):
+    store = IndexedKVStore(path)
+    for index in range(WRITES_PER_PROCESS):
+        store.set(f"{process}_{index}", index)
+        if index % 10 == 0:
+            store.compact()
+
+
+def time_load(store_class, path: str) -> float:
+    start = time.perf_counter()
+    store = store_class(path)
+    store.get(f"key_{BENCHMARK_KEYS // 2}")
+    return time.perf_counter() - start
+
+
+def main():
+    workdir = tempfile.mkdtemp()
+    try:
+        check_api(AtomicKVStore, os.path.join(workdir, "store.json"))
+        check_api(IndexedKVStore, os.path.join(workdir, "store.kv"))
+        check_in_place_changes(os.path.join(workdir, "in_place.json"))
+
+        check_shared_store(os.path.join(workdir, "shared.kv"))
+
+        # processes writing and compacting the same store at once lose nothing
+        path = os.path.join(workdir, "processes.kv")
+        writers = [
+            multiprocessing.Process(target=write_keys, args=(path, it))
+            for it in range(WRITER_PROCESSES)
+        ]
+        for it in writers:
+            it.start()
+        for it in writers:
+            it.join()
+            assert it.exitcode == 0
+        assert len(IndexedKVStore(path).data) == WRITER_PROCESSES * WRITES_PER_PROCESS
+
+        # an existing empty file becomes an empty store
+        path = os.path.join(workdir, "empty.kv")
+        open(path, "w").close()
+        IndexedKVStore(path).set("first", 1)
+        assert dict(IndexedKVStore(path).data) == {"first": 1}
+
+        # a record cut short by a crash is dropped, earlier ones are kept
+        path = os.path.join(workdir, "torn.kv")
+        store = IndexedKVStore(path)
+        store.set("kept", 1)
+        store.set("torn", "x" * 100)
+        store.close()
+        with open(path, "r+b") as f:
+            f.truncate(os.path.getsize(path) - 10)
+        store = IndexedKVStore(path)
+        assert dict(store.data) == {"kept": 1}
+        store.set("after", 2)
+        assert dict(IndexedKVStore(path).data) == {"kept": 1, "after": 2}
+
+        # keys set together are kept or dropped together
+        store = IndexedKVStore(path)
+        store.set_many({"first": 1, "second": "x" * 100})
+        store.close()
+        with open(path, "r+b") as f:
+            f.truncate(os.path.getsize(path) - 10)
+        assert dict(IndexedKVStore(path).data) == {"kept": 1, "after": 2}
+
+        # superseded values are compacted away
+        path = os.path.join(workdir, "compacted.kv")
+        store = IndexedKVStore(path)
+        for index in range(200):
+            store.set("value", "x" * 10_000 + str(index))
+        assert os.path.getsize(path) < 200 * 10_000
+        assert IndexedKVStore(path).get("value").endswith("199")
+
+        locksmith = LockSmith(os.path.join(workdir, "accounts.kv"), indexed=True)
+        account = locksmith.account("alice")
+        assert locksmith.find_name(account["address"]) == "alice"
+        assert LockSmith(locksmith.db_path, indexed=True).get_many(["alice"]) == [
+            account
+        ]
+
+        # opening a large store and reading one value
+        json_path = os.path.join(workdir, "large.json")
+        kv_path = os.path.join(workdir, "large.kv")
+        items = {f"key_{index}": BENCHMARK_VALUE for index in range(BENCHMARK_KEYS)}
+        AtomicKVStore(json_path).set_many(items)
+        IndexedKVStore(kv_path).set_many(items)
+        json_seconds = time_load(AtomicKVStore, json_path)
+        kv_seconds = time_load(IndexedKVStore, kv_path)
+        print(
+            f"Open and read one value of a {os.path.getsize(kv_path) / 2**20:.0f} MiB store: AtomicKVStore {json_seconds * 1e3:.1f} ms, IndexedKVStore {kv_seconds * 1e3:.1f} ms"
+        )
+        assert kv_seconds < json_seconds
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
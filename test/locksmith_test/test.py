@@ -0,0 +1,91 @@
+# locksmith test: reverse address lookup, bulk reads and writes, reads leaving the store cache alone, and JSON-lines export and import
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+
+from pytract.locksmith import LockSmith
+from pytract.utils import generate_address_and_key
+
+ACCOUNT_COUNT = 200
+LOOKUP_COUNT = 100_000
+
+
+def check_reads(db_path: str, indexed: bool):
+    # reads go through the read-only accessors of the store
+    locksmith = LockSmith(db_path, indexed=indexed)
+    alice = locksmith.account("alice")
+    bob = locksmith.account("bob")
+    if not indexed:
+        payloads = dict(locksmith.db._payloads)
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        assert locksmith.load_account("missing") is None
+    assert output.getvalue() == ""
+    assert locksmith.get_many(["bob", "missing", "alice"]) == [bob, None, alice]
+    assert locksmith.list_accounts() == ["alice", "bob"]
+    assert dict(locksmith.iter_accounts()) == dict(alice=alice, bob=bob)
+    assert locksmith.find_name(bob["address"]) == "bob"
+    if not indexed:
+        # serialized values are reused by the next write
+        assert locksmith.db._payloads == payloads
+
+
+def main():
+    workdir = tempfile.mkdtemp()
+    try:
+        db_path = os.path.join(workdir, "accounts.json")
+        locksmith = LockSmith(db_path)
+        assert not os.path.exists(db_path)  # nothing is loaded before first use
+
+        accounts = []
+        for index in range(ACCOUNT_COUNT):
+            address, key = generate_address_and_key()
+            accounts.append(dict(name=f"account_{index}", address=address, key=key))
+        locksmith.import_many(accounts)
+        alice = locksmith.account("alice")
+
+        assert locksmith.find_name(alice["address"]) == "alice"
+        assert locksmith.find_name(accounts[7]["address"].lower()) == "account_7"
+        assert locksmith.find_name("0x" + "00" * 20) is None
+        assert locksmith.get_many(["alice", "missing"]) == [alice, None]
+
+        # the index follows accounts overwritten by name
+        address, _ = generate_address_and_key()
+        locksmith.import_account("alice", address)
+        assert locksmith.find_name(address) == "alice"
+        assert locksmith.find_name(alice["address"]) is None
+
+        # a bad key rejects the whole batch
+        try:
+            locksmith.import_many(
+                [dict(name="bad", address=address, key=accounts[0]["key"])]
+            )
+            raise AssertionError("invalid key was imported")
+        except AssertionError as e:
+            assert "is not for address" in str(e)
+        assert locksmith.get_many(["bad"]) == [None]
+
+        start = time.perf_counter()
+        for index in range(LOOKUP_COUNT):
+            locksmith.find_name(accounts[index % ACCOUNT_COUNT]["address"])
+        elapsed = time.perf_counter() - start
+        print(f"Address lookups: {LOOKUP_COUNT / elapsed / 1e6:.2f} M/s")
+
+        export_path = os.path.join(workdir, "accounts.jsonl")
+        assert locksmith.export_jsonl(export_path) == ACCOUNT_COUNT + 1
+        copy = LockSmith(os.path.join(workdir, "copy.json"))
+        assert copy.import_jsonl(export_path, batch_size=64) == ACCOUNT_COUNT + 1
+        assert dict(copy.iter_accounts()) == dict(locksmith.iter_accounts())
+        assert LockSmith(db_path).find_name(address) == "alice"
+
+        check_reads(os.path.join(workdir, "reads.json"), indexed=False)
+        check_reads(os.path.join(workdir, "reads.kv"), indexed=True)
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
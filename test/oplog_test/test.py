@@ -0,0 +1,112 @@
+# operation log test: a recorded run replays to the same state, at any step, and replays fast
+import os
+import shutil
+import tempfile
+import time
+
+import pytract
+from pytract.oplog import HEADER, OPERATION_NAMES, OperationLog, iter_operations
+from pytract.vm import VM, SmartContract
+
+REPLAY_BENCHMARK_TRANSFERS = 1_000_000
+
+
+class Counter(SmartContract):
+    @pytract.vm.payable
+    def increment(self):
+        self.data["count"] = self.data.get("count", 0) + 1
+
+
+def check_torn_tail(oplog_path: str, torn_path: str):
+    """A log cut within any record reads and replays up to the record before, and takes new records after it."""
+    with open(oplog_path, "rb") as f:
+        buffer = f.read()
+    operations = list(iter_operations(oplog_path))
+    start, steps = len(HEADER), 0
+    for op, _, end in pytract.oplog._iter_records(buffer):
+        # only the code byte, and all but the last byte
+        for size in [start + 1, end - 1]:
+            with open(torn_path, "wb") as f:
+                f.write(buffer[:size])
+            assert list(iter_operations(torn_path)) == operations[:steps]
+            assert VM.replay(torn_path).step == steps
+
+            oplog = OperationLog(torn_path)
+            assert os.path.getsize(torn_path) == start
+            oplog.set_balance(operations[0].args[0], 1)
+            oplog.close()
+            assert list(iter_operations(torn_path))[:steps] == operations[:steps]
+            assert VM.replay(torn_path).step == steps + 1
+        start = end
+        steps += op in OPERATION_NAMES
+
+
+def main():
+    workdir = tempfile.mkdtemp()
+    try:
+        db_path = os.path.join(workdir, "db.json")
+        contract_data_dir = os.path.join(workdir, "contract_data")
+        oplog_path = os.path.join(workdir, "ops.log")
+
+        # accounts created before recording are written at the start of the log
+        vm = VM(db_path, contract_data_dir)
+        early_account = vm.create_account(init_balance=7)
+
+        vm = VM(db_path, contract_data_dir, oplog_path=oplog_path)
+        account_1 = vm.create_account(init_balance=10**30)  # does not fit in 64 bits
+        account_2 = vm.create_account(init_balance=2.5)
+        counter = Counter.create(issuer=account_1, vm=vm)
+        steps_before_calls = len(list(iter_operations(oplog_path)))
+        for _ in range(3):
+            counter.increment(account_1, 10)
+        account_1.pay(1, account_2)
+        vm.set_balance(early_account, 3)
+        vm.close()
+
+        state = VM.replay(oplog_path)
+        assert state.balance(account_1._address) == account_1.balance
+        assert state.balance(account_2._address) == account_2.balance == 3.5
+        assert state.balance(early_account._address) == 3
+        assert state.balance(counter._address) == 30
+        assert state.get_contract_data(counter._address) == dict(counter.data)
+
+        # stopping after the first call: one transfer and one contract write later
+        state = VM.replay(oplog_path, until=steps_before_calls + 2)
+        assert state.balance(counter._address) == 10
+        assert state.get_contract_data(counter._address)["count"] == 1
+        print(*list(iter_operations(oplog_path))[steps_before_calls:][:2], sep="\n")
+
+        check_torn_tail(oplog_path, os.path.join(workdir, "torn.log"))
+
+        # the replayed state opens as a VM, with contracts as they were at that step
+        replay_dir = os.path.join(workdir, "replayed")
+        os.mkdir(replay_dir)
+        replayed_vm = state.persist(
+            os.path.join(replay_dir, "db.json"), os.path.join(replay_dir, "contract_data")
+        )
+        replayed_counter = Counter.load(counter._address, vm=replayed_vm)
+        assert replayed_counter.data["count"] == 1
+        assert replayed_counter.balance == 10
+
+        # replay speed, on a synthetic log of transfers
+        benchmark_path = os.path.join(workdir, "benchmark.log")
+        oplog = OperationLog(benchmark_path)
+        addresses = [f"0x{it:040x}" for it in range(100)]
+        for it in addresses:
+            oplog.create_account(it, "", REPLAY_BENCHMARK_TRANSFERS)
+        for it in range(REPLAY_BENCHMARK_TRANSFERS):
+            oplog.transfer(addresses[it % 100], addresses[(it * 7 + 1) % 100], 1)
+        oplog.close()
+        start = time.perf_counter()
+        state = VM.replay(benchmark_path)
+        elapsed = time.perf_counter() - start
+        print(
+            f"Replayed {state.step} operations in {elapsed:.2f} s ({state.step / elapsed / 1e6:.2f} M/s), log size {os.path.getsize(benchmark_path) / state.step:.1f} bytes/op"
+        )
+        assert sum(state.balances) == 100 * REPLAY_BENCHMARK_TRANSFERS
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# read-only mode test: readers never write, and see the commits of a writer in another instance
+import os
+import shutil
+import tempfile
+
+from pytract.evm import AtomicEVM
+from pytract.utils import ReadOnlyException
+from pytract.vm import VM
+
+ALICE = "0x" + "a1" * 20
+BOB = "0x" + "b0" * 20
+
+
+def expect_readonly(func, *args):
+    try:
+        func(*args)
+        raise AssertionError(f"{func.__name__} wrote through a read-only instance")
+    except ReadOnlyException:
+        pass
+
+
+def test_evm(workdir: str):
+    storage_path = os.path.join(workdir, "evm.json")
+    try:
+        AtomicEVM(storage_path, readonly=True)
+        raise AssertionError("read-only EVM opened without a published snapshot")
+    except FileNotFoundError:
+        pass
+
+    writer = AtomicEVM(storage_path)
+    writer.create_account(ALICE, 100)
+    reader = AtomicEVM(storage_path, readonly=True)
+    assert reader.refresh() is False
+    assert reader.get_balance(ALICE) == 100
+
+    writer.create_account(BOB, 0)
+    writer.transfer(ALICE, BOB, 30)
+    assert reader.evm.get_balance(BOB) == 0  # the loaded snapshot is unchanged
+    assert reader.refresh() is True
+    assert reader.evm.get_balance(BOB) == 30
+    assert reader.refresh() is False
+
+    # reads through the instance refresh by themselves
+    writer.transfer(ALICE, BOB, 20)
+    assert reader.get_balance(BOB) == 50
+
+    expect_readonly(reader.transfer, ALICE, BOB, 1)
+    expect_readonly(reader.persist)
+    assert writer.get_balance(ALICE) == 50
+
+
+def test_vm(workdir: str):
+    db_path = os.path.join(workdir, "db.json")
+    contract_data_dir = os.path.join(workdir, "contract_data")
+    writer = VM(db_path, contract_data_dir)
+    alice = writer.create_account(init_balance=100)
+    bob = writer.create_account(init_balance=0)
+
+    files_before = sorted(os.listdir(workdir))
+    reader = VM(db_path, contract_data_dir, readonly=True)
+    assert reader.balance(bob) == 0
+    alice.pay(30, bob)
+    assert reader.balance(bob) == 30
+    assert reader.balance(alice) == 70
+    writer.set_balance(alice, 5)
+    assert reader.balance(alice) == 5
+    # the reader took no locks and wrote nothing
+    assert sorted(os.listdir(workdir)) == files_before
+
+    expect_readonly(reader.create_account, 1)
+    expect_readonly(reader.set_balance, alice, 1)
+
+
+def main():
+    workdir = tempfile.mkdtemp()
+    try:
+        test_evm(workdir)
+        test_vm(workdir)
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
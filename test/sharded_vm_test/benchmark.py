@@ -0,0 +1,69 @@
+# throughput of transfers within shards with 1 and 2 worker processes: processes on different shards
+# share no lock or file, so 2 processes must beat 1 wherever there are CPUs to run them side by side
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from pytract.sharding import ShardedVM, run_sharded_workers
+
+SHARD_COUNT = 8
+ACCOUNTS_PER_SHARD = 3
+TRANSFERS_PER_WORKER = 300
+START_DELAY = 0.5
+"""Seconds given to the pool to start its processes, so the workers transfer together."""
+
+
+def transfer_within_shards(vm: ShardedVM, shards, start_at: float):
+    rng = random.Random(shards[0])
+    accounts = [it for shard in shards for it in vm.get_accounts(shard)]
+    time.sleep(max(0, start_at - time.time()))
+    for _ in range(TRANSFERS_PER_WORKER):
+        sender, receiver = rng.sample(accounts, 2)
+        sender.pay(1, receiver)
+    return time.time()
+
+
+def get_throughput(db_dir: str, contract_data_dir: str, processes: int) -> float:
+    start_at = time.time() + START_DELAY
+    end_times = run_sharded_workers(
+        transfer_within_shards,
+        db_dir,
+        contract_data_dir,
+        SHARD_COUNT,
+        processes=processes,
+        args=(start_at,),
+    )
+    return processes * TRANSFERS_PER_WORKER / (max(end_times) - start_at)
+
+
+def main():
+    workdir = tempfile.mkdtemp()
+    try:
+        db_dir = os.path.join(workdir, "db")
+        contract_data_dir = os.path.join(workdir, "contract_data")
+        vm = ShardedVM(db_dir, contract_data_dir, SHARD_COUNT)
+        for shard in range(SHARD_COUNT):
+            for _ in range(ACCOUNTS_PER_SHARD):
+                vm.create_account(10**9, shard=shard)
+        throughputs = {
+            processes: get_throughput(db_dir, contract_data_dir, processes)
+            for processes in [1, 2]
+        }
+    finally:
+        shutil.rmtree(workdir)
+
+    speedup = throughputs[2] / throughputs[1]
+    for processes, throughput in throughputs.items():
+        print(f"{processes} process(es): {throughput:.0f} transfers/s")
+    print(f"speedup with 2 processes: {speedup:.2f}")
+    if (os.cpu_count() or 1) >= 2:
+        assert speedup > 1, f"2 processes are not faster than 1 ({speedup:.2f})"
+    else:
+        # commits are mostly CPU work, which a single CPU runs in turn
+        print("Warning: a single CPU, speedup not checked")
+
+
+if __name__ == "__main__":
+    main()
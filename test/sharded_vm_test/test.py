@@ -0,0 +1,138 @@
+# agent-based token simulation over a sharded VM: workers in a process pool each own some shards
+# and transfer between their own accounts, with some transfers going to accounts in other shards
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import pytract.utils
+from pytract.sharding import ShardedVM, run_sharded_workers
+
+SHARD_COUNT = 4
+ACCOUNTS_PER_SHARD = 3
+INITIAL_BALANCE = 1000
+TRANSFERS_PER_WORKER = 60
+CROSS_SHARD_RATIO = 0.2
+
+
+def simulate(vm: ShardedVM, shards, seed: int):
+    rng = random.Random(seed + shards[0])
+    own_accounts = [it for shard in shards for it in vm.get_accounts(shard)]
+    other_accounts = [
+        it
+        for shard in range(vm.shard_count)
+        if shard not in shards
+        for it in vm.get_accounts(shard)
+    ]
+    cross_shard_transfers = 0
+    for _ in range(TRANSFERS_PER_WORKER):
+        sender = rng.choice(own_accounts)
+        if other_accounts != [] and rng.random() < CROSS_SHARD_RATIO:
+            receiver = rng.choice(other_accounts)
+        else:
+            receiver = rng.choice(own_accounts)
+        if receiver._address != sender._address:
+            sender.pay(rng.randint(1, 10), receiver)
+            if vm.get_shard(sender._address) != vm.get_shard(receiver._address):
+                cross_shard_transfers += 1
+    return cross_shard_transfers
+
+
+def get_accounts_across_shards(vm: ShardedVM):
+    return vm.get_accounts(0)[0], vm.get_accounts(SHARD_COUNT - 1)[0]
+
+
+def die_mid_commit(db_dir: str, contract_data_dir: str):
+    """Transfer between the first and the last shard, dying once the first one is written."""
+    vm = ShardedVM(db_dir, contract_data_dir, SHARD_COUNT)
+    sender, receiver = get_accounts_across_shards(vm)
+    original_atomic_write = pytract.utils.atomic_write
+
+    def dying_atomic_write(path, content):
+        original_atomic_write(path, content)
+        if os.path.basename(path).startswith("shard_"):
+            os._exit(1)
+
+    pytract.utils.atomic_write = dying_atomic_write
+    sender.pay(5, receiver)
+
+
+def main():
+    workdir = tempfile.mkdtemp()
+    try:
+        db_dir = os.path.join(workdir, "db")
+        contract_data_dir = os.path.join(workdir, "contract_data")
+        vm = ShardedVM(db_dir, contract_data_dir, SHARD_COUNT)
+        for shard in range(SHARD_COUNT):
+            for _ in range(ACCOUNTS_PER_SHARD):
+                account = vm.create_account(INITIAL_BALANCE, shard=shard)
+                assert vm.get_shard(account._address) == shard
+        total = SHARD_COUNT * ACCOUNTS_PER_SHARD * INITIAL_BALANCE
+
+        for processes in [1, 2]:
+            start = time.perf_counter()
+            results = run_sharded_workers(
+                simulate,
+                db_dir,
+                contract_data_dir,
+                SHARD_COUNT,
+                processes=processes,
+                args=(processes,),
+            )
+            elapsed = time.perf_counter() - start
+            transfers = processes * TRANSFERS_PER_WORKER
+            print(
+                f"{processes} process(es): {transfers / elapsed:.0f} transfers/s, {sum(results)} across shards"
+            )
+            assert sum(results) > 0
+
+            # transfers between shards are all-or-nothing: funds are neither created nor lost
+            balances = [
+                it.balance
+                for shard in range(SHARD_COUNT)
+                for it in vm.get_accounts(shard)
+            ]
+            assert sum(balances) == total, (sum(balances), total)
+            assert os.listdir(os.path.join(contract_data_dir, "journals")) == []
+
+        # a peer dies between writing the two shards of a transfer
+        sender, receiver = get_accounts_across_shards(vm)
+        sender_balance, receiver_balance = sender.balance - 5, receiver.balance + 5
+        peer = multiprocessing.Process(
+            target=die_mid_commit, args=(db_dir, contract_data_dir)
+        )
+        peer.start()
+        peer.join()
+        assert peer.exitcode == 1
+        assert sender.balance == sender_balance
+        assert receiver.balance == receiver_balance - 5
+
+        # a live worker carries on: its next commit on the other shard finishes the transfer
+        other_receiver = vm.get_accounts(SHARD_COUNT - 1)[1]
+        receiver.pay(1, other_receiver)
+        assert receiver.balance == receiver_balance - 1
+        # the shard written before the peer died is not written again
+        sender.pay(1, vm.get_accounts(0)[1])
+        assert sender.balance == sender_balance - 1
+        # neither commit locked both shards, so the journal is left to the next VM
+        assert len(os.listdir(os.path.join(contract_data_dir, "journals"))) == 1
+        ShardedVM(db_dir, contract_data_dir, SHARD_COUNT)
+        assert os.listdir(os.path.join(contract_data_dir, "journals")) == []
+        assert sender.balance == sender_balance - 1
+        assert receiver.balance == receiver_balance - 1
+        balances = [
+            it.balance for shard in range(SHARD_COUNT) for it in vm.get_accounts(shard)
+        ]
+        assert sum(balances) == total, (sum(balances), total)
+
+        # balances are read without the shard lock, so readers never wait on a commit
+        with vm._shard_dbs[0].transaction():
+            assert sender.balance == sender_balance - 1
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# build watcher test: polling picks up changed, added, removed and unparsable artifacts of a copied project and regenerates its API
+import json
+import os
+import shutil
+import tempfile
+import types
+
+from pytract.watch import BrownieProjectAdapter, BuildWatcher
+
+PROJECT_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "brownie_project"
+)
+
+NEW_FUNCTION_ABI = {
+    "inputs": [],
+    "name": "totalWithdrawn",
+    "outputs": [{"name": "", "type": "uint256"}],
+    "stateMutability": "view",
+    "type": "function",
+}
+
+
+def write_json(path: str, content: dict):
+    # written elsewhere first, so polls never see a partial file
+    with open(path + ".tmp", "w") as f:
+        json.dump(content, f)
+    os.replace(path + ".tmp", path)
+
+
+def main():
+    # incompatible brownie versions are reported before anything is touched
+    try:
+        BrownieProjectAdapter(types.SimpleNamespace(_containers={}))
+        raise AssertionError("the adapter should have rejected the project")
+    except Exception as e:
+        assert "Incompatible brownie version" in str(e)
+        assert "_build._add_contract" in str(e)
+
+    workdir = tempfile.mkdtemp()
+    try:
+        # the Vyper contract has no build artifact and would be compiled on load, so it is left out
+        project_path = os.path.join(workdir, "brownie_project")
+        shutil.copytree(
+            PROJECT_DIR,
+            project_path,
+            ignore=shutil.ignore_patterns("*.vy", "__pycache__"),
+        )
+        contracts_path = os.path.join(project_path, "api", "_contracts.py")
+        os.remove(contracts_path)
+
+        with BuildWatcher(
+            project_path, debounce=0.05, poll_interval=0.05, use_file_events=False
+        ) as watcher:
+            assert not watcher.uses_file_events
+            assert os.path.exists(contracts_path)
+            assert watcher.wait_for_changes(timeout=0.2) == []
+
+            faucet_path = os.path.join(watcher.contracts_dir, "Faucet.json")
+            with open(faucet_path, "r") as f:
+                faucet = json.load(f)
+
+            # a changed ABI regenerates the contract
+            faucet["abi"].append(NEW_FUNCTION_ABI)
+            write_json(faucet_path, faucet)
+            assert watcher.wait_for_changes(timeout=5) == [faucet_path]
+            assert watcher.apply_changes([faucet_path]) == ["Faucet"]
+            with open(contracts_path, "r") as f:
+                assert "def totalWithdrawn(" in f.read()
+            assert watcher.get_changed_paths() == []
+
+            # added and removed artifacts add and remove contracts
+            copy_path = os.path.join(watcher.contracts_dir, "FaucetCopy.json")
+            write_json(copy_path, dict(faucet, contractName="FaucetCopy"))
+            assert watcher.apply_changes(watcher.wait_for_changes(timeout=5)) == [
+                "FaucetCopy"
+            ]
+            assert "FaucetCopy" in watcher.project_info.project._containers
+            with open(contracts_path, "r") as f:
+                assert "class FaucetCopy(" in f.read()
+
+            os.remove(copy_path)
+            assert watcher.apply_changes(watcher.wait_for_changes(timeout=5)) == [
+                "FaucetCopy"
+            ]
+            assert "FaucetCopy" not in watcher.project_info.contracts_info
+            with open(contracts_path, "r") as f:
+                assert "class FaucetCopy(" not in f.read()
+
+            # unparsable artifacts are reported and skipped until they change again
+            with open(faucet_path, "w") as f:
+                f.write('{"abi": [')
+            assert watcher.apply_changes(watcher.wait_for_changes(timeout=5)) == []
+            assert watcher.unparsable_paths == {faucet_path}
+            assert watcher.get_changed_paths() == []
+            write_json(faucet_path, faucet)
+            assert watcher.apply_changes(watcher.wait_for_changes(timeout=5)) == []
+            assert watcher.unparsable_paths == set()
+            assert watcher.get_changed_paths() == []
+
+            # removed interfaces leave the project
+            interface_path = os.path.join(watcher.interfaces_dir, "MyInterface.json")
+            interfaces = watcher.project_info.project.interface
+            assert hasattr(interfaces, "MyInterface")
+            os.remove(interface_path)
+            watcher.apply_changes(watcher.wait_for_changes(timeout=5))
+            assert not hasattr(interfaces, "MyInterface")
+    finally:
+        shutil.rmtree(workdir)
+    print("changed, added, removed and unparsable artifacts applied")
+
+
+if __name__ == "__main__":
+    main()